@@ -6,9 +6,7 @@ Backend для онлайн-библиотеки с FastAPI
 __version__ = "1.0.0"
 __author__ = "Online Library Team"
 
-from .main import app
-from .database import Base, engine, get_db
-from . import models, schemas, crud, auth
+import importlib
 
 __all__ = [
     "app",
@@ -20,3 +18,30 @@ __all__ = [
     "crud",
     "auth",
 ]
+
+# Имя -> (модуль, атрибут). Импортируются при первом обращении, чтобы
+# `import app.<модуль>` не тянул за собой FastAPI-приложение и passlib/jose
+_LAZY = {
+    "app": (".main", "app"),
+    "Base": (".database", "Base"),
+    "engine": (".database", "engine"),
+    "get_db": (".database", "get_db"),
+    "models": (".models", None),
+    "schemas": (".schemas", None),
+    "crud": (".crud", None),
+    "auth": (".auth", None),
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attr = _LAZY[name]
+    module = importlib.import_module(module_name, __name__)
+    value = module if attr is None else getattr(module, attr)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,279 @@
+"""
+Аналитика чтения: просмотры, скачивания и страницы книг
+
+Запись события на горячем пути — одно добавление в кольцевой буфер
+воркера (deque с maxlen, без блокировок и обращений к БД). Раз в
+ANALYTICS_FLUSH_INTERVAL секунд фоновый поток забирает накопленное и
+пишет одной пачкой через COPY в book_events. Раз в
+ANALYTICS_ROLLUP_INTERVAL секунд сырые события сворачиваются в дневные
+счетчики book_daily_stats и удаляются (только PostgreSQL); отчеты для
+админов читают только счетчики.
+
+При переполнении буфера (БД недоступна дольше, чем он вмещает) старые
+события вытесняются — аналитика приблизительная, запросы читателей важнее.
+"""
+import io
+import logging
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, insert, text
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+VIEW, DOWNLOAD, PAGE = "view", "download", "page"
+
+Event = Tuple[int, str, datetime]
+
+
+class EventBuffer:
+    """Кольцевой буфер событий: (book_id, event_type, created_at)"""
+
+    def __init__(self, size: int):
+        self._events: deque = deque(maxlen=size)
+        self.dropped = 0
+
+    def record(self, book_id: int, event_type: str) -> None:
+        """Запомнить событие; append у deque атомарен, блокировка не нужна"""
+        events = self._events
+        if len(events) == events.maxlen:
+            self.dropped += 1  # приблизительно: счетчик только для журнала
+        events.append((book_id, event_type, datetime.utcnow()))
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def take(self) -> List[Event]:
+        """Забрать накопленные события; параллельные record не теряются"""
+        events = self._events
+        return [events.popleft() for _ in range(len(events))]
+
+    def restore(self, items: List[Event]) -> None:
+        """
+        Вернуть неудачно сброшенные события в буфер
+
+        Возвращенные события старше накопленных за время сброса, поэтому они
+        ставятся перед ними, и при переполнении deque вытесняет слева именно
+        их, а не новые события.
+        """
+        events = self._events
+        newer = self.take()
+        overflow = len(items) + len(newer) - events.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+        events.extend(items)
+        events.extend(newer)
+
+    def flush(self, db: Session) -> int:
+        """Записать накопленные события одной пачкой. Возвращает число строк"""
+        items = self.take()
+        if self.dropped:
+            logger.warning("Буфер аналитики переполнен, потеряно событий: %d", self.dropped)
+            self.dropped = 0
+        if not items:
+            return 0
+
+        try:
+            if db.bind.dialect.name == "postgresql":
+                buffer = io.StringIO()
+                buffer.writelines(
+                    f"{book_id},{event_type},{created_at.isoformat()}\n"
+                    for book_id, event_type, created_at in items
+                )
+                buffer.seek(0)
+                cursor = db.connection().connection.cursor()
+                cursor.copy_expert(
+                    "COPY book_events (book_id, event_type, created_at) FROM STDIN WITH (FORMAT csv)", buffer
+                )
+            else:
+                db.execute(insert(models.BookEvent), [
+                    {"book_id": book_id, "event_type": event_type, "created_at": created_at}
+                    for book_id, event_type, created_at in items
+                ])
+            db.commit()
+            return len(items)
+        except Exception:
+            db.rollback()
+            self.restore(items)
+            raise
+
+
+buffer = EventBuffer(settings.ANALYTICS_BUFFER_SIZE)
+
+def record(book_id: int, event_type: str) -> None:
+    """Учесть событие книги (запись в БД — пакетно в фоне)"""
+    buffer.record(book_id, event_type)
+
+
+def opens_book(range_header: Optional[str]) -> bool:
+    """Запрос открывает книгу: без Range или с диапазоном от нулевого байта
+
+    Просмотрщик PDF догружает файл частями, и каждая часть — отдельный GET
+    с Range; просмотром считается только первый из них.
+    """
+    if not range_header:
+        return True
+    unit, _, ranges = range_header.partition("=")
+    return unit.strip().lower() == "bytes" and ranges.split(",")[0].strip().startswith("0-")
+
+# ============ СВЕРТКА (PostgreSQL) ============
+
+# Пачка сырых событий удаляется и сразу прибавляется к дневным счетчикам
+# одним оператором. SKIP LOCKED позволяет воркерам сворачивать параллельно,
+# не считая одно событие дважды; события удаленных книг отбрасываются join'ом.
+_ROLLUP_SQL = text(f"""
+WITH moved AS (
+    DELETE FROM book_events WHERE id IN (
+        SELECT id FROM book_events ORDER BY id LIMIT :batch FOR UPDATE SKIP LOCKED
+    )
+    RETURNING book_id, event_type, created_at
+),
+merged AS (
+    INSERT INTO book_daily_stats AS s (book_id, day, views, downloads, pages)
+    SELECT m.book_id, m.created_at::date,
+        COUNT(*) FILTER (WHERE m.event_type = '{VIEW}'),
+        COUNT(*) FILTER (WHERE m.event_type = '{DOWNLOAD}'),
+        COUNT(*) FILTER (WHERE m.event_type = '{PAGE}')
+    FROM moved m JOIN books b ON b.id = m.book_id
+    GROUP BY m.book_id, m.created_at::date
+    ON CONFLICT (book_id, day) DO UPDATE SET
+        views = s.views + EXCLUDED.views,
+        downloads = s.downloads + EXCLUDED.downloads,
+        pages = s.pages + EXCLUDED.pages
+)
+SELECT COUNT(*) FROM moved
+""")
+
+def rollup(db: Session, batch: Optional[int] = None) -> int:
+    """Свернуть сырые события в дневные счетчики. Возвращает число свернутых событий"""
+    if db.bind.dialect.name != "postgresql":
+        return 0
+    batch = batch or settings.ANALYTICS_ROLLUP_BATCH
+    total = 0
+    while True:
+        moved = db.execute(_ROLLUP_SQL, {"batch": batch}).scalar() or 0
+        db.commit()
+        total += moved
+        if moved < batch:
+            return total
+
+# ============ ФОНОВЫЙ СБРОС ============
+
+_stop_event = threading.Event()
+_flusher: Optional[threading.Thread] = None
+
+def flush_now() -> int:
+    """Сбросить буфер в БД в отдельной сессии"""
+    db = SessionLocal()
+    try:
+        return buffer.flush(db)
+    finally:
+        db.close()
+
+def rollup_now() -> int:
+    """Свернуть события в отдельной сессии"""
+    db = SessionLocal()
+    try:
+        return rollup(db)
+    finally:
+        db.close()
+
+def _flush_loop(interval: float, rollup_interval: float) -> None:
+    next_rollup = time.monotonic() + rollup_interval
+    while not _stop_event.wait(interval):
+        try:
+            flush_now()
+        except Exception:
+            logger.exception("Не удалось сохранить события аналитики")
+        if time.monotonic() >= next_rollup:
+            next_rollup = time.monotonic() + rollup_interval
+            try:
+                rollup_now()
+            except Exception:
+                logger.exception("Не удалось свернуть события аналитики")
+
+def start_flusher(interval: Optional[float] = None) -> None:
+    """Запустить фоновый поток сброса и свертки (один на воркер)"""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    _stop_event.clear()
+    _flusher = threading.Thread(
+        target=_flush_loop,
+        args=(interval or settings.ANALYTICS_FLUSH_INTERVAL, settings.ANALYTICS_ROLLUP_INTERVAL),
+        name="analytics-flusher",
+        daemon=True,
+    )
+    _flusher.start()
+
+def stop_flusher() -> None:
+    """Остановить фоновый поток и сбросить остаток буфера"""
+    global _flusher
+    _stop_event.set()
+    if _flusher is not None:
+        _flusher.join(timeout=10)
+        _flusher = None
+    try:
+        flush_now()
+    except Exception:
+        logger.exception("Не удалось сохранить события аналитики при остановке")
+
+# ============ ОТЧЕТЫ ============
+
+def _since(days: int) -> date:
+    return datetime.utcnow().date() - timedelta(days=days - 1)
+
+def get_top_books(db: Session, days: int = 30, metric: str = "views", limit: int = 20) -> List[dict]:
+    """Книги с наибольшим числом просмотров/скачиваний/страниц за последние days дней"""
+    stats = models.BookDailyStats
+    views = func.sum(stats.views).label("views")
+    downloads = func.sum(stats.downloads).label("downloads")
+    pages = func.sum(stats.pages).label("pages")
+    order = {"views": views, "downloads": downloads, "pages": pages}[metric]
+    rows = db.query(
+        models.Book.id, models.Book.title, models.Book.author, views, downloads, pages
+    ).join(
+        stats, stats.book_id == models.Book.id
+    ).filter(
+        stats.day >= _since(days)
+    ).group_by(
+        models.Book.id, models.Book.title, models.Book.author
+    ).order_by(
+        order.desc(), models.Book.id
+    ).limit(limit).all()
+    return [
+        {
+            "book_id": row.id,
+            "title": row.title,
+            "author": row.author,
+            "views": row.views or 0,
+            "downloads": row.downloads or 0,
+            "pages": row.pages or 0,
+        }
+        for row in rows
+    ]
+
+def get_daily(db: Session, days: int = 30, book_id: Optional[int] = None) -> List[dict]:
+    """Счетчики по дням за последние days дней: по всей библиотеке или по одной книге"""
+    stats = models.BookDailyStats
+    query = db.query(
+        stats.day,
+        func.sum(stats.views).label("views"),
+        func.sum(stats.downloads).label("downloads"),
+        func.sum(stats.pages).label("pages")
+    ).filter(stats.day >= _since(days))
+    if book_id is not None:
+        query = query.filter(stats.book_id == book_id)
+    rows = query.group_by(stats.day).order_by(stats.day).all()
+    return [
+        {"day": row.day, "views": row.views or 0, "downloads": row.downloads or 0, "pages": row.pages or 0}
+        for row in rows
+    ]
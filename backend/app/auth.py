@@ -1,7 +1,8 @@
+import hashlib
+import secrets
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
@@ -9,18 +10,28 @@ from .config import settings
 from .database import get_db
 from . import models, schemas
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """CryptContext создается при первом входе/регистрации: passlib не нужен для старта воркера"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
+
+@lru_cache(maxsize=None)
+def get_jose():
+    """python-jose (тянет cryptography) загружается при первой выдаче или проверке токена"""
+    from jose import JWTError, jwt
+    return jwt, JWTError
 
 # ИСПРАВЛЕНО: auto_error=False позволяет работать без токена
 security = HTTPBearer(auto_error=False)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     if len(password.encode('utf-8')) > 72:
         password = password[:72]
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -29,9 +40,63 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    jwt, _ = get_jose()
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+def get_user_from_token(db: Session, token: str) -> Optional[models.User]:
+    """Пользователь по JWT-токену или None, если токен недействителен"""
+    jwt, JWTError = get_jose()
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        email: str = payload.get("sub")
+        if email is None:
+            return None
+        token_data = schemas.TokenData(email=email)
+    except JWTError:
+        return None
+    
+    return db.query(models.User).filter(models.User.email == token_data.email).first()
+
+# ============ БИЛЕТЫ НА ПОДПИСКУ SSE ============
+
+def _ticket_hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode("utf-8")).hexdigest()
+
+def create_stream_ticket(db: Session, user: models.User) -> str:
+    """
+    Выдать одноразовый билет на подписку SSE
+
+    Билет попадает в строку запроса (и в логи), поэтому он живет
+    EVENTS_TICKET_TTL секунд и действует один раз, в отличие от JWT.
+    """
+    now = datetime.utcnow()
+    ticket = secrets.token_urlsafe(32)
+    db.query(models.StreamTicket).filter(models.StreamTicket.expires_at < now).delete(synchronize_session=False)
+    db.add(models.StreamTicket(
+        ticket_hash=_ticket_hash(ticket),
+        user_id=user.id,
+        expires_at=now + timedelta(seconds=settings.EVENTS_TICKET_TTL),
+    ))
+    db.commit()
+    return ticket
+
+def redeem_stream_ticket(db: Session, ticket: str) -> Optional[models.User]:
+    """Пользователь по билету или None; билет гасится, даже если уже истек"""
+    ticket_hash = _ticket_hash(ticket)
+    row = db.get(models.StreamTicket, ticket_hash)
+    if row is None:
+        return None
+    user_id, expires_at = row.user_id, row.expires_at
+    # Из двух одновременных запросов с одним билетом строку удалит только один
+    deleted = db.query(models.StreamTicket).filter(
+        models.StreamTicket.ticket_hash == ticket_hash
+    ).delete(synchronize_session=False)
+    db.commit()
+    if not deleted or expires_at < datetime.utcnow():
+        return None
+    return db.get(models.User, user_id)
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -44,17 +109,7 @@ def get_current_user(
     if not credentials:
         raise credentials_exception
     
-    try:
-        token = credentials.credentials
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    user = get_user_from_token(db, credentials.credentials)
     if user is None:
         raise credentials_exception
     return user
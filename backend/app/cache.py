@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Простой потокобезопасный кэш в памяти процесса с временем жизни записей
+
+    Каждый воркер uvicorn держит свою копию, поэтому TTL — это верхняя граница
+    устаревания данных между воркерами. При превышении maxsize вытесняются
+    самые давно использованные записи.
+
+    Подклассы могут переопределить _removed, чтобы узнавать об удалении
+    записей (устаревание, вытеснение, invalidate).
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Получить значение или None, если записи нет или она устарела"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                self._discard(key)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Сохранить значение"""
+        with self._lock:
+            self._discard(key)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            while len(self._data) > self.maxsize:
+                self._discard(next(iter(self._data)))
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Получить значение из кэша или вычислить и сохранить его"""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        """Удалить запись"""
+        with self._lock:
+            self._discard(key)
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        with self._lock:
+            self._data.clear()
+
+    def _discard(self, key: Hashable) -> None:
+        item = self._data.pop(key, None)
+        if item is not None:
+            self._removed(key, item[1])
+
+    def _removed(self, key: Hashable, value: Any) -> None:
+        """Вызывается под блокировкой после удаления записи"""
@@ -0,0 +1,154 @@
+"""
+Сжатие ответов (brotli/gzip)
+
+В отличие от стандартного GZipMiddleware сжимает только типы из белого
+списка (JSON, текст, CSV) и не трогает PDF и другие уже сжатые форматы,
+а также ответы меньше COMPRESSION_MIN_SIZE. Brotli используется, если
+установлен пакет brotli и клиент его принимает.
+"""
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, без него остается gzip
+    brotli = None
+
+from .config import settings
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/",
+)
+
+# Потоки событий: сжатие буферизует данные и задерживает доставку
+STREAMING_TYPES = ("text/event-stream",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Выбрать кодировку по заголовку Accept-Encoding: br, затем gzip"""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+            self.compress = self._obj.process
+            self.finish = self._obj.finish
+        else:
+            # wbits=31 — формат gzip с заголовком
+            self._obj = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress = self._obj.compress
+            self.finish = self._obj.flush
+
+
+def with_vary(headers: list, field: str = "Accept-Encoding") -> list:
+    """Добавить field в Vary, сохранив уже указанные значения"""
+    result = []
+    vary = []
+    for name, value in headers:
+        if name == b"vary":
+            vary.append(value.decode("latin-1"))
+        else:
+            result.append((name, value))
+    if not any(field.lower() in v.lower() for v in vary):
+        vary.append(field)
+    result.append((b"vary", ", ".join(vary).encode("latin-1")))
+    return result
+
+
+class CompressionMiddleware:
+    """ASGI middleware сжатия ответов с порогом по размеру и белым списком типов"""
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding)
+
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                content_type = b""
+                already_encoded = False
+                for name, value in message.get("headers", []):
+                    if name == b"content-type":
+                        content_type = value
+                    elif name == b"content-encoding":
+                        already_encoded = True
+                media_type = content_type.decode("latin-1").split(";")[0].strip().lower()
+                if (
+                    already_encoded
+                    or not media_type.startswith(COMPRESSIBLE_TYPES)
+                    or media_type in STREAMING_TYPES
+                ):
+                    state["passthrough"] = True
+                    await send(message)
+                elif encoding is None:
+                    state["passthrough"] = True
+                    await send({**message, "headers": with_vary(message.get("headers", []))})
+                else:
+                    state["start"] = message
+                return
+
+            if state["passthrough"] or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+
+            if start is not None:
+                state["start"] = None
+                headers = with_vary(start.get("headers", []))
+                if not more_body and len(body) < self.minimum_size:
+                    state["passthrough"] = True
+                    await send({**start, "headers": headers})
+                    await send(message)
+                    return
+
+                compressor = state["compressor"] = _Compressor(encoding)
+                headers = [(name, value) for name, value in headers if name != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                if not more_body:
+                    compressed = compressor.compress(body) + compressor.finish()
+                    headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": headers})
+
+            compressor = state["compressor"]
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -7,6 +7,89 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     BOOKS_DIRECTORY: str = "/app/books"
+    # Хранилище файлов: local — BOOKS_DIRECTORY/OPTIMIZED_DIRECTORY, s3 — бакет S3_BUCKET
+    STORAGE_BACKEND: str = "local"
+    S3_ENDPOINT_URL: Optional[str] = None  # None — AWS
+    S3_PUBLIC_ENDPOINT_URL: Optional[str] = None  # адрес хранилища для браузеров, если отличается
+    S3_REGION: str = "us-east-1"
+    S3_BUCKET: str = "library"
+    S3_ACCESS_KEY: Optional[str] = None
+    S3_SECRET_KEY: Optional[str] = None
+    S3_PRESIGNED_REDIRECTS: bool = False
+    S3_PRESIGNED_EXPIRES: int = 3600
+    # Кэш горячих объектов S3 на диске узла
+    STORAGE_CACHE_DIRECTORY: str = "/app/cache"
+    STORAGE_CACHE_MAX_BYTES: int = 10 * 1024 ** 3
+    DB_CONNECT_ATTEMPTS: int = 30
+    DB_CONNECT_DELAY: float = 0.5
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Процесс-сервер (gunicorn.conf.py); None — подобрать по числу CPU
+    WEB_CONCURRENCY: Optional[int] = None
+    WORKERS_PER_CORE: float = 1.0
+    MAX_WORKERS: int = 8
+    THREADPOOL_SIZE: Optional[int] = None
+    GRACEFUL_TIMEOUT: int = 30
+    WORKER_TIMEOUT: int = 60
+    MAX_REQUESTS: int = 10000
+    MAX_REQUESTS_JITTER: int = 1000
+    PRELOAD_APP: bool = True
+    UVICORN_LOOP: str = "auto"
+    UVICORN_HTTP: str = "auto"
+    STATS_CACHE_TTL: int = 30
+    PROGRESS_FLUSH_INTERVAL: float = 5.0
+    POPULARITY_REFRESH_INTERVAL: float = 600.0
+    # Аналитика: кольцевой буфер событий воркера, сброс COPY и свертка в дневные счетчики
+    ANALYTICS_BUFFER_SIZE: int = 100000
+    ANALYTICS_FLUSH_INTERVAL: float = 5.0
+    ANALYTICS_ROLLUP_INTERVAL: float = 60.0
+    ANALYTICS_ROLLUP_BATCH: int = 50000
+    SUGGEST_REBUILD_INTERVAL: float = 300.0
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_PROGRESS_INTERVAL: float = 1.0
+    JOB_HEARTBEAT_TIMEOUT: int = 300
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY: float = 10.0
+    JOB_BATCH_SIZE: int = 500
+    JOB_WORKER_CONCURRENCY: int = 2
+    # Массовый импорт: загруженные манифесты и исходные файлы лежат в IMPORT_DIRECTORY
+    IMPORT_DIRECTORY: str = "/app/import"
+    IMPORT_FILE_WORKERS: int = 8
+    IMPORT_MAX_ERRORS: int = 1000
+    EXPORT_BATCH_SIZE: int = 2000
+    # Архивы книг: не больше BUNDLE_MAX_BOOKS файлов и BUNDLE_MAX_BYTES байт
+    BUNDLE_MAX_BOOKS: int = 200
+    BUNDLE_MAX_BYTES: int = 4 * 1024 ** 3
+    BUNDLE_CHUNK_SIZE: int = 1024 * 1024
+    # Копии PDF для быстрого просмотра (линеаризация qpdf, опционально сжатие изображений Ghostscript)
+    OPTIMIZED_DIRECTORY: str = "/app/books_optimized"
+    PDF_OPTIMIZE_WORKERS: int = 2
+    PDF_OPTIMIZE_TIMEOUT: int = 600
+    PDF_OPTIMIZE_IMAGES: str = ""  # screen | ebook | printer; пусто — без потерь
+    PDF_OPTIMIZE_ON_INGEST: bool = False
+    PDF_REFERENCE_MBPS: float = 10.0
+    # Столько необработанных жалоб скрывают отзыв до решения модератора (0 — не скрывать)
+    MODERATION_AUTO_HIDE_THRESHOLD: int = 3
+    EVENTS_HEARTBEAT_INTERVAL: float = 15.0
+    EVENTS_RETRY_MS: int = 3000
+    EVENTS_QUEUE_SIZE: int = 100
+    EVENTS_MAX_SUBSCRIBERS: int = 1000
+    # Срок действия одноразового билета на подписку /api/admin/events, секунды
+    EVENTS_TICKET_TTL: int = 30
+    SIMILARITY_TOP_K: int = 20
+    SIMILARITY_METRIC: str = "cosine"
+    SIMILARITY_MIN_SUPPORT: int = 2
+    SIMILARITY_MAX_USER_ITEMS: int = 1000
+    SQL_PROFILING: bool = False
+    SQL_PROFILING_REPEAT_THRESHOLD: int = 10
+    COMPRESSION_MIN_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+    HTTP_CACHE_ENABLED: bool = True
+    HTTP_CACHE_TTL: int = 30
+    HTTP_CACHE_MAX_AGE: int = 30
+    HTTP_CACHE_MAXSIZE: int = 2048
+    HTTP_CACHE_MAX_BODY: int = 1048576
     
     class Config:
         env_file = ".env"
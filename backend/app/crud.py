@@ -1,7 +1,10 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, func, and_
-from typing import List, Optional
-from . import models, schemas
+from sqlalchemy.orm import Session, aliased, defer
+from sqlalchemy import Table, or_, func, and_, select, exists, delete, update, bindparam
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from typing import Dict, List, Optional
+from datetime import datetime
+import hashlib
+from . import models, schemas, statistics, popularity, moderation
 from .auth import get_password_hash
 
 # ============ USER CRUD OPERATIONS ============
@@ -58,6 +61,31 @@ def delete_user(db: Session, user_id: int) -> bool:
 
 # ============ BOOK CRUD OPERATIONS ============
 
+def _apply_book_filters(
+    query,
+    tag: Optional[str] = None,
+    genre: Optional[str] = None,
+    author: Optional[str] = None,
+    search: Optional[str] = None
+):
+    """Применить фильтры каталога (тег, жанр, автор, поиск) к запросу книг"""
+    if tag:
+        query = query.filter(models.Book.tag.ilike(f"%{tag}%"))
+    if genre:
+        query = query.filter(models.Book.genre.ilike(f"%{genre}%"))
+    if author:
+        query = query.filter(models.Book.author.ilike(f"%{author}%"))
+    if search:
+        search_filter = or_(
+            models.Book.title.ilike(f"%{search}%"),
+            models.Book.description.ilike(f"%{search}%"),
+            models.Book.author.ilike(f"%{search}%"),
+            models.Book.tag.ilike(f"%{search}%"),
+            models.Book.genre.ilike(f"%{search}%")
+        )
+        query = query.filter(search_filter)
+    return query
+
 def get_books(
     db: Session,
     skip: int = 0,
@@ -66,7 +94,9 @@ def get_books(
     genre: Optional[str] = None,
     author: Optional[str] = None,
     search: Optional[str] = None,
-    title: Optional[str] = None
+    title: Optional[str] = None,
+    with_description: bool = True,
+    sort: Optional[str] = None
 ) -> List[models.Book]:
     """
     Получить список книг с фильтрацией
@@ -80,28 +110,22 @@ def get_books(
         author: Фильтр по автору
         search: Поиск по всем полям
         title: Фильтр по названию
+        with_description: Загружать ли описание (для карточек не нужно)
+        sort: popular | top_rated | trending (по book_popularity); иначе — новые сначала
     """
     query = db.query(models.Book)
-    
-    if tag:
-        query = query.filter(models.Book.tag.ilike(f"%{tag}%"))
-    if genre:
-        query = query.filter(models.Book.genre.ilike(f"%{genre}%"))
-    if author:
-        query = query.filter(models.Book.author.ilike(f"%{author}%"))
+    if not with_description:
+        query = query.options(defer(models.Book.description, raiseload=True))
+    query = _apply_book_filters(query, tag=tag, genre=genre, author=author, search=search)
     if title:
         query = query.filter(models.Book.title.ilike(f"%{title}%"))
-    if search:
-        search_filter = or_(
-            models.Book.title.ilike(f"%{search}%"),
-            models.Book.description.ilike(f"%{search}%"),
-            models.Book.author.ilike(f"%{search}%"),
-            models.Book.tag.ilike(f"%{search}%"),
-            models.Book.genre.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
     
-    return query.order_by(models.Book.created_at.desc()).offset(skip).limit(limit).all()
+    if sort in popularity.SORT_COLUMNS:
+        ranked = popularity.ranked_books(sort)
+        query = query.join(ranked, ranked.c.book_id == models.Book.id).order_by(*popularity.order_by(ranked, sort))
+    else:
+        query = query.order_by(models.Book.created_at.desc())
+    return query.offset(skip).limit(limit).all()
 
 def get_books_count(
     db: Session,
@@ -112,22 +136,7 @@ def get_books_count(
 ) -> int:
     """Получить количество книг с учетом фильтров"""
     query = db.query(func.count(models.Book.id))
-    
-    if tag:
-        query = query.filter(models.Book.tag.ilike(f"%{tag}%"))
-    if genre:
-        query = query.filter(models.Book.genre.ilike(f"%{genre}%"))
-    if author:
-        query = query.filter(models.Book.author.ilike(f"%{author}%"))
-    if search:
-        search_filter = or_(
-            models.Book.title.ilike(f"%{search}%"),
-            models.Book.description.ilike(f"%{search}%"),
-            models.Book.author.ilike(f"%{search}%"),
-            models.Book.tag.ilike(f"%{search}%"),
-            models.Book.genre.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
+    query = _apply_book_filters(query, tag=tag, genre=genre, author=author, search=search)
     
     return query.scalar()
 
@@ -182,6 +191,55 @@ def get_book_ratings_count(db: Session, book_id: int) -> int:
         models.Rating.book_id == book_id
     ).scalar()
 
+def get_books_enrichment(
+    db: Session,
+    book_ids: List[int],
+    user_id: Optional[int] = None
+) -> Dict[int, dict]:
+    """
+    Получить рейтинг и пользовательские отметки для набора книг одним запросом
+    
+    Возвращает словарь book_id -> {average_rating, is_favorite, is_read, user_rating}.
+    Заменяет вызовы get_book_average_rating/is_favorite/is_read/get_user_rating_for_book
+    по каждой книге списка.
+    """
+    if not book_ids:
+        return {}
+    
+    average_rating = select(func.avg(models.Rating.value)).where(
+        models.Rating.book_id == models.Book.id
+    ).scalar_subquery()
+    columns = [models.Book.id, average_rating]
+    
+    if user_id is not None:
+        columns.extend([
+            exists().where(and_(
+                models.favorites.c.user_id == user_id,
+                models.favorites.c.book_id == models.Book.id
+            )),
+            exists().where(and_(
+                models.read_books.c.user_id == user_id,
+                models.read_books.c.book_id == models.Book.id
+            )),
+            select(models.Rating.value).where(and_(
+                models.Rating.user_id == user_id,
+                models.Rating.book_id == models.Book.id
+            )).limit(1).scalar_subquery(),
+        ])
+    
+    rows = db.query(*columns).filter(models.Book.id.in_(book_ids)).all()
+    
+    result = {}
+    for row in rows:
+        avg = row[1]
+        result[row[0]] = {
+            "average_rating": round(avg, 2) if avg else None,
+            "is_favorite": bool(row[2]) if user_id is not None else False,
+            "is_read": bool(row[3]) if user_id is not None else False,
+            "user_rating": row[4] if user_id is not None else None,
+        }
+    return result
+
 def get_user_rating_for_book(db: Session, user_id: int, book_id: int) -> Optional[float]:
     """Получить оценку пользователя для книги"""
     rating = db.query(models.Rating).filter(
@@ -254,46 +312,79 @@ def remove_from_favorites(db: Session, user_id: int, book_id: int) -> bool:
             return True
     return False
 
-def get_user_favorites(
+def _get_user_shelf(
     db: Session,
+    shelf: Table,
     user_id: int,
-    skip: int = 0,
+    cursor: Optional[int] = None,
     limit: int = 100,
     tag: Optional[str] = None,
     genre: Optional[str] = None,
     author: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    with_description: bool = True
 ) -> List[models.Book]:
-    """Получить избранные книги пользователя с фильтрацией"""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    
-    if not user:
-        return []
+    """
+    Получить страницу книг с «полки» пользователя (избранное, прочитанное)
     
+    Пагинация по курсору: cursor — ID последней книги предыдущей страницы,
+    книги отдаются по убыванию ID. Сортировка и фильтр по book_id
+    обслуживаются первичным ключом (user_id, book_id) таблицы связи.
+    """
     query = db.query(models.Book).join(
-        models.favorites,
-        models.Book.id == models.favorites.c.book_id
+        shelf,
+        models.Book.id == shelf.c.book_id
     ).filter(
-        models.favorites.c.user_id == user_id
+        shelf.c.user_id == user_id
     )
+    if not with_description:
+        query = query.options(defer(models.Book.description, raiseload=True))
+    query = _apply_book_filters(query, tag=tag, genre=genre, author=author, search=search)
     
-    if tag:
-        query = query.filter(models.Book.tag.ilike(f"%{tag}%"))
-    if genre:
-        query = query.filter(models.Book.genre.ilike(f"%{genre}%"))
-    if author:
-        query = query.filter(models.Book.author.ilike(f"%{author}%"))
-    if search:
-        search_filter = or_(
-            models.Book.title.ilike(f"%{search}%"),
-            models.Book.description.ilike(f"%{search}%"),
-            models.Book.author.ilike(f"%{search}%"),
-            models.Book.tag.ilike(f"%{search}%"),
-            models.Book.genre.ilike(f"%{search}%")
-        )
-        query = query.filter(search_filter)
+    if cursor is not None:
+        query = query.filter(shelf.c.book_id < cursor)
     
-    return query.offset(skip).limit(limit).all()
+    return query.order_by(shelf.c.book_id.desc()).limit(limit).all()
+
+def get_user_favorites(
+    db: Session,
+    user_id: int,
+    cursor: Optional[int] = None,
+    limit: int = 100,
+    tag: Optional[str] = None,
+    genre: Optional[str] = None,
+    author: Optional[str] = None,
+    search: Optional[str] = None,
+    with_description: bool = True
+) -> List[models.Book]:
+    """Получить избранные книги пользователя с фильтрацией и пагинацией по курсору"""
+    return _get_user_shelf(
+        db, models.favorites, user_id, cursor=cursor, limit=limit,
+        tag=tag, genre=genre, author=author, search=search,
+        with_description=with_description
+    )
+
+def get_bundle_books(
+    db: Session,
+    user_id: int,
+    book_ids: Optional[List[int]] = None,
+    favorites: bool = False,
+    tag: Optional[str] = None,
+    genre: Optional[str] = None,
+    author: Optional[str] = None,
+    search: Optional[str] = None,
+    limit: int = 100
+) -> List[models.Book]:
+    """Книги для архива: по списку id, из избранного и/или по фильтрам каталога (без описаний)"""
+    query = db.query(models.Book).options(defer(models.Book.description, raiseload=True))
+    if book_ids is not None:
+        query = query.filter(models.Book.id.in_(book_ids))
+    if favorites:
+        query = query.join(
+            models.favorites, models.favorites.c.book_id == models.Book.id
+        ).filter(models.favorites.c.user_id == user_id)
+    query = _apply_book_filters(query, tag=tag, genre=genre, author=author, search=search)
+    return query.order_by(models.Book.title, models.Book.id).limit(limit).all()
 
 def is_favorite(db: Session, user_id: int, book_id: int) -> bool:
     """Проверить, находится ли книга в избранном"""
@@ -331,10 +422,23 @@ def mark_as_unread(db: Session, user_id: int, book_id: int) -> bool:
             return True
     return False
 
-def get_user_read_books(db: Session, user_id: int) -> List[models.Book]:
-    """Получить прочитанные книги пользователя"""
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    return user.read if user else []
+def get_user_read_books(
+    db: Session,
+    user_id: int,
+    cursor: Optional[int] = None,
+    limit: int = 100,
+    tag: Optional[str] = None,
+    genre: Optional[str] = None,
+    author: Optional[str] = None,
+    search: Optional[str] = None,
+    with_description: bool = True
+) -> List[models.Book]:
+    """Получить прочитанные книги пользователя с фильтрацией и пагинацией по курсору"""
+    return _get_user_shelf(
+        db, models.read_books, user_id, cursor=cursor, limit=limit,
+        tag=tag, genre=genre, author=author, search=search,
+        with_description=with_description
+    )
 
 def is_read(db: Session, user_id: int, book_id: int) -> bool:
     """Проверить, прочитана ли книга"""
@@ -356,13 +460,44 @@ def create_review(db: Session, user_id: int, review: schemas.ReviewCreate) -> mo
     db.refresh(db_review)
     return db_review
 
-def get_book_reviews(db: Session, book_id: int, skip: int = 0, limit: int = 100) -> List[models.Review]:
-    """Получить отзывы на книгу"""
-    return db.query(models.Review).filter(
-        models.Review.book_id == book_id
-    ).order_by(
-        models.Review.created_at.desc()
-    ).offset(skip).limit(limit).all()
+def get_book_reviews(
+    db: Session,
+    book_id: int,
+    cursor: Optional[int] = None,
+    limit: int = 100
+) -> list:
+    """
+    Получить отзывы на книгу вместе с именами авторов одним запросом
+    
+    Возвращает строки с полями ReviewResponse (id, user_id, book_id, text,
+    created_at, user_name), новые первыми. cursor — ID последнего отзыва
+    предыдущей страницы.
+    """
+    query = db.query(
+        models.Review.id,
+        models.Review.user_id,
+        models.Review.book_id,
+        models.Review.text,
+        models.Review.created_at,
+        models.User.full_name.label("user_name")
+    ).join(
+        models.User, models.User.id == models.Review.user_id
+    ).filter(
+        models.Review.book_id == book_id,
+        moderation.visible_reviews()
+    )
+    
+    if cursor is not None:
+        query = query.filter(models.Review.id < cursor)
+    
+    return query.order_by(models.Review.id.desc()).limit(limit).all()
+
+def get_book_reviews_count(db: Session, book_id: int) -> int:
+    """Получить количество отзывов на книгу"""
+    return db.query(func.count(models.Review.id)).filter(
+        models.Review.book_id == book_id,
+        moderation.visible_reviews()
+    ).scalar() or 0
 
 def get_user_reviews(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[models.Review]:
     """Получить отзывы пользователя"""
@@ -426,29 +561,8 @@ def get_total_reviews_count(db: Session) -> int:
     return db.query(func.count(models.Review.id)).scalar()
 
 def get_user_statistics(db: Session, user_id: int) -> dict:
-    """Получить статистику пользователя"""
-    favorites_count = db.query(func.count(models.favorites.c.book_id)).filter(
-        models.favorites.c.user_id == user_id
-    ).scalar()
-    
-    read_count = db.query(func.count(models.read_books.c.book_id)).filter(
-        models.read_books.c.user_id == user_id
-    ).scalar()
-    
-    reviews_count = db.query(func.count(models.Review.id)).filter(
-        models.Review.user_id == user_id
-    ).scalar()
-    
-    ratings_count = db.query(func.count(models.Rating.id)).filter(
-        models.Rating.user_id == user_id
-    ).scalar()
-    
-    return {
-        "favorites_count": favorites_count or 0,
-        "read_count": read_count or 0,
-        "reviews_count": reviews_count or 0,
-        "ratings_count": ratings_count or 0
-    }
+    """Получить статистику пользователя (одним запросом, см. statistics.compute_user_statistics)"""
+    return statistics.compute_user_statistics(db, user_id)
 
 # Добавить в конец файла
 
@@ -484,13 +598,51 @@ def create_review_report(
     db.refresh(report)
     return report
 
-def get_pending_reports(db: Session, skip: int = 0, limit: int = 100) -> List[models.ReviewReport]:
-    """Получить список необработанных жалоб"""
-    return db.query(models.ReviewReport).filter(
+def get_pending_reports(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[int] = None
+) -> list:
+    """
+    Получить необработанные жалобы вместе с отзывом, его автором и автором жалобы
+    
+    Один запрос с join'ами вместо ленивой загрузки review, review.user и reporter
+    для каждой строки. cursor — ID последней жалобы предыдущей страницы.
+    """
+    review_author = aliased(models.User)
+    reporter = aliased(models.User)
+    
+    query = db.query(
+        models.ReviewReport.id,
+        models.ReviewReport.review_id,
+        models.ReviewReport.reporter_id,
+        models.ReviewReport.reason,
+        models.ReviewReport.comment,
+        models.ReviewReport.status,
+        models.ReviewReport.created_at,
+        models.ReviewReport.resolved_at,
+        models.ReviewReport.resolved_by,
+        models.Review.user_id.label("review_user_id"),
+        models.Review.book_id.label("review_book_id"),
+        models.Review.text.label("review_text"),
+        models.Review.created_at.label("review_created_at"),
+        review_author.full_name.label("review_user_name"),
+        reporter.full_name.label("reporter_name")
+    ).join(
+        models.Review, models.Review.id == models.ReviewReport.review_id
+    ).join(
+        review_author, review_author.id == models.Review.user_id
+    ).join(
+        reporter, reporter.id == models.ReviewReport.reporter_id
+    ).filter(
         models.ReviewReport.status == "pending"
-    ).order_by(
-        models.ReviewReport.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    )
+    
+    if cursor is not None:
+        query = query.filter(models.ReviewReport.id < cursor)
+    
+    return query.order_by(models.ReviewReport.id.desc()).offset(skip).limit(limit).all()
 
 def get_report_by_id(db: Session, report_id: int) -> Optional[models.ReviewReport]:
     """Получить жалобу по ID"""
@@ -498,44 +650,16 @@ def get_report_by_id(db: Session, report_id: int) -> Optional[models.ReviewRepor
         models.ReviewReport.id == report_id
     ).first()
 
-def resolve_report(
-    db: Session,
-    report_id: int,
-    admin_id: int,
-    action: str  # dismiss, delete_review
-) -> Optional[models.ReviewReport]:
-    """Обработать жалобу"""
-    report = get_report_by_id(db, report_id)
-    if not report:
-        return None
-    
-    report.status = "resolved" if action == "dismiss" else "resolved"
-    report.resolved_at = datetime.utcnow()
-    report.resolved_by = admin_id
-    
-    # Если нужно удалить отзыв
-    if action == "delete_review":
-        delete_review(db, report.review_id)
-    
-    db.commit()
-    db.refresh(report)
-    return report
-
 def get_reports_count(db: Session) -> dict:
-    """Получить статистику по жалобам"""
-    total = db.query(func.count(models.ReviewReport.id)).scalar()
-    pending = db.query(func.count(models.ReviewReport.id)).filter(
-        models.ReviewReport.status == "pending"
-    ).scalar()
-    resolved = db.query(func.count(models.ReviewReport.id)).filter(
-        models.ReviewReport.status == "resolved"
-    ).scalar()
-    
-    return {
-        "total": total or 0,
-        "pending": pending or 0,
-        "resolved": resolved or 0
-    }
+    """Получить статистику по жалобам одним запросом"""
+    report = models.ReviewReport
+    row = db.query(
+        func.count(report.id).label("total"),
+        func.count(report.id).filter(report.status == "pending").label("pending"),
+        func.count(report.id).filter(report.status == "resolved").label("resolved"),
+        func.count(report.id).filter(report.status == "dismissed").label("dismissed")
+    ).one()
+    return {key: value or 0 for key, value in row._mapping.items()}
 
 # ============ BOOKMARKS OPERATIONS ============
 
@@ -633,3 +757,152 @@ def delete_note(db: Session, note_id: int, user_id: int) -> bool:
         db.commit()
         return True
     return False
+
+# ============ ANNOTATIONS SYNC ============
+
+def _latest_by_key(items, key) -> list:
+    """Оставить по одной операции на ключ — с самой поздней меткой времени клиента"""
+    latest = {}
+    for item in items:
+        k = key(item)
+        if k is None:
+            continue
+        if k not in latest or item.client_ts >= latest[k].client_ts:
+            latest[k] = item
+    return list(latest.values())
+
+def get_annotations_state(db: Session, user_id: int, book_id: int) -> dict:
+    """Получить закладки и заметки пользователя для книги вместе с токеном версии"""
+    bookmarks = db.query(models.Bookmark.page, models.Bookmark.created_at).filter(
+        and_(
+            models.Bookmark.user_id == user_id,
+            models.Bookmark.book_id == book_id
+        )
+    ).order_by(models.Bookmark.page).all()
+    
+    notes = db.query(
+        models.Note.id, models.Note.client_id, models.Note.page, models.Note.text,
+        models.Note.created_at, models.Note.updated_at
+    ).filter(
+        and_(
+            models.Note.user_id == user_id,
+            models.Note.book_id == book_id
+        )
+    ).order_by(models.Note.page, models.Note.id).all()
+    
+    digest = hashlib.sha1()
+    for b in bookmarks:
+        digest.update(f"b{b.page}:{b.created_at};".encode())
+    for n in notes:
+        digest.update(f"n{n.id}:{n.updated_at};".encode())
+    
+    return {
+        "bookmarks": [dict(b._mapping) for b in bookmarks],
+        "notes": [dict(n._mapping) for n in notes],
+        "version": digest.hexdigest()[:16],
+    }
+
+def sync_annotations(
+    db: Session,
+    user_id: int,
+    book_id: int,
+    bookmarks: List[schemas.BookmarkSyncItem],
+    notes: List[schemas.NoteSyncItem]
+) -> dict:
+    """
+    Применить пакет изменений закладок и заметок одной транзакцией
+    
+    Конфликты разрешаются по времени клиента (последняя запись побеждает):
+    удаление применяется, если запись на сервере не новее, правка — если она
+    старше. updated_at заметки хранит время клиента (триггер его не затирает).
+    Офлайн-заметки адресуются client_id и вставляются через ON CONFLICT DO UPDATE,
+    поэтому повторная отправка того же пакета не создает дубликатов.
+    """
+    bookmarks = _latest_by_key(bookmarks, lambda b: b.page)
+    notes = _latest_by_key(notes, lambda n: ("id", n.id) if n.id else ("client", n.client_id) if n.client_id else None)
+    
+    # Закладки
+    added = [b for b in bookmarks if not b.deleted]
+    if added:
+        db.execute(
+            pg_insert(models.Bookmark).values([
+                {"user_id": user_id, "book_id": book_id, "page": b.page, "created_at": b.client_ts}
+                for b in added
+            ]).on_conflict_do_nothing(index_elements=["user_id", "book_id", "page"])
+        )
+    
+    removed = [b for b in bookmarks if b.deleted]
+    if removed:
+        db.execute(
+            delete(models.Bookmark).where(
+                models.Bookmark.user_id == user_id,
+                models.Bookmark.book_id == book_id,
+                or_(*[
+                    and_(models.Bookmark.page == b.page, models.Bookmark.created_at <= b.client_ts)
+                    for b in removed
+                ])
+            )
+        )
+    
+    # Заметки: удаление по id или client_id
+    removed = [n for n in notes if n.deleted]
+    if removed:
+        db.execute(
+            delete(models.Note).where(
+                models.Note.user_id == user_id,
+                models.Note.book_id == book_id,
+                or_(*[
+                    and_(
+                        models.Note.id == n.id if n.id else models.Note.client_id == n.client_id,
+                        models.Note.updated_at <= n.client_ts
+                    )
+                    for n in removed
+                ])
+            )
+        )
+    
+    # Заметки: правка существующих по серверному id
+    changed = [n for n in notes if not n.deleted and n.id]
+    if changed:
+        db.execute(
+            update(models.Note.__table__).where(
+                models.Note.id == bindparam("note_id"),
+                models.Note.user_id == user_id,
+                models.Note.book_id == book_id,
+                # Строго раньше: повтор той же пачки ничего не меняет (иначе триггер
+                # PostgreSQL заменил бы неизменившийся updated_at на NOW())
+                models.Note.updated_at < bindparam("client_ts")
+            ).values(page=bindparam("note_page"), text=bindparam("note_text"), updated_at=bindparam("client_ts")),
+            [
+                {"note_id": n.id, "note_page": n.page, "note_text": n.text, "client_ts": n.client_ts}
+                for n in changed
+            ]
+        )
+    
+    # Заметки: вставка или правка офлайн-заметок по client_id
+    created = [n for n in notes if not n.deleted and not n.id and n.client_id]
+    if created:
+        insert_stmt = pg_insert(models.Note).values([
+            {
+                "user_id": user_id, "book_id": book_id, "client_id": n.client_id,
+                "page": n.page, "text": n.text, "created_at": n.client_ts, "updated_at": n.client_ts
+            }
+            for n in created
+        ])
+        db.execute(
+            insert_stmt.on_conflict_do_update(
+                index_elements=["user_id", "client_id"],
+                set_={
+                    "page": insert_stmt.excluded.page,
+                    "text": insert_stmt.excluded.text,
+                    "updated_at": insert_stmt.excluded.updated_at,
+                },
+                where=and_(
+                    models.Note.book_id == insert_stmt.excluded.book_id,
+                    models.Note.updated_at < insert_stmt.excluded.updated_at
+                )
+            )
+        )
+    
+    db.commit()
+    return get_annotations_state(db, user_id, book_id)
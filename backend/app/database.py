@@ -1,16 +1,135 @@
-from sqlalchemy import create_engine
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(
+    settings.DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_pre_ping=True
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+logger = logging.getLogger(__name__)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def wait_for_db(attempts: Optional[int] = None, delay: Optional[float] = None) -> None:
+    """
+    Дождаться готовности БД перед стартом воркера
+
+    Пауза между попытками удваивается (не больше 5 секунд); после последней
+    неудачной попытки исключение пробрасывается дальше.
+    """
+    attempts = attempts or settings.DB_CONNECT_ATTEMPTS
+    delay = settings.DB_CONNECT_DELAY if delay is None else delay
+    for attempt in range(1, attempts + 1):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return
+        except OperationalError:
+            if attempt == attempts:
+                raise
+            logger.warning("БД недоступна (попытка %d из %d), повтор через %.1f с", attempt, attempts, delay)
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+
+# Ключ pg_advisory_xact_lock: схему создает один процесс, остальные ждут и видят ее готовой
+SCHEMA_LOCK_KEY = 0x736368656D61  # "schema"
+
+def create_schema(metadata) -> None:
+    """
+    Создать таблицы и DDL из after_create в одной транзакции
+
+    Воркеры gunicorn, воркер задач и импорт стартуют одновременно; на PostgreSQL
+    create_all выполняется под advisory lock, чтобы они не создавали одни и те
+    же таблицы, функции и триггеры параллельно.
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        metadata.create_all(bind=conn)
+
+# ============ УЧЕТ ЗАПРОСОВ К БД ============
+
+_LITERAL_RE = re.compile(r"%\(\w+\)s|\?|\$\d+|'(?:[^']|'')*'|\b\d+\b")
+_REPEATED_PLACEHOLDER_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """Форма SQL-запроса: параметры, литералы и списки IN (...) заменены на ?"""
+    shape = _LITERAL_RE.sub("?", statement)
+    shape = _REPEATED_PLACEHOLDER_RE.sub("?", shape)
+    return _WHITESPACE_RE.sub(" ", shape).strip()
+
+class QueryStats:
+    """Количество и суммарное время SQL-запросов в рамках одного HTTP-запроса"""
+
+    def __init__(self, record_shapes: bool = False):
+        self.statements = 0
+        self.duration = 0.0
+        self.record_shapes = record_shapes
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.statements += 1
+        self.duration += duration
+        if self.record_shapes:
+            self.shapes[statement_shape(statement)] += 1
+
+# Устанавливается middleware на время обработки запроса
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+@contextmanager
+def track_queries(record_shapes: bool = False) -> Iterator[QueryStats]:
+    """
+    Учитывать SQL-запросы текущего контекста в QueryStats
+
+    Вложенные вызовы (например, профилирование поверх метрик) используют
+    уже установленный объект.
+    """
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record_shapes = stats.record_shapes or record_shapes
+        yield stats
+        return
+    stats = QueryStats(record_shapes)
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+@event.listens_for(engine, "handle_error")
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
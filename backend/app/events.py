@@ -0,0 +1,269 @@
+"""
+События в реальном времени (Server-Sent Events) через LISTEN/NOTIFY
+
+Триггеры на reviews, ratings и review_reports отправляют pg_notify в
+канал library_events. В каждом воркере одно выделенное соединение
+слушает канал в фоновом потоке и раздает события подписчикам в памяти:
+каналы book:<id> (отзывы и оценки книги) и admin (жалобы). Открытые
+страницы не держат соединений с БД и не опрашивают ее — после события
+клиент сам перезапрашивает нужные данные.
+
+Тот же канал несет уведомления самого приложения (events.notify), например
+инвалидацию HTTP-кэша из любого процесса; их разбирают обработчики,
+зарегистрированные через notify_handler.
+
+Если соединение слушателя рвется, после переподключения подписчикам
+отправляется resync, а обработчики уведомлений получают {"op": "resync"}:
+события за время разрыва потеряны.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, Iterable, Optional, Set
+
+from sqlalchemy import DDL, event, text
+
+from . import models
+from .config import settings
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "library_events"
+ADMIN_CHANNEL = "admin"
+RESYNC = "resync"
+
+# Таблица -> имя события для клиента
+EVENT_NAMES = {"reviews": "review", "ratings": "rating", "review_reports": "report"}
+
+# Тип уведомления приложения -> обработчик(message), вызывается в потоке слушателя
+NOTIFY_HANDLERS: Dict[str, Callable[[dict], None]] = {}
+
+# ============ ТРИГГЕРЫ УВЕДОМЛЕНИЙ (PostgreSQL) ============
+
+# Отзывы и оценки: по строке, с book_id. Одинаковые уведомления внутри
+# транзакции PostgreSQL объединяет, поэтому пакетные изменения по одной
+# книге дают одно событие.
+_row_notify_function = DDL(f"""
+CREATE OR REPLACE FUNCTION library_events_notify_row()
+RETURNS TRIGGER AS $$
+DECLARE
+    item JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        item := to_jsonb(OLD);
+    ELSE
+        item := to_jsonb(NEW);
+    END IF;
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', json_build_object(
+        'table', TG_TABLE_NAME, 'op', lower(TG_OP), 'book_id', item->'book_id'
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+
+# Жалобы: одно уведомление на оператор — админке достаточно знать, что очередь изменилась
+_statement_notify_function = DDL(f"""
+CREATE OR REPLACE FUNCTION library_events_notify_statement()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', json_build_object(
+        'table', TG_TABLE_NAME, 'op', lower(TG_OP)
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+
+for _function in (_row_notify_function, _statement_notify_function):
+    event.listen(models.Base.metadata, "after_create", _function.execute_if(dialect="postgresql"))
+
+for _table, _level, _function_name in (
+    ("reviews", "ROW", "library_events_notify_row"),
+    ("ratings", "ROW", "library_events_notify_row"),
+    ("review_reports", "STATEMENT", "library_events_notify_statement"),
+):
+    event.listen(models.Base.metadata, "after_create", DDL(f"""
+CREATE OR REPLACE TRIGGER library_events_{_table}
+    AFTER INSERT OR UPDATE OR DELETE ON {_table}
+    FOR EACH {_level} EXECUTE FUNCTION {_function_name}()
+""").execute_if(dialect="postgresql"))
+
+def book_channel(book_id: int) -> str:
+    return f"book:{book_id}"
+
+# ============ УВЕДОМЛЕНИЯ ПРИЛОЖЕНИЯ ============
+
+def notify_handler(kind: str):
+    """Зарегистрировать обработчик уведомлений типа kind во всех воркерах API"""
+    def decorator(func):
+        NOTIFY_HANDLERS[kind] = func
+        return func
+    return decorator
+
+def notify(kind: str, **data) -> None:
+    """Отправить уведомление всем воркерам API, в том числе из других процессов (только PostgreSQL)"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": NOTIFY_CHANNEL, "payload": json.dumps({"table": kind, **data})}
+        )
+
+# ============ РАЗДАЧА ПОДПИСЧИКАМ ============
+
+class EventHub:
+    """
+    Подписчики воркера по каналам
+
+    Очереди живут в event loop воркера; поток слушателя публикует через
+    call_soon_threadsafe. Переполненная очередь (клиент не успевает
+    читать) заменяется одним resync.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._channels: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.subscribers = 0
+
+    def subscribe(self, channels: Iterable[str]) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        for channel in channels:
+            self._channels[channel].add(queue)
+        self.subscribers += 1
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, channels: Iterable[str]) -> None:
+        for channel in channels:
+            subscribers = self._channels.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._channels[channel]
+        self.subscribers -= 1
+
+    def publish(self, channel: Optional[str], name: str, data: dict) -> None:
+        """Отправить событие в канал (None — всем подписчикам); только из event loop"""
+        if channel is None:
+            queues = set().union(*self._channels.values()) if self._channels else set()
+        else:
+            queues = self._channels.get(channel, ())
+        for queue in queues:
+            try:
+                queue.put_nowait((name, data))
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait((RESYNC, {}))
+
+    def publish_threadsafe(self, channel: Optional[str], name: str, data: dict) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.publish, channel, name, data)
+
+
+hub = EventHub(settings.EVENTS_QUEUE_SIZE)
+
+def dispatch(payload: str) -> None:
+    """Разобрать уведомление из PostgreSQL и разослать по каналам"""
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.warning("Некорректное уведомление: %r", payload)
+        return
+    handler = NOTIFY_HANDLERS.get(message.get("table"))
+    if handler is not None:
+        handler(message)
+        return
+    name = EVENT_NAMES.get(message.get("table"))
+    if name is None:
+        return
+    data = {"op": message.get("op")}
+    if name == "report":
+        hub.publish_threadsafe(ADMIN_CHANNEL, name, data)
+    elif message.get("book_id") is not None:
+        data["book_id"] = message["book_id"]
+        hub.publish_threadsafe(book_channel(message["book_id"]), name, data)
+
+async def stream(channels: Iterable[str]) -> AsyncIterator[str]:
+    """Поток SSE для подписчика; heartbeat-комментарий держит соединение через прокси"""
+    channels = list(channels)
+    queue = hub.subscribe(channels)
+    try:
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+        while True:
+            try:
+                name, data = await asyncio.wait_for(queue.get(), timeout=settings.EVENTS_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {name}\ndata: {json.dumps(data)}\n\n"
+    finally:
+        hub.unsubscribe(queue, channels)
+
+# ============ СЛУШАТЕЛЬ ============
+
+_stop_event = threading.Event()
+_listener: Optional[threading.Thread] = None
+
+def _listen_loop() -> None:
+    delay = 1.0
+    reconnect = False
+    while not _stop_event.is_set():
+        connection = None
+        try:
+            # Соединение выводится из пула: оно занято LISTEN все время работы воркера
+            connection = engine.raw_connection()
+            connection.detach()
+            raw = connection.driver_connection
+            raw.autocommit = True
+            with raw.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            if reconnect:
+                hub.publish_threadsafe(None, RESYNC, {})
+                for handler in NOTIFY_HANDLERS.values():
+                    handler({"op": RESYNC})
+            delay = 1.0
+            while not _stop_event.is_set():
+                if select.select([raw], [], [], 1.0) == ([], [], []):
+                    continue
+                raw.poll()
+                while raw.notifies:
+                    dispatch(raw.notifies.pop(0).payload)
+        except Exception:
+            logger.exception("Слушатель событий отключился, повтор через %.0f с", delay)
+            reconnect = True
+            _stop_event.wait(delay)
+            delay = min(delay * 2, 30.0)
+        finally:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+def start_listener() -> None:
+    """Запустить слушателя LISTEN/NOTIFY (один на воркер, только PostgreSQL)"""
+    global _listener
+    if engine.dialect.name != "postgresql":
+        return
+    if _listener is not None and _listener.is_alive():
+        return
+    _stop_event.clear()
+    _listener = threading.Thread(target=_listen_loop, name="events-listener", daemon=True)
+    _listener.start()
+
+def stop_listener() -> None:
+    """Остановить слушателя"""
+    global _listener
+    _stop_event.set()
+    if _listener is not None:
+        _listener.join(timeout=5)
+        _listener = None
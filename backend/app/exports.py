@@ -0,0 +1,132 @@
+"""
+Потоковая выгрузка каталога, отзывов и оценок (CSV/JSONL)
+
+Строки читаются серверным курсором порциями по EXPORT_BATCH_SIZE
+(yield_per) и сразу кодируются в ответ, поэтому память воркера не
+зависит от размера таблицы. С gzip=True отдается готовый .gz-файл,
+сжатый на лету; без него ответ при Accept-Encoding сжимает
+CompressionMiddleware, также потоково.
+"""
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional
+
+import orjson
+from sqlalchemy import func, select
+from sqlalchemy.sql import Select
+
+from . import models
+from .config import settings
+from .database import SessionLocal
+
+MEDIA_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+def _books_query(since: Optional[datetime]) -> Select:
+    ratings = select(
+        models.Rating.book_id,
+        func.avg(models.Rating.value).label("average_rating"),
+        func.count().label("ratings_count")
+    ).group_by(models.Rating.book_id).subquery()
+    query = select(
+        models.Book.id,
+        models.Book.filename,
+        models.Book.title,
+        models.Book.author,
+        models.Book.tag,
+        models.Book.genre,
+        models.Book.description,
+        models.Book.created_at,
+        ratings.c.average_rating,
+        func.coalesce(ratings.c.ratings_count, 0).label("ratings_count")
+    ).outerjoin(ratings, ratings.c.book_id == models.Book.id)
+    if since is not None:
+        query = query.where(models.Book.created_at >= since)
+    return query.order_by(models.Book.id)
+
+def _reviews_query(since: Optional[datetime]) -> Select:
+    query = select(
+        models.Review.id,
+        models.Review.book_id,
+        models.Review.user_id,
+        models.Review.text,
+        models.Review.created_at
+    )
+    if since is not None:
+        query = query.where(models.Review.created_at >= since)
+    return query.order_by(models.Review.id)
+
+def _ratings_query(since: Optional[datetime]) -> Select:
+    query = select(
+        models.Rating.id,
+        models.Rating.book_id,
+        models.Rating.user_id,
+        models.Rating.value,
+        models.Rating.created_at
+    )
+    if since is not None:
+        query = query.where(models.Rating.created_at >= since)
+    return query.order_by(models.Rating.id)
+
+
+EXPORTS: Dict[str, Callable[[Optional[datetime]], Select]] = {
+    "books": _books_query,
+    "reviews": _reviews_query,
+    "ratings": _ratings_query,
+}
+
+# ============ КОДИРОВАНИЕ ============
+
+def _csv_chunks(columns, partitions) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for rows in partitions:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def _jsonl_chunks(columns, partitions) -> Iterator[bytes]:
+    for rows in partitions:
+        yield b"".join(orjson.dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    # wbits=31 — формат gzip с заголовком, как в CompressionMiddleware
+    compressor = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+# ============ ВЫГРУЗКА ============
+
+def export_filename(resource: str, fmt: str, gzip: bool = False) -> str:
+    """Имя файла для Content-Disposition"""
+    return f"{resource}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}" + (".gz" if gzip else "")
+
+def stream_export(
+    resource: str,
+    fmt: str = "csv",
+    since: Optional[datetime] = None,
+    gzip: bool = False
+) -> Iterator[bytes]:
+    """
+    Выгрузка порциями байт для StreamingResponse
+
+    Сессия своя: ответ отдается уже после выхода из зависимостей запроса.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(EXPORTS[resource](since).execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        columns = list(result.keys())
+        encode = _csv_chunks if fmt == "csv" else _jsonl_chunks
+        chunks = encode(columns, result.partitions())
+        yield from _gzip(chunks) if gzip else chunks
+    finally:
+        db.close()
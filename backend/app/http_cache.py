@@ -0,0 +1,241 @@
+"""
+HTTP-кэш ответов каталога для анонимных посетителей
+
+Запросы GET без заголовка Authorization к каталогу (/api/books,
+/api/books/{id}, /api/books/{id}/similar, /api/reviews/{book_id},
+/api/filters/*) отдаются из памяти процесса по ключу «путь + отсортированная
+строка запроса». Ответы получают слабый ETag и Cache-Control: public,
+max-age, на If-None-Match отвечаем 304. Ответы этих путей (и анонимные, и с
+токеном) получают Vary: Authorization, чтобы браузер и общие кэши не отдали
+анонимный ответ (is_favorite, is_read = false) на запрос с токеном.
+
+Каждая запись помечена тегами (catalog, book:<id>, reviews); код записи
+вызывает invalidate(...) с нужными тегами — в API или в воркере задач.
+Кэш у каждого воркера свой: invalidate сразу чистит кэш своего процесса и
+рассылает теги остальным через NOTIFY (events.notify). Уведомления,
+пропущенные при обрыве LISTEN, заменяет полная очистка; без PostgreSQL и в
+nginx (см. proxy_cache в frontend/nginx.conf) устаревание ограничено
+HTTP_CACHE_TTL.
+"""
+import hashlib
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, Optional, Set
+from urllib.parse import parse_qsl, urlencode
+
+from .cache import TTLCache
+from .compression import with_vary
+from .config import settings
+from . import events, metrics
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TAG = "catalog"
+REVIEWS_TAG = "reviews"
+# Тип уведомления events.notify с тегами для инвалидации в других процессах
+INVALIDATE_NOTIFY = "http_cache"
+
+# Шаблон пути -> функция, возвращающая теги записи
+CACHEABLE_ROUTES = (
+    (re.compile(r"^/api/books$"), lambda m: {CATALOG_TAG}),
+    (re.compile(r"^/api/books/(\d+)$"), lambda m: {CATALOG_TAG, book_tag(m.group(1))}),
+    (re.compile(r"^/api/reviews/(\d+)$"), lambda m: {REVIEWS_TAG, book_tag(m.group(1))}),
+    (re.compile(r"^/api/books/(\d+)/similar$"), lambda m: {CATALOG_TAG, book_tag(m.group(1))}),
+    (re.compile(r"^/api/filters/\w+$"), lambda m: {CATALOG_TAG}),
+)
+
+
+def book_tag(book_id) -> str:
+    """Тег всех закэшированных ответов, относящихся к книге"""
+    return f"book:{book_id}"
+
+
+def make_etag(body: bytes) -> str:
+    """Слабый ETag по содержимому тела ответа"""
+    return 'W/"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение ETag из If-None-Match (RFC 9110, 13.1.2)"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def normalize_key(path: str, query_string: bytes) -> str:
+    """Ключ кэша: путь и параметры запроса в отсортированном порядке"""
+    params = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    if not params:
+        return path
+    return f"{path}?{urlencode(sorted(params))}"
+
+
+class ResponseCache(TTLCache):
+    """TTLCache ответов с индексом тегов для инвалидации"""
+
+    def __init__(self, ttl: float, maxsize: int = 2048):
+        super().__init__(ttl, maxsize)
+        self._tags: Dict[str, Set[str]] = defaultdict(set)
+
+    def get(self, key: str) -> Optional[tuple]:
+        """Получить (status, headers, body, etag) или None"""
+        entry = super().get(key)
+        return None if entry is None else entry[1]
+
+    def set(self, key: str, response: tuple, tags: Set[str]) -> None:
+        """Сохранить ответ под ключом с набором тегов"""
+        with self._lock:
+            super().set(key, (frozenset(tags), response))
+            if key in self._data:
+                for tag in tags:
+                    self._tags[tag].add(key)
+
+    def invalidate_tags(self, *tags: str) -> None:
+        """Удалить все записи с любым из тегов"""
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._discard(key)
+
+    def clear(self) -> None:
+        """Очистить кэш"""
+        with self._lock:
+            super().clear()
+            self._tags.clear()
+
+    def _removed(self, key: str, entry: tuple) -> None:
+        for tag in entry[0]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+response_cache = ResponseCache(ttl=settings.HTTP_CACHE_TTL, maxsize=settings.HTTP_CACHE_MAXSIZE)
+
+
+def invalidate(*tags: str) -> None:
+    """Инвалидировать закэшированные ответы по тегам в этом и во всех остальных процессах"""
+    response_cache.invalidate_tags(*tags)
+    try:
+        events.notify(INVALIDATE_NOTIFY, tags=list(tags))
+    except Exception:
+        # Запись уже выполнена; остальные воркеры догонят по HTTP_CACHE_TTL
+        logger.warning("Не удалось разослать инвалидацию HTTP-кэша %s", tags, exc_info=True)
+
+@events.notify_handler(INVALIDATE_NOTIFY)
+def _on_notify(message: dict) -> None:
+    if message.get("op") == events.RESYNC:
+        response_cache.clear()
+    else:
+        response_cache.invalidate_tags(*message.get("tags", ()))
+
+
+def _route_tags(path: str) -> Optional[Set[str]]:
+    for pattern, tags in CACHEABLE_ROUTES:
+        match = pattern.match(path)
+        if match:
+            return tags(match)
+    return None
+
+
+class HTTPCacheMiddleware:
+    """ASGI middleware кэша анонимных ответов каталога с поддержкой ETag/304"""
+
+    def __init__(self, app, cache: ResponseCache = response_cache):
+        self.app = app
+        self.cache = cache
+        self.cache_control = f"public, max-age={settings.HTTP_CACHE_MAX_AGE}".encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        tags = _route_tags(scope["path"])
+        if tags is None:
+            await self.app(scope, receive, send)
+            return
+        if b"authorization" in headers:
+            await self.app(scope, receive, _vary_authorization(send))
+            return
+
+        key = normalize_key(scope["path"], scope.get("query_string", b""))
+        if_none_match = headers.get(b"if-none-match", b"").decode("latin-1")
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            status, response_headers, body, etag = cached
+            metrics.HTTP_CACHE_REQUESTS.labels("hit").inc()
+            await self._send(send, status, response_headers, body, etag, if_none_match, b"HIT")
+            return
+
+        metrics.HTTP_CACHE_REQUESTS.labels("miss").inc()
+        state = {"start": None, "chunks": [], "streaming": False}
+
+        async def send_wrapper(message):
+            if state["streaming"]:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Кэшируем только успешные ответы; остальное отдаем как есть
+                if message["status"] != 200:
+                    state["streaming"] = True
+                    await send({**message, "headers": with_vary(message.get("headers", []), "Authorization")})
+                else:
+                    state["start"] = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            state["chunks"].append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(state["chunks"])
+            start = state["start"]
+            response_headers = [
+                (name, value) for name, value in start.get("headers", [])
+                if name not in (b"etag", b"cache-control")
+            ]
+            etag = make_etag(body)
+            if len(body) <= settings.HTTP_CACHE_MAX_BODY:
+                self.cache.set(key, (start["status"], response_headers, body, etag), tags)
+            await self._send(send, start["status"], response_headers, body, etag, if_none_match, b"MISS")
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send(self, send, status, response_headers, body, etag, if_none_match, result):
+        cache_headers = [
+            (b"etag", etag.encode("latin-1")),
+            (b"cache-control", self.cache_control),
+            (b"x-cache", result),
+            (b"vary", b"Authorization"),
+        ]
+        if if_none_match and etag_matches(if_none_match, etag):
+            metrics.HTTP_CACHE_REQUESTS.labels("not_modified").inc()
+            await send({"type": "http.response.start", "status": 304, "headers": cache_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        headers = with_vary(response_headers + cache_headers, "Authorization")
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def _vary_authorization(send):
+    """send, добавляющий Vary: Authorization к ответу на запрос с токеном"""
+    async def wrapper(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": with_vary(message.get("headers", []), "Authorization")}
+        await send(message)
+    return wrapper
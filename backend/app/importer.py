@@ -0,0 +1,364 @@
+"""
+Массовый импорт книг по манифесту (CSV или JSONL)
+
+Манифест описывает файлы из исходной директории и их метаданные:
+
+    file,title,author,tag,genre,description
+    partner/0001.pdf,Тимур и его команда,Аркадий Гайдар,детям,повесть,
+
+Строки проверяются по мере чтения и сразу уходят через COPY во временную
+таблицу; в books они переносятся одним INSERT ... SELECT ... ON CONFLICT,
+который возвращает id добавленных книг. Уже существующие книги попадают
+в отчет как конфликты. Файлы добавленных книг копируются в хранилище
+книг параллельно, книги с неудачно скопированным файлом удаляются в той же
+транзакции. С --move исходные файлы удаляются только после коммита; если
+коммит не прошел, удаляются уже сделанные копии.
+
+    python -m app.importer manifest.csv --source-dir /data/partner [--move]
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, text
+from sqlalchemy.orm import Session
+
+from . import models, storage
+from .config import settings
+from .database import SessionLocal, create_schema, wait_for_db
+from .utils import build_book_filename
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+REQUIRED_FIELDS = ("file", "title", "author", "tag", "genre")
+STAGING_COLUMNS = ("line", "filename", "title", "author", "tag", "genre", "description")
+
+# Вставка в staging без COPY (не PostgreSQL) идет порциями
+_INSERT_CHUNK = 5000
+
+# (номер строки, имя файла в каталоге, title, author, tag, genre, description)
+StagedRow = Tuple[int, str, str, str, str, str, str]
+
+
+class ImportReport:
+    """Итог импорта; списки ошибок и конфликтов ограничены IMPORT_MAX_ERRORS"""
+
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.errors: List[dict] = []
+        self.errors_total = 0
+        self.conflicts: List[dict] = []
+        self.conflicts_total = 0
+        self.timings: Dict[str, float] = {}
+
+    def error(self, line: int, message: str) -> None:
+        self.errors_total += 1
+        if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def conflict(self, line: int, filename: str) -> None:
+        self.conflicts_total += 1
+        if len(self.conflicts) < settings.IMPORT_MAX_ERRORS:
+            self.conflicts.append({"line": line, "filename": filename})
+
+    def as_dict(self) -> dict:
+        return {
+            "message": f"Импортировано книг: {self.imported} из {self.rows}",
+            "rows": self.rows,
+            "imported": self.imported,
+            "conflicts_total": self.conflicts_total,
+            "errors_total": self.errors_total,
+            "conflicts": self.conflicts,
+            "errors": self.errors,
+            "timings": {name: round(value, 3) for name, value in self.timings.items()},
+        }
+
+# ============ МАНИФЕСТ ============
+
+def detect_format(filename: str) -> str:
+    """Формат манифеста по расширению"""
+    fmt = FORMATS.get(os.path.splitext(filename or "")[1].lower())
+    if fmt is None:
+        raise ValueError("Манифест должен быть в формате CSV или JSONL")
+    return fmt
+
+def resolve_source_dir(source_dir: str) -> str:
+    """Исходная директория внутри IMPORT_DIRECTORY (для запросов через API)"""
+    root = os.path.realpath(settings.IMPORT_DIRECTORY)
+    path = os.path.realpath(os.path.join(root, source_dir))
+    if os.path.commonpath([root, path]) != root or not os.path.isdir(path):
+        raise ValueError("Директория с файлами не найдена")
+    return path
+
+def save_manifest(source: BinaryIO, fmt: str) -> str:
+    """Сохранить загруженный манифест, не читая его в память целиком"""
+    manifests_dir = os.path.join(settings.IMPORT_DIRECTORY, "manifests")
+    os.makedirs(manifests_dir, exist_ok=True)
+    path = os.path.join(manifests_dir, f"{uuid.uuid4().hex}.{fmt}")
+    with open(path, "wb") as target:
+        shutil.copyfileobj(source, target)
+    return path
+
+def read_manifest(path: str, fmt: str, report: ImportReport) -> Iterator[Tuple[int, dict]]:
+    """Потоково прочитать манифест: (номер строки, поля)"""
+    with open(path, encoding="utf-8-sig", newline="") as manifest:
+        if fmt == "csv":
+            reader = csv.DictReader(manifest)
+            for record in reader:
+                report.rows += 1
+                yield reader.line_num, record
+            return
+        for line, raw in enumerate(manifest, start=1):
+            if not raw.strip():
+                continue
+            report.rows += 1
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                report.error(line, "Некорректный JSON")
+                continue
+            if not isinstance(record, dict):
+                report.error(line, "Ожидается JSON-объект")
+                continue
+            yield line, record
+
+def validate_rows(
+    records: Iterator[Tuple[int, dict]],
+    source_dir: str,
+    sources: Dict[str, Tuple[int, str]],
+    report: ImportReport
+) -> Iterator[StagedRow]:
+    """
+    Проверить строки манифеста и вернуть годные для загрузки
+
+    sources заполняется по ходу: имя файла в каталоге -> (строка, путь к исходному файлу);
+    по нему же отсекаются дубликаты внутри манифеста.
+    """
+    root = os.path.realpath(source_dir)
+    for line, record in records:
+        values = {field: str(record.get(field) or "").strip() for field in REQUIRED_FIELDS}
+        missing = [field for field in REQUIRED_FIELDS if not values[field]]
+        if missing:
+            report.error(line, f"Не заполнены поля: {', '.join(missing)}")
+            continue
+
+        source = os.path.realpath(os.path.join(root, values["file"]))
+        if os.path.commonpath([root, source]) != root or not source.endswith(".pdf"):
+            report.error(line, "Можно импортировать только PDF файлы из исходной директории")
+            continue
+        if not os.path.isfile(source):
+            report.error(line, "Файл не найден")
+            continue
+
+        filename = build_book_filename(values["tag"], values["genre"], values["title"], values["author"])
+        if any(char in filename for char in "/\0\n"):
+            report.error(line, "Недопустимые символы в метаданных")
+            continue
+        if filename in sources:
+            report.error(line, f"Дубликат строки {sources[filename][0]}")
+            continue
+        sources[filename] = (line, source)
+
+        description = str(record.get("description") or "").strip()
+        yield (line, filename, values["title"], values["author"], values["tag"], values["genre"], description)
+
+# ============ ЗАГРУЗКА ============
+
+class _CsvStream:
+    """Файлоподобный источник для COPY: CSV формируется по мере чтения"""
+
+    def __init__(self, rows: Iterator[StagedRow]):
+        self._rows = rows
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def read(self, size: int = 65536) -> str:
+        while self._buffer.tell() < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+def stage_rows(db: Session, rows: Iterator[StagedRow]) -> None:
+    """Загрузить строки во временную таблицу books_import"""
+    postgres = db.bind.dialect.name == "postgresql"
+    if not postgres:
+        db.execute(text("DROP TABLE IF EXISTS books_import"))
+    db.execute(text(
+        "CREATE TEMP TABLE books_import ("
+        "line INTEGER, filename TEXT, title TEXT, author TEXT, tag TEXT, genre TEXT, description TEXT)"
+        + (" ON COMMIT DROP" if postgres else "")
+    ))
+
+    if postgres:
+        cursor = db.connection().connection.cursor()
+        cursor.copy_expert(
+            f"COPY books_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN "
+            "WITH (FORMAT csv, FORCE_NOT_NULL (description))",
+            _CsvStream(rows)
+        )
+        return
+
+    statement = text(
+        f"INSERT INTO books_import ({', '.join(STAGING_COLUMNS)}) "
+        f"VALUES ({', '.join(':' + column for column in STAGING_COLUMNS)})"
+    )
+    chunk = []
+    for row in rows:
+        chunk.append(dict(zip(STAGING_COLUMNS, row)))
+        if len(chunk) >= _INSERT_CHUNK:
+            db.execute(statement, chunk)
+            chunk = []
+    if chunk:
+        db.execute(statement, chunk)
+
+def merge_staged(db: Session) -> Dict[str, int]:
+    """Перенести строки staging в books одним запросом; вернуть filename -> id добавленных"""
+    rows = db.execute(text(
+        "INSERT INTO books (filename, title, author, tag, genre, description, created_at) "
+        "SELECT filename, title, author, tag, genre, description, :created_at FROM books_import "
+        "ORDER BY line "
+        "ON CONFLICT (filename) DO NOTHING "
+        "RETURNING id, filename"
+    ), {"created_at": datetime.utcnow()})
+    return {filename: book_id for book_id, filename in rows}
+
+# ============ ФАЙЛЫ ============
+
+def place_files(
+    files: List[Tuple[str, str]],
+    workers: int,
+    progress: Optional[Callable] = None
+) -> Dict[str, str]:
+    """Скопировать файлы (filename, source) в хранилище параллельно; вернуть filename -> ошибка"""
+    failed = {}
+    if progress:
+        progress(0, len(files), force=True)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import-files") as executor:
+        futures = {
+            executor.submit(storage.books.put_file, filename, source): filename
+            for filename, source in files
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                future.result()
+            except OSError as exc:
+                failed[futures[future]] = exc.strerror or str(exc)
+            if progress:
+                progress(done, len(files))
+    return failed
+
+def remove_sources(sources: List[str]) -> None:
+    """Удалить исходные файлы после коммита (--move); ошибки только логируются"""
+    for source in sources:
+        try:
+            os.remove(source)
+        except OSError as exc:
+            logger.warning("Не удалось удалить исходный файл %s: %s", source, exc)
+
+# ============ ИМПОРТ ============
+
+def import_manifest(
+    db: Session,
+    manifest_path: str,
+    source_dir: str,
+    fmt: Optional[str] = None,
+    move: bool = False,
+    workers: Optional[int] = None,
+    progress: Optional[Callable] = None
+) -> dict:
+    """Импортировать книги по манифесту в одной транзакции и вернуть отчет"""
+    report = ImportReport()
+    sources: Dict[str, Tuple[int, str]] = {}
+    placed: List[str] = []
+    fmt = fmt or detect_format(manifest_path)
+
+    try:
+        started = time.perf_counter()
+        rows = validate_rows(read_manifest(manifest_path, fmt, report), source_dir, sources, report)
+        if progress:
+            rows = _with_progress(rows, progress)
+        stage_rows(db, rows)
+        report.timings["stage_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        inserted = merge_staged(db)
+        for filename, (line, _) in sources.items():
+            if filename not in inserted:
+                report.conflict(line, filename)
+        report.timings["merge_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        failed = place_files(
+            [(filename, sources[filename][1]) for filename in inserted],
+            workers or settings.IMPORT_FILE_WORKERS, progress
+        )
+        placed = [filename for filename in inserted if filename not in failed]
+        if failed:
+            db.execute(delete(models.Book).where(models.Book.id.in_([inserted[name] for name in failed])))
+            for filename, message in failed.items():
+                report.error(sources[filename][0], message)
+        report.timings["files_s"] = time.perf_counter() - started
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        for filename in placed:
+            storage.books.delete(filename)
+        raise
+
+    if move:
+        remove_sources([sources[filename][1] for filename in placed])
+
+    report.imported = len(inserted) - len(failed)
+    logger.info(
+        "Импорт %s: добавлено %d, конфликтов %d, ошибок %d",
+        manifest_path, report.imported, report.conflicts_total, report.errors_total
+    )
+    return report.as_dict()
+
+def _with_progress(rows: Iterator[StagedRow], progress: Callable) -> Iterator[StagedRow]:
+    for count, row in enumerate(rows, start=1):
+        progress(count)
+        yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="CSV или JSONL")
+    parser.add_argument("--source-dir", required=True, help="директория с PDF, пути в манифесте относительно нее")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), help="по умолчанию — по расширению")
+    parser.add_argument("--move", action="store_true", help="удалить исходные файлы после импорта")
+    parser.add_argument("--workers", type=int, default=settings.IMPORT_FILE_WORKERS, help="потоков для файлов")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    wait_for_db()
+    create_schema(models.Base.metadata)
+    storage.books.prepare()
+
+    db = SessionLocal()
+    try:
+        report = import_manifest(db, args.manifest, args.source_dir, args.format, args.move, args.workers)
+    finally:
+        db.close()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
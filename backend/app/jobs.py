@@ -0,0 +1,341 @@
+"""
+Фоновые задачи на очереди в PostgreSQL
+
+Эндпоинт ставит задачу в таблицу jobs и сразу отвечает 202 с ее id;
+воркеры (python -m app.jobs) забирают задачи через
+SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько процессов не
+выполнят одну задачу дважды. Пока обработчик работает, отдельный поток
+обновляет heartbeat (даже если один шаг идет дольше таймаута): задачи с
+«замолчавшим» воркером (упал, убит) через JOB_HEARTBEAT_TIMEOUT
+возвращаются в очередь. Итог задачи записывается, только если она все еще
+закреплена за этим воркером. Ошибка обработчика — повтор с экспоненциальной
+паузой, после max_attempts — статус failed.
+
+    python -m app.jobs --concurrency 2
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from . import models, schemas, crud, importer, pdf_optimizer, storage, suggest, http_cache
+from .config import settings
+from .database import SessionLocal, create_schema, wait_for_db
+from .utils import get_books_from_directory
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+# Тип задачи -> обработчик(db, context, payload) -> результат (dict)
+HANDLERS: Dict[str, Callable] = {}
+
+
+def job_handler(job_type: str):
+    """Зарегистрировать обработчик задач типа job_type"""
+    def decorator(func):
+        HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+class JobContext:
+    """Передается обработчику: прогресс и heartbeat в отдельной сессии"""
+
+    def __init__(self, job_id: int, worker_id: str):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self._last_report = 0.0
+        self._heartbeat_stop: Optional[threading.Event] = None
+        self._heartbeat_thread: Optional[threading.Thread] = None
+
+    def progress(self, current: int, total: Optional[int] = None, force: bool = False) -> None:
+        """Сохранить прогресс (не чаще раза в JOB_PROGRESS_INTERVAL секунд)"""
+        now = time.monotonic()
+        if not force and now - self._last_report < settings.JOB_PROGRESS_INTERVAL:
+            return
+        self._last_report = now
+        values = {"progress_current": current}
+        if total is not None:
+            values["progress_total"] = total
+        self._update(**values)
+
+    def heartbeat(self) -> None:
+        """Отметить, что воркер жив"""
+        self._update()
+
+    def start_heartbeat(self) -> None:
+        """Обновлять heartbeat из фонового потока, пока выполняется обработчик"""
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(settings.JOB_HEARTBEAT_TIMEOUT / 3):
+                try:
+                    self.heartbeat()
+                except Exception:
+                    logger.exception("Не удалось обновить heartbeat задачи %s", self.job_id)
+
+        self._heartbeat_stop = stop
+        self._heartbeat_thread = threading.Thread(target=run, name=f"job-heartbeat-{self.job_id}", daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop_heartbeat(self) -> None:
+        """Остановить поток heartbeat"""
+        if self._heartbeat_thread is None:
+            return
+        self._heartbeat_stop.set()
+        self._heartbeat_thread.join()
+        self._heartbeat_thread = None
+
+    def _update(self, **values) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(update(models.Job).where(
+                models.Job.id == self.job_id, models.Job.locked_by == self.worker_id
+            ).values(heartbeat_at=datetime.utcnow(), **values))
+            db.commit()
+        finally:
+            db.close()
+
+# ============ ОЧЕРЕДЬ ============
+
+def enqueue(
+    db: Session,
+    job_type: str,
+    payload: Optional[dict] = None,
+    user_id: Optional[int] = None,
+    max_attempts: Optional[int] = None
+) -> models.Job:
+    """Поставить задачу в очередь"""
+    if job_type not in HANDLERS:
+        raise ValueError(f"Неизвестный тип задачи: {job_type}")
+    job = models.Job(
+        type=job_type,
+        status=QUEUED,
+        payload=payload or {},
+        created_by=user_id,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def get_job(db: Session, job_id: int) -> Optional[models.Job]:
+    """Получить задачу по ID"""
+    return db.query(models.Job).filter(models.Job.id == job_id).first()
+
+def get_jobs(db: Session, skip: int = 0, limit: int = 50, status: Optional[str] = None):
+    """Последние задачи, новые сначала"""
+    query = db.query(models.Job)
+    if status:
+        query = query.filter(models.Job.status == status)
+    return query.order_by(models.Job.created_at.desc()).offset(skip).limit(limit).all()
+
+def claim_next(db: Session, worker_id: str) -> Optional[models.Job]:
+    """Забрать следующую готовую задачу; параллельные воркеры пропускают заблокированные строки"""
+    job = db.query(models.Job).filter(
+        models.Job.status == QUEUED,
+        models.Job.run_at <= datetime.utcnow()
+    ).order_by(models.Job.run_at).with_for_update(skip_locked=True).first()
+    if job is None:
+        db.rollback()
+        return None
+    now = datetime.utcnow()
+    job.status = RUNNING
+    job.attempts += 1
+    job.locked_by = worker_id
+    job.heartbeat_at = now
+    job.started_at = job.started_at or now
+    db.commit()
+    return job
+
+def requeue_stale(db: Session) -> int:
+    """Вернуть в очередь задачи, воркер которых перестал обновлять heartbeat"""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_HEARTBEAT_TIMEOUT)
+    count = db.execute(update(models.Job).where(
+        models.Job.status == RUNNING, models.Job.heartbeat_at < cutoff
+    ).values(status=QUEUED, locked_by=None, run_at=datetime.utcnow())).rowcount
+    db.commit()
+    return count
+
+def finish_job(db: Session, job_id: int, worker_id: str, **values) -> bool:
+    """
+    Записать итог задачи, если она все еще закреплена за worker_id
+
+    Задачу, возвращенную в очередь requeue_stale и, возможно, уже взятую
+    другим воркером, не трогаем и возвращаем False.
+    """
+    updated = db.execute(update(models.Job).where(
+        models.Job.id == job_id, models.Job.locked_by == worker_id
+    ).values(locked_by=None, **values)).rowcount
+    db.commit()
+    if not updated:
+        logger.warning("Задача %s больше не закреплена за воркером %s, итог не записан", job_id, worker_id)
+    return bool(updated)
+
+def run_job(db: Session, job: models.Job, worker_id: str) -> None:
+    """Выполнить задачу и сохранить результат или запланировать повтор"""
+    handler = HANDLERS.get(job.type)
+    job_id, job_type, attempts, max_attempts = job.id, job.type, job.attempts, job.max_attempts
+    context = JobContext(job_id, worker_id)
+    context.start_heartbeat()
+    try:
+        if handler is None:
+            raise ValueError(f"Нет обработчика для задачи {job_type}")
+        result = handler(db, context, dict(job.payload or {}))
+    except Exception as exc:
+        context.stop_heartbeat()
+        db.rollback()
+        error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+        if attempts < max_attempts:
+            run_at = datetime.utcnow() + timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (attempts - 1))
+            if finish_job(db, job_id, worker_id, status=QUEUED, run_at=run_at, error=error):
+                logger.warning("Задача %s (%s) завершилась ошибкой, повтор: %s", job_id, job_type, error)
+        else:
+            if finish_job(db, job_id, worker_id, status=FAILED, finished_at=datetime.utcnow(), error=error):
+                logger.error("Задача %s (%s) провалена: %s", job_id, job_type, error)
+        return
+    context.stop_heartbeat()
+
+    finish_job(
+        db, job_id, worker_id,
+        status=SUCCEEDED,
+        result=result or {},
+        error=None,
+        finished_at=datetime.utcnow(),
+        progress_current=func.coalesce(models.Job.progress_total, models.Job.progress_current),
+    )
+
+# ============ ОБРАБОТЧИКИ ============
+
+def _catalog_changed(*book_ids: int) -> None:
+    """Сообщить воркерам API об изменении каталога: HTTP-кэш и индекс подсказок"""
+    http_cache.invalidate(http_cache.CATALOG_TAG, *(http_cache.book_tag(book_id) for book_id in book_ids))
+    suggest.request_rebuild()
+
+@job_handler("sync_books")
+def sync_books(db: Session, context: JobContext, payload: dict) -> dict:
+    """Добавить в БД книги из директории, которых там еще нет"""
+    books_from_dir = get_books_from_directory()
+    existing = {row[0] for row in db.query(models.Book.filename)}
+    new_books = [book for book in books_from_dir if book["filename"] not in existing]
+    context.progress(0, len(new_books), force=True)
+
+    for done, book_data in enumerate(new_books, start=1):
+        crud.create_book(db, schemas.BookCreate(**book_data, description=""))
+        context.progress(done)
+    if new_books:
+        _catalog_changed()
+    if new_books and settings.PDF_OPTIMIZE_ON_INGEST:
+        enqueue(db, "optimize_pdfs")
+    return {"message": f"Синхронизировано {len(new_books)} новых книг", "synced": len(new_books)}
+
+@job_handler("delete_books")
+def delete_books(db: Session, context: JobContext, payload: dict) -> dict:
+    """Удалить книги и их файлы пачками"""
+    book_ids = payload.get("book_ids", [])
+    context.progress(0, len(book_ids), force=True)
+    deleted = 0
+    for start in range(0, len(book_ids), settings.JOB_BATCH_SIZE):
+        batch = book_ids[start:start + settings.JOB_BATCH_SIZE]
+        books = db.query(models.Book).filter(models.Book.id.in_(batch)).all()
+        files = [(book.id, book.filename) for book in books]
+        for book in books:
+            db.delete(book)
+        # Сначала коммит: при ошибке БД файлы остаются у живых записей
+        db.commit()
+        for book_id, filename in files:
+            storage.books.delete(filename)
+            pdf_optimizer.remove_derivative(book_id)
+        if files:
+            _catalog_changed(*(book_id for book_id, _ in files))
+        deleted += len(books)
+        context.progress(start + len(batch))
+    return {"message": f"Удалено книг: {deleted}", "deleted": deleted}
+
+@job_handler("import_books")
+def import_books(db: Session, context: JobContext, payload: dict) -> dict:
+    """Импорт книг по манифесту, загруженному через админку"""
+    result = importer.import_manifest(
+        db, payload["manifest_path"], payload["source_dir"],
+        fmt=payload.get("format"), move=payload.get("move", False), progress=context.progress
+    )
+    os.remove(payload["manifest_path"])
+    if result.get("imported"):
+        _catalog_changed()
+    if result.get("imported") and settings.PDF_OPTIMIZE_ON_INGEST:
+        enqueue(db, "optimize_pdfs")
+    return result
+
+@job_handler("optimize_pdfs")
+def optimize_pdfs(db: Session, context: JobContext, payload: dict) -> dict:
+    """Линеаризованные копии PDF для /view: перечисленные книги или все необработанные"""
+    return pdf_optimizer.optimize_books(
+        db, book_ids=payload.get("book_ids"), force=payload.get("force", False), progress=context.progress
+    )
+
+# ============ ВОРКЕР ============
+
+def worker_loop(worker_id: str, stop_event: threading.Event) -> None:
+    """Забирать и выполнять задачи, пока не выставлен stop_event"""
+    last_reap = 0.0
+    while not stop_event.is_set():
+        db = SessionLocal()
+        try:
+            if time.monotonic() - last_reap > settings.JOB_HEARTBEAT_TIMEOUT / 2:
+                last_reap = time.monotonic()
+                requeued = requeue_stale(db)
+                if requeued:
+                    logger.warning("Возвращено в очередь зависших задач: %d", requeued)
+            job = claim_next(db, worker_id)
+            if job is not None:
+                logger.info("Задача %s (%s) взята воркером %s", job.id, job.type, worker_id)
+                run_job(db, job, worker_id)
+                continue
+        except Exception:
+            db.rollback()
+            logger.exception("Ошибка в цикле воркера %s", worker_id)
+        finally:
+            db.close()
+        stop_event.wait(settings.JOB_POLL_INTERVAL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY, help="потоков-исполнителей")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    wait_for_db()
+    create_schema(models.Base.metadata)
+
+    # SIGTERM: перестать брать новые задачи и дождаться текущих
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [
+        threading.Thread(target=worker_loop, args=(f"{prefix}:{i}", stop_event), name=f"job-worker-{i}")
+        for i in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info("Воркер задач запущен: %d потоков", args.concurrency)
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,54 @@
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Query, Request, Form
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile, Query, Request, Form, Response
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import os
-import shutil
 from collections import defaultdict
+from contextlib import asynccontextmanager
 import time
-from datetime import timedelta
+from datetime import datetime, timedelta
+from starlette.concurrency import run_in_threadpool
 
-from . import models, schemas, crud, auth
-from .database import engine, get_db
+from . import models, schemas, crud, auth, statistics, progress, analytics, pdf_optimizer, storage, popularity, recommendations, suggest, moderation, events, metrics, http_cache, server
+from .compression import CompressionMiddleware
+from .database import create_schema, get_db, wait_for_db
 from .config import settings
-from .utils import parse_book_filename, get_books_from_directory
-
-# Создание таблиц
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="Online Library API", version="1.0.0")
+from .utils import parse_book_filename, get_books_from_directory, build_book_filename
+
+# ============ STARTUP / SHUTDOWN ============
+
+def prepare_storage():
+    """Дождаться БД, создать схему (под advisory lock) и хранилище для книг"""
+    wait_for_db()
+    create_schema(models.Base.metadata)
+    storage.books.prepare()
+    storage.optimized.prepare()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Импорт модуля не обращается к БД; подготовка выполняется при старте воркера
+    server.configure_threadpool()
+    await run_in_threadpool(prepare_storage)
+    await run_in_threadpool(suggest.rebuild_now)
+    progress.start_flusher()
+    analytics.start_flusher()
+    popularity.start_refresher()
+    suggest.start_rebuilder()
+    events.start_listener()
+    yield
+    events.stop_listener()
+    suggest.stop_rebuilder()
+    popularity.stop_refresher()
+    analytics.stop_flusher()
+    progress.stop_flusher()
+
+app = FastAPI(
+    title="Online Library API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
+)
 
 # Rate limiter для авторизации
 login_attempts = defaultdict(list)
@@ -31,6 +61,7 @@ def check_rate_limit(ip: str) -> bool:
     login_attempts[ip] = [t for t in login_attempts[ip] if now - t < RATE_LIMIT_WINDOW]
     
     if len(login_attempts[ip]) >= RATE_LIMIT_MAX_ATTEMPTS:
+        metrics.RATE_LIMIT_REJECTIONS.labels("auth").inc()
         return True
     
     login_attempts[ip].append(now)
@@ -42,7 +73,7 @@ rating_attempts = defaultdict(list)
 download_attempts = defaultdict(list)
 view_attempts = defaultdict(list)
 
-def check_action_rate_limit(user_id: int, action_dict: dict, window: int, max_attempts: int) -> bool:
+def check_action_rate_limit(user_id: int, action_dict: dict, window: int, max_attempts: int, action: str = "other") -> bool:
     """Универсальная функция для проверки rate limit по действиям пользователя."""
     now = time.time()
     key = str(user_id)
@@ -52,6 +83,7 @@ def check_action_rate_limit(user_id: int, action_dict: dict, window: int, max_at
     
     # Проверяем лимит
     if len(action_dict[key]) >= max_attempts:
+        metrics.RATE_LIMIT_REJECTIONS.labels(action).inc()
         return True
     
     # Добавляем текущую попытку
@@ -89,6 +121,12 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+# ============ HTTP-КЭШ ============
+
+# Подключается до CORS, чтобы закэшированные ответы тоже получали CORS-заголовки
+if settings.HTTP_CACHE_ENABLED:
+    app.add_middleware(http_cache.HTTPCacheMiddleware)
+
 # ============ CORS НАСТРОЙКИ ============
 
 app.add_middleware(
@@ -102,10 +140,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
-# Создание директории для книг
-os.makedirs(settings.BOOKS_DIRECTORY, exist_ok=True)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+# Профилирование SQL (только для разработки): Server-Timing и предупреждения о N+1
+if settings.SQL_PROFILING:
+    from .profiling import SQLProfilingMiddleware
+    app.add_middleware(SQLProfilingMiddleware)
 
 # ============ AUTH ENDPOINTS ============
 
@@ -146,8 +190,76 @@ def get_current_user_info(current_user: models.User = Depends(auth.get_current_u
     """Получить информацию о текущем пользователе"""
     return current_user
 
+# ============ PAGINATION ============
+
+PAGE_MAX_LIMIT = 500
+
+def set_next_cursor(response: Response, items: list, limit: int):
+    """Передать в X-Next-Cursor ID последней записи, если страница заполнена целиком"""
+    if len(items) == limit:
+        response.headers["X-Next-Cursor"] = str(items[-1].id)
+
 # ============ BOOK ENDPOINTS ============
 
+def build_book_responses(
+    db: Session,
+    books: List[models.Book],
+    current_user: Optional[models.User] = None
+) -> List[schemas.BookResponse]:
+    """Собрать BookResponse для списка книг, догружая рейтинги и отметки одним запросом"""
+    enrichment = crud.get_books_enrichment(
+        db, [book.id for book in books], current_user.id if current_user else None
+    )
+    return [
+        schemas.BookResponse(
+            id=book.id,
+            filename=book.filename,
+            title=book.title,
+            author=book.author,
+            tag=book.tag,
+            genre=book.genre,
+            description=book.description,
+            created_at=book.created_at,
+            **enrichment.get(book.id, {})
+        )
+        for book in books
+    ]
+
+BOOK_RESPONSE_FIELDS = set(schemas.BookResponse.model_fields)
+BOOK_ENRICHMENT_FIELDS = {"average_rating", "is_favorite", "is_read", "user_rating"}
+
+def parse_book_fields(fields: Optional[str]) -> Optional[set]:
+    """Разобрать ?fields=id,title,author; None — отдавать все поля"""
+    if not fields:
+        return None
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - BOOK_RESPONSE_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    return selected
+
+def build_book_projection(
+    db: Session,
+    books: List[models.Book],
+    current_user: Optional[models.User],
+    selected: set
+) -> ORJSONResponse:
+    """Отдать только выбранные поля книг; рейтинги и отметки догружаются, только если запрошены"""
+    enrichment = {}
+    if selected & BOOK_ENRICHMENT_FIELDS:
+        enrichment = crud.get_books_enrichment(
+            db, [book.id for book in books], current_user.id if current_user else None
+        )
+    defaults = schemas.BookResponse.model_fields
+    content = []
+    for book in books:
+        extra = enrichment.get(book.id, {})
+        content.append({
+            field: extra.get(field, defaults[field].default) if field in BOOK_ENRICHMENT_FIELDS else getattr(book, field)
+            for field in selected
+        })
+    return ORJSONResponse(content=content)
+
 @app.get("/api/books", response_model=List[schemas.BookResponse])
 def get_books(
     skip: int = 0,
@@ -156,31 +268,20 @@ def get_books(
     genre: Optional[str] = None,
     author: Optional[str] = None,
     search: Optional[str] = None,
+    sort: Optional[str] = Query(None, regex="^(new|popular|top_rated|trending)$"),
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,title,author"),
     db: Session = Depends(get_db),
     current_user: Optional[models.User] = Depends(auth.get_optional_current_user)
 ):
-    """Получить список книг с фильтрацией"""
-    books = crud.get_books(db, skip=skip, limit=limit, tag=tag, genre=genre, author=author, search=search)
-    
-    result = []
-    for book in books:
-        book_data = schemas.BookResponse(
-            id=book.id,
-            filename=book.filename,
-            title=book.title,
-            author=book.author,
-            tag=book.tag,
-            genre=book.genre,
-            description=book.description,
-            created_at=book.created_at,
-            average_rating=crud.get_book_average_rating(db, book.id),
-            is_favorite=crud.is_favorite(db, current_user.id, book.id) if current_user else False,
-            is_read=crud.is_read(db, current_user.id, book.id) if current_user else False,
-            user_rating=crud.get_user_rating_for_book(db, current_user.id, book.id) if current_user else None
-        )
-        result.append(book_data)
-    
-    return result
+    """Получить список книг с фильтрацией и сортировкой (new, popular, top_rated, trending)"""
+    selected = parse_book_fields(fields)
+    books = crud.get_books(
+        db, skip=skip, limit=limit, tag=tag, genre=genre, author=author, search=search,
+        with_description=selected is None or "description" in selected, sort=sort
+    )
+    if selected is not None:
+        return build_book_projection(db, books, current_user, selected)
+    return build_book_responses(db, books, current_user)
 
 @app.get("/api/books/{book_id}", response_model=schemas.BookResponse)
 def get_book(
@@ -193,29 +294,29 @@ def get_book(
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
     
-    return schemas.BookResponse(
-        id=book.id,
-        filename=book.filename,
-        title=book.title,
-        author=book.author,
-        tag=book.tag,
-        genre=book.genre,
-        description=book.description,
-        created_at=book.created_at,
-        average_rating=crud.get_book_average_rating(db, book.id),
-        is_favorite=crud.is_favorite(db, current_user.id, book.id) if current_user else False,
-        is_read=crud.is_read(db, current_user.id, book.id) if current_user else False,
-        user_rating=crud.get_user_rating_for_book(db, current_user.id, book.id) if current_user else None
-    )
+    # Рейтинг и отметки пользователя — одним запросом, как в списках
+    return build_book_responses(db, [book], current_user)[0]
+
+@app.get("/api/books/{book_id}/similar", response_model=List[schemas.BookResponse])
+def get_similar_books(
+    book_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: Optional[models.User] = Depends(auth.get_optional_current_user)
+):
+    """Читатели также выбирали: похожие книги из предрасчитанных списков"""
+    books = recommendations.get_similar_books(db, book_id, limit=limit)
+    return build_book_responses(db, books, current_user)
 
 @app.get("/api/books/{book_id}/download")
 def download_book(
     book_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: Optional[models.User] = Depends(auth.get_optional_current_user)  # Опциональная!
 ):
     # Rate limiting ТОЛЬКО для авторизованных
-    if current_user and check_action_rate_limit(current_user.id, download_attempts, 30, 1):
+    if current_user and check_action_rate_limit(current_user.id, download_attempts, 30, 1, "download"):
         raise HTTPException(
             status_code=429,
             detail="Вы можете скачивать файлы не чаще 1 раза в 30 секунд. Подождите."
@@ -225,22 +326,24 @@ def download_book(
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
     
-    file_path = os.path.join(settings.BOOKS_DIRECTORY, book.filename)
-    if not os.path.exists(file_path):
+    info = storage.books.stat(book.filename)
+    if info is None:
         raise HTTPException(status_code=404, detail="Файл не найден")
     
-    return FileResponse(file_path, media_type="application/pdf", filename=book.filename)
+    analytics.record(book_id, analytics.DOWNLOAD)
+    return storage.books.response(request, info, "application/pdf", filename=book.filename)
 
 
 
 @app.get("/api/books/{book_id}/view")
 def view_book(
     book_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: Optional[models.User] = Depends(auth.get_optional_current_user)  # Опциональная!
 ):
     # Rate limiting ТОЛЬКО для авторизованных
-    if current_user and check_action_rate_limit(current_user.id, view_attempts, 30, 1):
+    if current_user and check_action_rate_limit(current_user.id, view_attempts, 30, 1, "view"):
         raise HTTPException(
             status_code=429,
             detail="Вы можете открывать книги для чтения не чаще 1 раза в 30 секунд. Подождите."
@@ -250,36 +353,77 @@ def view_book(
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
     
-    file_path = os.path.join(settings.BOOKS_DIRECTORY, book.filename)
-    if not os.path.exists(file_path):
+    info = storage.books.stat(book.filename)
+    if info is None:
         raise HTTPException(status_code=404, detail="Файл не найден")
     
-    return FileResponse(file_path, media_type="application/pdf")
+    if analytics.opens_book(request.headers.get("range")):
+        analytics.record(book_id, analytics.VIEW)
+    # Линеаризованная копия, если есть: браузер показывает первую страницу, не дожидаясь всего файла
+    store, info = pdf_optimizer.view_object(db, book_id, info)
+    return store.response(request, info, "application/pdf")
 
 
-@app.post("/api/books/sync")
-def sync_books(
+@app.post("/api/bundles")
+def download_bundle(
+    bundle: schemas.BundleRequest,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    current_user: models.User = Depends(auth.get_current_user)
 ):
-    """Синхронизация книг из директории с базой данных (только для админов)"""
-    try:
-        books_from_dir = get_books_from_directory()
-        synced_count = 0
-        
-        for book_data in books_from_dir:
-            existing_book = crud.get_book_by_filename(db, book_data['filename'])
-            if not existing_book:
-                book_create = schemas.BookCreate(**book_data, description="")
-                crud.create_book(db, book_create)
-                synced_count += 1
-        
-        return {"message": f"Синхронизировано {synced_count} новых книг"}
-    except Exception as e:
+    """
+    Скачать несколько книг одним ZIP-архивом
+
+    Книги выбираются по списку id, из избранного и/или по фильтрам каталога.
+    Архив идет потоком; для лимита скачиваний это одно скачивание.
+    """
+    from . import bundles
+    if check_action_rate_limit(current_user.id, download_attempts, 30, 1, "download"):
         raise HTTPException(
-            status_code=500,
-            detail=f"Ошибка при синхронизации: {str(e)}"
+            status_code=429,
+            detail="Вы можете скачивать файлы не чаще 1 раза в 30 секунд. Подождите."
+        )
+
+    books = crud.get_bundle_books(
+        db, current_user.id,
+        book_ids=bundle.book_ids,
+        favorites=bundle.favorites,
+        tag=bundle.tag,
+        genre=bundle.genre,
+        author=bundle.author,
+        search=bundle.search,
+        limit=settings.BUNDLE_MAX_BOOKS + 1
+    )
+    if len(books) > settings.BUNDLE_MAX_BOOKS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"В архив можно добавить не более {settings.BUNDLE_MAX_BOOKS} книг, уточните выбор"
         )
+    entries = bundles.prepare_entries(books)
+    if not entries:
+        raise HTTPException(status_code=404, detail="Книги не найдены")
+    if sum(entry.size for entry in entries) > settings.BUNDLE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Архив слишком большой, уточните выбор")
+
+    for entry in entries:
+        analytics.record(entry.book_id, analytics.DOWNLOAD)
+    return StreamingResponse(
+        bundles.stream_bundle(entries),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{bundles.bundle_filename()}"',
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+@app.post("/api/books/sync", response_model=schemas.JobAccepted, status_code=status.HTTP_202_ACCEPTED)
+def sync_books(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Синхронизация книг из директории с базой данных (только для админов, в фоне)"""
+    from . import jobs
+    job = jobs.enqueue(db, "sync_books", user_id=current_user.id)
+    return {"job_id": job.id, "status": job.status}
 
 @app.post("/api/books", response_model=schemas.BookResponse, status_code=status.HTTP_201_CREATED)
 async def createbook(
@@ -293,6 +437,7 @@ async def createbook(
     current_user: models.User = Depends(auth.get_current_admin_user)
 ):
     """Загрузка новой книги (только для админов)"""
+    from . import jobs
     if not file.filename.endswith('.pdf'):
         raise HTTPException(
             status_code=400,
@@ -300,7 +445,7 @@ async def createbook(
         )
     
     # Формируем имя файла
-    filename = f"#{tag}_#{genre}_{title.replace(' ', '_')}_{author.replace(' ', '_')}.pdf"
+    filename = build_book_filename(tag, genre, title, author)
     
     # Проверяем, существует ли уже такая книга
     existing_book = crud.get_book_by_filename(db, filename)
@@ -312,9 +457,7 @@ async def createbook(
     
     try:
         # Сохраняем файл
-        file_path = os.path.join(settings.BOOKS_DIRECTORY, filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        storage.books.put_stream(filename, file.file)
         
         # Создаем запись в БД
         book_create = schemas.BookCreate(
@@ -326,6 +469,10 @@ async def createbook(
             description=description
         )
         book = crud.create_book(db, book_create)
+        http_cache.invalidate(http_cache.CATALOG_TAG)
+        suggest.book_added(book)
+        if settings.PDF_OPTIMIZE_ON_INGEST:
+            jobs.enqueue(db, "optimize_pdfs", payload={"book_ids": [book.id]}, user_id=current_user.id)
         
         return schemas.BookResponse(
             id=book.id,
@@ -343,8 +490,7 @@ async def createbook(
         )
     except Exception as e:
         # Удаляем файл если произошла ошибка
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        storage.books.delete(filename)
         raise HTTPException(
             status_code=500,
             detail=f"Ошибка при загрузке книги: {str(e)}"
@@ -358,9 +504,14 @@ def update_book(
     current_user: models.User = Depends(auth.get_current_admin_user)
 ):
     """Обновление информации о книге (только для админов)"""
-    book = crud.update_book(db, book_id, book_update)
+    book = crud.get_book(db, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
+    previous = (book.title, book.author, book.genre)
+    book = crud.update_book(db, book_id, book_update)
+    http_cache.invalidate(http_cache.CATALOG_TAG, http_cache.book_tag(book_id))
+    suggest.book_removed(*previous)
+    suggest.book_added(book)
     
     return schemas.BookResponse(
         id=book.id,
@@ -389,17 +540,151 @@ def delete_book(
         raise HTTPException(status_code=404, detail="Книга не найдена")
     
     # Удаляем файл
-    file_path = os.path.join(settings.BOOKS_DIRECTORY, book.filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    storage.books.delete(book.filename)
+    pdf_optimizer.remove_derivative(book_id)
     
     # Удаляем запись из БД
+    previous = (book.title, book.author, book.genre)
     crud.delete_book(db, book_id)
+    http_cache.invalidate(http_cache.CATALOG_TAG, http_cache.book_tag(book_id))
+    suggest.book_removed(*previous)
     
     return {"message": "Книга успешно удалена"}
 
+@app.post("/api/admin/books/bulk-delete", response_model=schemas.JobAccepted, status_code=status.HTTP_202_ACCEPTED)
+def bulk_delete_books(
+    request: schemas.BulkDeleteBooksRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Массовое удаление книг и их файлов (только для админов, в фоне)"""
+    from . import jobs
+    job = jobs.enqueue(db, "delete_books", {"book_ids": request.book_ids}, user_id=current_user.id)
+    return {"job_id": job.id, "status": job.status}
+
+@app.post("/api/admin/books/import", response_model=schemas.JobAccepted, status_code=status.HTTP_202_ACCEPTED)
+def import_books(
+    manifest: UploadFile = File(...),
+    source_dir: str = Form(...),
+    move: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Массовый импорт книг по манифесту CSV/JSONL (только для админов, в фоне)"""
+    from . import importer, jobs
+    try:
+        fmt = importer.detect_format(manifest.filename)
+        source_path = importer.resolve_source_dir(source_dir)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    manifest_path = importer.save_manifest(manifest.file, fmt)
+    job = jobs.enqueue(db, "import_books", {
+        "manifest_path": manifest_path,
+        "source_dir": source_path,
+        "format": fmt,
+        "move": move,
+    }, user_id=current_user.id)
+    return {"job_id": job.id, "status": job.status}
+
+# ============ JOBS ENDPOINTS ============
+
+@app.get("/api/admin/jobs", response_model=List[schemas.JobResponse])
+def get_jobs(
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=PAGE_MAX_LIMIT),
+    status: Optional[str] = Query(None, regex="^(queued|running|succeeded|failed)$"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Список фоновых задач (только для админов)"""
+    from . import jobs
+    return jobs.get_jobs(db, skip=skip, limit=limit, status=status)
+
+@app.get("/api/admin/jobs/{job_id}", response_model=schemas.JobResponse)
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Статус и прогресс фоновой задачи (только для админов)"""
+    from . import jobs
+    job = jobs.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+# ============ EXPORT ENDPOINTS ============
+
+@app.get("/api/admin/export/{resource}")
+def export_data(
+    resource: str,
+    format: str = Query("csv", regex="^(csv|jsonl)$"),
+    gzip: bool = False,
+    since: Optional[datetime] = None,
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Потоковая выгрузка книг, отзывов или оценок в CSV/JSONL (только для админов)"""
+    from . import exports
+    if resource not in exports.EXPORTS:
+        raise HTTPException(status_code=404, detail="Неизвестная выгрузка")
+    filename = exports.export_filename(resource, format, gzip)
+    return StreamingResponse(
+        exports.stream_export(resource, format, since, gzip),
+        media_type="application/gzip" if gzip else exports.MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            # nginx отдает ответ по мере генерации, не накапливая его в буфере
+            "X-Accel-Buffering": "no",
+        }
+    )
+
+# ============ EVENTS ENDPOINTS ============
+
+def event_stream_response(channels: List[str]) -> StreamingResponse:
+    """SSE-ответ по каналам событий; лимит подписчиков — на воркер"""
+    if events.hub.subscribers >= settings.EVENTS_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="Слишком много подписчиков, попробуйте позже")
+    return StreamingResponse(
+        events.stream(channels),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/events/books/{book_id}")
+def book_events(book_id: int):
+    """Новые отзывы и изменения оценок книги (Server-Sent Events)"""
+    return event_stream_response([events.book_channel(book_id)])
+
+@app.post("/api/admin/events/ticket", response_model=schemas.StreamTicket)
+def create_admin_events_ticket(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Одноразовый билет для подписки на /api/admin/events (только для админов)"""
+    ticket = auth.create_stream_ticket(db, current_user)
+    return {"ticket": ticket, "expires_in": settings.EVENTS_TICKET_TTL}
+
+@app.get("/api/admin/events")
+def admin_events(
+    ticket: str = Query(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Изменения жалоб для страницы модерации (Server-Sent Events, только для админов)
+
+    EventSource не умеет передавать заголовки, поэтому в параметре передается
+    одноразовый билет из POST /api/admin/events/ticket, а не JWT: строка запроса
+    попадает в логи. При переподключении нужен новый билет.
+    """
+    user = auth.redeem_stream_ticket(db, ticket)
+    if user is None or not user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="У вас нет прав доступа")
+    return event_stream_response([events.ADMIN_CHANNEL])
+
 # ============ FAVORITES ENDPOINTS ============
 
+
 @app.post("/api/favorites/{book_id}")
 def add_to_favorites(
     book_id: int,
@@ -409,6 +694,7 @@ def add_to_favorites(
     """Добавить книгу в избранное"""
     if not crud.add_to_favorites(db, current_user.id, book_id):
         raise HTTPException(status_code=400, detail="Не удалось добавить в избранное")
+    statistics.invalidate_user_statistics(current_user.id)
     return {"message": "Книга добавлена в избранное"}
 
 @app.delete("/api/favorites/{book_id}")
@@ -420,38 +706,65 @@ def remove_from_favorites(
     """Удалить книгу из избранного"""
     if not crud.remove_from_favorites(db, current_user.id, book_id):
         raise HTTPException(status_code=400, detail="Не удалось удалить из избранного")
+    statistics.invalidate_user_statistics(current_user.id)
     return {"message": "Книга удалена из избранного"}
 
 @app.get("/api/favorites", response_model=List[schemas.BookResponse])
 def get_favorites(
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=PAGE_MAX_LIMIT),
+    tag: Optional[str] = None,
+    genre: Optional[str] = None,
+    author: Optional[str] = None,
+    search: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,title,author"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    """Получить список избранных книг"""
-    books = crud.get_user_favorites(db, current_user.id)
-    
-    result = []
-    for book in books:
-        book_data = schemas.BookResponse(
-            id=book.id,
-            filename=book.filename,
-            title=book.title,
-            author=book.author,
-            tag=book.tag,
-            genre=book.genre,
-            description=book.description,
-            created_at=book.created_at,
-            average_rating=crud.get_book_average_rating(db, book.id),
-            is_favorite=True,
-            is_read=crud.is_read(db, current_user.id, book.id),
-            user_rating=crud.get_user_rating_for_book(db, current_user.id, book.id)
-        )
-        result.append(book_data)
-    
-    return result
+    """Получить список избранных книг (курсор следующей страницы — в заголовке X-Next-Cursor)"""
+    selected = parse_book_fields(fields)
+    books = crud.get_user_favorites(
+        db, current_user.id, cursor=cursor, limit=limit,
+        tag=tag, genre=genre, author=author, search=search,
+        with_description=selected is None or "description" in selected
+    )
+    if selected is not None:
+        projection = build_book_projection(db, books, current_user, selected)
+        set_next_cursor(projection, books, limit)
+        return projection
+    set_next_cursor(response, books, limit)
+    return build_book_responses(db, books, current_user)
 
 # ============ READ STATUS ENDPOINTS ============
 
+@app.get("/api/read", response_model=List[schemas.BookResponse])
+def get_read_books(
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=PAGE_MAX_LIMIT),
+    tag: Optional[str] = None,
+    genre: Optional[str] = None,
+    author: Optional[str] = None,
+    search: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Поля через запятую, например id,title,author"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Получить историю прочитанных книг (курсор следующей страницы — в заголовке X-Next-Cursor)"""
+    selected = parse_book_fields(fields)
+    books = crud.get_user_read_books(
+        db, current_user.id, cursor=cursor, limit=limit,
+        tag=tag, genre=genre, author=author, search=search,
+        with_description=selected is None or "description" in selected
+    )
+    if selected is not None:
+        projection = build_book_projection(db, books, current_user, selected)
+        set_next_cursor(projection, books, limit)
+        return projection
+    set_next_cursor(response, books, limit)
+    return build_book_responses(db, books, current_user)
+
 @app.post("/api/read/{book_id}")
 def mark_as_read(
     book_id: int,
@@ -461,6 +774,7 @@ def mark_as_read(
     """Отметить книгу как прочитанную"""
     if not crud.mark_as_read(db, current_user.id, book_id):
         raise HTTPException(status_code=400, detail="Не удалось отметить как прочитанное")
+    statistics.invalidate_user_statistics(current_user.id)
     return {"message": "Книга отмечена как прочитанная"}
 
 @app.delete("/api/read/{book_id}")
@@ -472,6 +786,7 @@ def mark_as_unread(
     """Отметить книгу как непрочитанную"""
     if not crud.mark_as_unread(db, current_user.id, book_id):
         raise HTTPException(status_code=400, detail="Не удалось отметить как непрочитанное")
+    statistics.invalidate_user_statistics(current_user.id)
     return {"message": "Книга отмечена как непрочитанная"}
 
 # ============ REVIEWS ENDPOINTS ============
@@ -484,13 +799,15 @@ def create_review(
     current_user: models.User = Depends(auth.get_current_user)
 ):
     # Rate limiting - 1 отзыв в минуту
-    if check_action_rate_limit(current_user.id, review_attempts, 60, 1):
+    if check_action_rate_limit(current_user.id, review_attempts, 60, 1, "review"):
         raise HTTPException(
             status_code=429,
             detail="Вы можете оставлять не более 1 отзыва в минуту. Подождите немного."
         )
     
     db_review = crud.create_review(db, current_user.id, review)
+    statistics.invalidate_user_statistics(current_user.id)
+    http_cache.invalidate(http_cache.book_tag(review.book_id))
     return schemas.ReviewResponse(
         id=db_review.id,
         user_id=db_review.user_id,
@@ -501,18 +818,18 @@ def create_review(
     )
 
 @app.get("/api/reviews/{book_id}", response_model=List[schemas.ReviewResponse])
-def get_book_reviews(book_id: int, db: Session = Depends(get_db)):
-    reviews = crud.get_book_reviews(db, book_id)
-    return [
-        schemas.ReviewResponse(
-            id=review.id,
-            user_id=review.user_id,
-            book_id=review.book_id,
-            text=review.text,
-            created_at=review.created_at,
-            user_name=review.user.full_name  # ✅ full_name (с подчеркиванием!)
-        ) for review in reviews
-    ]
+def get_book_reviews(
+    book_id: int,
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=PAGE_MAX_LIMIT),
+    db: Session = Depends(get_db)
+):
+    """Получить отзывы на книгу (всего — в X-Total-Count, следующая страница — в X-Next-Cursor)"""
+    reviews = crud.get_book_reviews(db, book_id, cursor=cursor, limit=limit)
+    response.headers["X-Total-Count"] = str(crud.get_book_reviews_count(db, book_id))
+    set_next_cursor(response, reviews, limit)
+    return [schemas.ReviewResponse(**review._mapping) for review in reviews]
 
 
 # ============ RATINGS ENDPOINTS ============
@@ -524,13 +841,16 @@ def create_or_update_rating(
     current_user: models.User = Depends(auth.get_current_user)
 ):
     # Rate limiting - 1 оценка в минуту
-    if check_action_rate_limit(current_user.id, rating_attempts, 60, 1):
+    if check_action_rate_limit(current_user.id, rating_attempts, 60, 1, "rating"):
         raise HTTPException(
             status_code=429,
             detail="Вы можете ставить оценки не чаще 1 раза в минуту. Подождите немного."
         )
     
     db_rating = crud.create_or_update_rating(db, current_user.id, rating)
+    statistics.invalidate_user_statistics(current_user.id)
+    # Средний рейтинг есть и в карточке книги, и в списке каталога
+    http_cache.invalidate(http_cache.CATALOG_TAG, http_cache.book_tag(rating.book_id))
     return schemas.RatingResponse(
         id=db_rating.id,
         user_id=db_rating.user_id,
@@ -542,6 +862,15 @@ def create_or_update_rating(
 
 # ============ FILTERS ENDPOINTS ============
 
+@app.get("/api/suggest")
+def get_suggestions(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=20),
+    type: Optional[str] = Query(None, regex="^(title|author|genre)$")
+):
+    """Подсказки для строки поиска по префиксу (названия, авторы, жанры)"""
+    return {"suggestions": suggest.suggest(q, limit=limit, field=type)}
+
 @app.get("/api/filters/tags")
 def get_tags(db: Session = Depends(get_db)):
     """Получить список всех тегов"""
@@ -557,6 +886,86 @@ def get_authors(db: Session = Depends(get_db)):
     """Получить список всех авторов"""
     return {"authors": crud.get_all_authors(db)}
 
+# ============ STATISTICS ENDPOINTS ============
+
+@app.get("/api/me/stats", response_model=schemas.UserStatistics)
+def get_my_stats(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Получить статистику текущего пользователя"""
+    return statistics.get_user_statistics(db, current_user.id)
+
+@app.get("/api/me/recommendations", response_model=List[schemas.BookResponse])
+def get_my_recommendations(
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Рекомендации по избранному и прочитанному; пока отметок нет — популярные книги"""
+    books = recommendations.get_user_recommendations(db, current_user.id, limit=limit)
+    if not books:
+        books = crud.get_books(db, limit=limit, sort="popular")
+    return build_book_responses(db, books, current_user)
+
+@app.get("/api/admin/stats", response_model=schemas.LibraryStatistics)
+def get_admin_stats(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Получить общую статистику библиотеки (только для админов)"""
+    return statistics.get_global_statistics(db)
+
+@app.post("/api/admin/books/optimize", response_model=schemas.JobAccepted, status_code=status.HTTP_202_ACCEPTED)
+def optimize_books(
+    request: schemas.OptimizeBooksRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Создать копии PDF для быстрого просмотра: указанные книги или все необработанные (только для админов, в фоне)"""
+    from . import jobs
+    job = jobs.enqueue(
+        db, "optimize_pdfs",
+        payload={"book_ids": request.book_ids, "force": request.force},
+        user_id=current_user.id
+    )
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/api/admin/books/optimization", response_model=schemas.OptimizationReport)
+def get_optimization_report(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Экономия места и объем до первой страницы до/после оптимизации (только для админов)"""
+    return pdf_optimizer.get_report(db)
+
+@app.get("/api/admin/analytics/books", response_model=List[schemas.BookAnalytics])
+def get_analytics_top_books(
+    days: int = Query(30, ge=1, le=366),
+    metric: str = Query("views", pattern="^(views|downloads|pages)$"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Самые просматриваемые/скачиваемые/читаемые книги за период (только для админов)"""
+    return analytics.get_top_books(db, days=days, metric=metric, limit=limit)
+
+@app.get("/api/admin/analytics/daily", response_model=List[schemas.DailyAnalytics])
+def get_analytics_daily(
+    days: int = Query(30, ge=1, le=366),
+    book_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Просмотры, скачивания и страницы по дням: по библиотеке или по книге (только для админов)"""
+    return analytics.get_daily(db, days=days, book_id=book_id)
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Метрики в формате Prometheus"""
+    content, content_type = metrics.render_metrics()
+    return Response(content=content, media_type=content_type)
+
 @app.get("/api/health")
 def health_check():
     """Проверка здоровья API"""
@@ -585,6 +994,9 @@ def create_report(
     db_report = crud.create_review_report(
         db, report.review_id, current_user.id, report.reason, report.comment
     )
+    # Жалоба могла довести отзыв до порога автоскрытия
+    if moderation.is_hidden(db, report.review_id):
+        http_cache.invalidate(http_cache.REVIEWS_TAG)
     
     return schemas.ReviewReportResponse(
         id=db_report.id,
@@ -609,17 +1021,19 @@ def create_report(
 
 @app.get("/api/admin/reports", response_model=List[schemas.ReviewReportResponse])
 def get_reports(
+    response: Response,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=PAGE_MAX_LIMIT),
+    cursor: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_admin_user)
 ):
     """Получить список жалоб (только для админов)"""
-    reports = crud.get_pending_reports(db, skip, limit)
+    reports = crud.get_pending_reports(db, skip, limit, cursor=cursor)
+    set_next_cursor(response, reports, limit)
     
-    result = []
-    for report in reports:
-        result.append(schemas.ReviewReportResponse(
+    return [
+        schemas.ReviewReportResponse(
             id=report.id,
             review_id=report.review_id,
             reporter_id=report.reporter_id,
@@ -630,18 +1044,52 @@ def get_reports(
             resolved_at=report.resolved_at,
             resolved_by=report.resolved_by,
             review=schemas.ReviewResponse(
-                id=report.review.id,
-                user_id=report.review.user_id,
-                book_id=report.review.book_id,
-                text=report.review.text,
-                created_at=report.review.created_at,
-                user_name=report.review.user.full_name
+                id=report.review_id,
+                user_id=report.review_user_id,
+                book_id=report.review_book_id,
+                text=report.review_text,
+                created_at=report.review_created_at,
+                user_name=report.review_user_name
             ),
-            reporter_name=report.reporter.full_name
-        ))
-    
+            reporter_name=report.reporter_name
+        )
+        for report in reports
+    ]
+
+@app.get("/api/admin/reports/queue", response_model=List[schemas.ModerationQueueItem])
+def get_reports_queue(
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=PAGE_MAX_LIMIT),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Очередь модерации: отзывы с жалобами, сначала самые обсуждаемые и свежие (только для админов)"""
+    return moderation.get_queue(db, skip=skip, limit=limit)
+
+def apply_resolution(db: Session, admin_id: int, action: str, report_ids=(), review_ids=()) -> dict:
+    """Обработать жалобы и сбросить связанные кэши"""
+    result = moderation.resolve_reports(db, admin_id, action, report_ids=report_ids, review_ids=review_ids)
+    if result["reviews"]:
+        http_cache.invalidate(http_cache.REVIEWS_TAG)
+    for user_id in result["authors"]:
+        statistics.invalidate_user_statistics(user_id)
     return result
 
+@app.post("/api/admin/reports/resolve")
+def resolve_reports(
+    request: schemas.ResolveReportsRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Обработать пакет жалоб: по ID жалоб и/или всем жалобам отзывов (только для админов)"""
+    result = apply_resolution(db, current_user.id, request.action, request.report_ids, request.review_ids)
+    return {
+        "message": "Жалобы обработаны",
+        "action": request.action,
+        "reports": result["reports"],
+        "reviews": result["reviews"],
+    }
+
 @app.post("/api/admin/reports/{report_id}/resolve")
 def resolve_report(
     report_id: int,
@@ -650,12 +1098,22 @@ def resolve_report(
     current_user: models.User = Depends(auth.get_current_admin_user)
 ):
     """Обработать жалобу (только для админов)"""
-    report = crud.resolve_report(db, report_id, current_user.id, action)
-    if not report:
+    if not crud.get_report_by_id(db, report_id):
         raise HTTPException(status_code=404, detail="Жалоба не найдена")
+    apply_resolution(db, current_user.id, action, report_ids=[report_id])
     
     return {"message": "Жалоба обработана", "action": action}
 
+@app.post("/api/admin/popularity/refresh")
+def refresh_popularity(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    """Пересчитать популярность книг сейчас, не дожидаясь планового обновления (только для админов)"""
+    if not popularity.refresh_popularity(db):
+        raise HTTPException(status_code=409, detail="Популярность уже пересчитывается")
+    return {"message": "Популярность книг обновлена"}
+
 @app.get("/api/admin/reports/stats")
 def get_reports_stats(
     db: Session = Depends(get_db),
@@ -704,6 +1162,70 @@ def remove_bookmark(
         return {"message": "Закладка удалена"}
     raise HTTPException(status_code=404, detail="Закладка не найдена")
 
+# ============ ANNOTATIONS SYNC ENDPOINTS ============
+
+@app.get("/api/books/{book_id}/annotations", response_model=schemas.AnnotationSyncResponse)
+def get_annotations(
+    book_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Получить закладки и заметки пользователя для книги с токеном версии"""
+    return crud.get_annotations_state(db, current_user.id, book_id)
+
+@app.post("/api/books/{book_id}/annotations/sync", response_model=schemas.AnnotationSyncResponse)
+def sync_annotations(
+    book_id: int,
+    sync_data: schemas.AnnotationSyncRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Применить пакет изменений закладок и заметок и вернуть итоговое состояние"""
+    if not crud.get_book(db, book_id):
+        raise HTTPException(status_code=404, detail="Книга не найдена")
+    
+    return crud.sync_annotations(db, current_user.id, book_id, sync_data.bookmarks, sync_data.notes)
+
+# ============ READING PROGRESS ENDPOINTS ============
+
+@app.get("/api/progress", response_model=List[schemas.ContinueReadingItem])
+def get_continue_reading(
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Получить недавно открытые книги для «Продолжить чтение»"""
+    entries = progress.get_continue_reading(db, current_user.id, limit)
+    books = build_book_responses(db, [book for book, _, _ in entries], current_user)
+    return [
+        schemas.ContinueReadingItem(book=book, page=page, updated_at=updated_at)
+        for book, (_, page, updated_at) in zip(books, entries)
+    ]
+
+@app.get("/api/progress/{book_id}", response_model=schemas.ReadingProgressResponse)
+def get_reading_progress(
+    book_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Получить последнюю открытую страницу книги"""
+    result = progress.get_progress(db, current_user.id, book_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Прогресс чтения не найден")
+    page, updated_at = result
+    return schemas.ReadingProgressResponse(book_id=book_id, page=page, updated_at=updated_at)
+
+@app.put("/api/progress/{book_id}", response_model=schemas.ReadingProgressResponse)
+def update_reading_progress(
+    book_id: int,
+    progress_data: schemas.ReadingProgressUpdate,
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    """Сохранить текущую страницу (запись в БД происходит пакетно в фоне)"""
+    updated_at = progress.buffer.record(current_user.id, book_id, progress_data.page)
+    analytics.record(book_id, analytics.PAGE)
+    return schemas.ReadingProgressResponse(book_id=book_id, page=progress_data.page, updated_at=updated_at)
+
 # ============ NOTES ENDPOINTS ============
 
 @app.get("/api/notes/{book_id}")
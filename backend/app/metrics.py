@@ -0,0 +1,122 @@
+"""
+Метрики в формате Prometheus
+
+Middleware считает запросы, задержки и запросы «в полете» по шаблону
+маршрута, а также число и время SQL-запросов на HTTP-запрос (через
+события движка в database.py). При нескольких воркерах задайте
+PROMETHEUS_MULTIPROC_DIR — тогда /metrics агрегирует данные всех процессов
+(gunicorn.conf.py задает и очищает ее сам).
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+
+from .database import track_queries
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUESTS = Counter(
+    "http_requests_total", "Количество HTTP-запросов",
+    ["method", "route", "status"]
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP-запросы в обработке",
+    ["method"], multiprocess_mode="livesum"
+)
+DB_STATEMENTS = Histogram(
+    "db_statements_per_request", "Количество SQL-запросов на HTTP-запрос",
+    ["route"], buckets=STATEMENT_BUCKETS
+)
+DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Суммарное время SQL-запросов на HTTP-запрос",
+    ["route"], buckets=LATENCY_BUCKETS
+)
+BYTES_SERVED = Counter(
+    "book_bytes_served_total", "Отданные байты файлов книг",
+    ["endpoint"]
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total", "Запросы, отклоненные rate limiter'ом",
+    ["action"]
+)
+HTTP_CACHE_REQUESTS = Counter(
+    "http_cache_requests_total", "Обращения к HTTP-кэшу анонимных ответов",
+    ["result"]
+)
+
+# Эндпоинты, отдающие файлы книг: имя функции -> метка
+FILE_ENDPOINTS = {"view_book": "view", "download_book": "download"}
+
+
+def _route_label(scope) -> str:
+    """Шаблон маршрута вместо фактического пути, чтобы не плодить метки"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: не буферизует тело ответа, поэтому подходит и для файлов"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_holder = {"status": 500, "length": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+                for name, value in message.get("headers", []):
+                    if name == b"content-length":
+                        status_holder["length"] = int(value)
+            await send(message)
+
+        IN_PROGRESS.labels(method).inc()
+        start = time.perf_counter()
+        try:
+            with track_queries() as stats:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_PROGRESS.labels(method).dec()
+
+            route = _route_label(scope)
+            REQUESTS.labels(method, route, str(status_holder["status"])).inc()
+            LATENCY.labels(method, route).observe(elapsed)
+            DB_STATEMENTS.labels(route).observe(stats.statements)
+            DB_TIME.labels(route).observe(stats.duration)
+
+            endpoint = FILE_ENDPOINTS.get(getattr(scope.get("endpoint"), "__name__", None))
+            if endpoint and status_holder["status"] < 300:
+                BYTES_SERVED.labels(endpoint).inc(status_holder["length"])
+
+
+def render_metrics() -> tuple:
+    """Текст метрик и content-type; при PROMETHEUS_MULTIPROC_DIR — по всем воркерам"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
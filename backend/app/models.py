@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Text, Table
+from sqlalchemy import DDL, event, Column, Integer, BigInteger, String, Boolean, Float, REAL, ForeignKey, Date, DateTime, Text, Table, Index, UniqueConstraint, JSON, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -64,6 +64,9 @@ class Book(Base):
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        Index("idx_reviews_book_id_id", "book_id", text("id DESC")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -93,6 +96,9 @@ class Rating(Base):
 
 class Bookmark(Base):
     __tablename__ = "bookmarks"
+    __table_args__ = (
+        UniqueConstraint("user_id", "book_id", "page", name="bookmarks_user_id_book_id_page_key"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -107,12 +113,16 @@ class Bookmark(Base):
 
 class Note(Base):
     __tablename__ = "notes"
+    __table_args__ = (
+        Index("idx_notes_user_client_id", "user_id", "client_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
     page = Column(Integer, nullable=False)
     text = Column(Text, nullable=False)
+    client_id = Column(String(64))  # идентификатор заметки, созданной офлайн на клиенте
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -123,6 +133,10 @@ class Note(Base):
 
 class ReviewReport(Base):
     __tablename__ = "review_reports"
+    __table_args__ = (
+        # Причины необработанных жалоб по отзывам — index-only scan для очереди модерации
+        Index("idx_reports_pending_review", "review_id", "reason", postgresql_where=text("status = 'pending'")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     review_id = Column(Integer, ForeignKey("reviews.id", ondelete="CASCADE"), nullable=False)
@@ -138,3 +152,216 @@ class ReviewReport(Base):
     review = relationship("Review", back_populates="reports")
     reporter = relationship("User", foreign_keys=[reporter_id], back_populates="reported_reviews")
     resolver = relationship("User", foreign_keys=[resolved_by], back_populates="resolved_reports")
+
+
+class ReviewModerationQueue(Base):
+    """
+    Очередь модерации: необработанные жалобы, сгруппированные по отзыву
+
+    В PostgreSQL поддерживается триггерами на review_reports (см. moderation.py).
+    Очередь читается по индексу приоритета: больше жалоб, затем свежее.
+    """
+    __tablename__ = "review_moderation_queue"
+    __table_args__ = (
+        Index(
+            "idx_review_queue_priority",
+            text("pending_count DESC"), text("last_reported_at DESC"), "review_id",
+            postgresql_where=text("pending_count > 0")
+        ),
+    )
+    
+    review_id = Column(Integer, ForeignKey("reviews.id", ondelete="CASCADE"), primary_key=True)
+    pending_count = Column(Integer, nullable=False, default=0)
+    last_reported_at = Column(DateTime)
+
+
+class LibraryCounter(Base):
+    """
+    Сводные счетчики библиотеки (книги, пользователи, отзывы, оценки), поддерживаются триггерами
+
+    Счетчик разбит на строки-шарды: параллельные записи обновляют случайный шард
+    и не ждут друг друга на одной строке; значение — сумма шардов.
+    """
+    __tablename__ = "library_counters"
+    
+    name = Column(String, primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class StreamTicket(Base):
+    """Одноразовый билет на подписку SSE: EventSource не передает заголовок Authorization"""
+    __tablename__ = "stream_tickets"
+
+    ticket_hash = Column(String(64), primary_key=True)  # sha256 билета; сам билет не хранится
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class PeriodicRun(Base):
+    """Время последнего запуска периодической задачи, общей для всех воркеров"""
+    __tablename__ = "periodic_runs"
+
+    name = Column(String(50), primary_key=True)
+    last_run_at = Column(DateTime, nullable=False)
+
+
+class ReadingProgress(Base):
+    """Последняя открытая страница книги у пользователя (для «Продолжить чтение»)"""
+    __tablename__ = "reading_progress"
+    __table_args__ = (
+        Index("idx_reading_progress_user_updated", "user_id", text("updated_at DESC")),
+    )
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    page = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class BookEvent(Base):
+    """
+    Сырые события просмотра, скачивания и чтения страниц (см. analytics.py)
+
+    Без внешних ключей: пачка из буфера грузится COPY без проверок, события
+    удаленных книг отсекаются при свертке. Строки живут до ближайшей
+    свертки в book_daily_stats.
+    """
+    __tablename__ = "book_events"
+    
+    # Последовательность растет быстро, хотя строки живут недолго
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    book_id = Column(Integer, nullable=False)
+    event_type = Column(String(16), nullable=False)  # view, download, page
+    created_at = Column(DateTime, nullable=False)
+
+
+class BookDailyStats(Base):
+    """Дневные счетчики книги: просмотры, скачивания, прочитанные страницы"""
+    __tablename__ = "book_daily_stats"
+    __table_args__ = (
+        Index("idx_book_daily_stats_day", "day"),
+    )
+    
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    views = Column(BigInteger, nullable=False, default=0)
+    downloads = Column(BigInteger, nullable=False, default=0)
+    pages = Column(BigInteger, nullable=False, default=0)
+
+
+class BookOptimization(Base):
+    """
+    Оптимизированная для просмотра копия PDF (см. pdf_optimizer.py)
+
+    Размер и mtime исходного файла на момент оптимизации: если файл
+    заменили, /view отдает оригинал до повторной оптимизации.
+    """
+    __tablename__ = "book_optimizations"
+    
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    status = Column(String(20), nullable=False)  # optimized, skipped, failed
+    source_size = Column(BigInteger, nullable=False)
+    source_mtime = Column(Float, nullable=False)
+    # Сколько байт нужно получить до показа первой страницы
+    source_first_page_bytes = Column(BigInteger, nullable=False)
+    optimized_size = Column(BigInteger, nullable=True)
+    optimized_first_page_bytes = Column(BigInteger, nullable=True)
+    duration_ms = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    optimized_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class BookSimilarity(Base):
+    """
+    Предрасчитанные похожие книги: top-k на книгу (см. similarity.py)
+
+    Без внешних ключей, чтобы полная перестройка грузилась COPY без проверок;
+    строки удаленных книг отсекаются join'ом с books при чтении.
+    """
+    __tablename__ = "book_similarities"
+    
+    book_id = Column(Integer, primary_key=True)
+    similar_book_id = Column(Integer, primary_key=True)
+    score = Column(REAL, nullable=False)
+
+
+class SimilarityDirtyBook(Base):
+    """Книги, у которых изменились избранное/прочитанное после последней перестройки похожих"""
+    __tablename__ = "similarity_dirty_books"
+    
+    book_id = Column(Integer, primary_key=True)
+
+
+class Job(Base):
+    """Фоновая задача (синхронизация, массовое удаление и т.п.), выполняется воркером app.jobs"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Очередь: воркер выбирает готовые задачи по run_at
+        Index("idx_jobs_queued_run_at", "run_at", postgresql_where=text("status = 'queued'")),
+        Index("idx_jobs_created_at", text("created_at DESC")),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    payload = Column(JSON, nullable=False, default=dict)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    progress_current = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+
+# ============ МИГРАЦИИ СУЩЕСТВУЮЩИХ ТАБЛИЦ (PostgreSQL) ============
+# create_all не меняет уже созданные таблицы, а init.sql выполняется только
+# при создании тома БД; эти команды идемпотентны и идут при каждом старте.
+
+_migrations = [
+    # Идентификатор офлайн-заметки и уникальный индекс для ON CONFLICT в crud.sync_annotations
+    "ALTER TABLE notes ADD COLUMN IF NOT EXISTS client_id VARCHAR(64)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_notes_user_client_id ON notes (user_id, client_id)",
+    # Таблица закладок, созданная create_all до появления UniqueConstraint, может
+    # содержать дубли: они удаляются один раз, перед созданием индекса
+    """
+DO $$
+BEGIN
+    IF to_regclass('bookmarks_user_id_book_id_page_key') IS NULL THEN
+        DELETE FROM bookmarks a USING bookmarks b
+        WHERE a.user_id = b.user_id AND a.book_id = b.book_id AND a.page = b.page AND a.id > b.id;
+        CREATE UNIQUE INDEX bookmarks_user_id_book_id_page_key ON bookmarks (user_id, book_id, page);
+    END IF;
+END $$
+""",
+    # Триггер из init.sql ставил updated_at = NOW() при любом UPDATE и затирал время
+    # правки с клиента, по которому sync_annotations разрешает конфликты (LWW);
+    # явно заданное значение теперь сохраняется
+    """
+CREATE OR REPLACE FUNCTION notes_touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+        NEW.updated_at = NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+""",
+    """
+CREATE OR REPLACE TRIGGER update_notes_updated_at
+    BEFORE UPDATE ON notes
+    FOR EACH ROW EXECUTE FUNCTION notes_touch_updated_at()
+""",
+]
+
+for _statement in _migrations:
+    event.listen(Base.metadata, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
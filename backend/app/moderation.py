@@ -0,0 +1,245 @@
+"""
+Модерация отзывов: очередь, пакетная обработка жалоб и автоскрытие
+
+Необработанные жалобы группируются по отзыву в review_moderation_queue;
+в PostgreSQL таблицу поддерживают statement-level триггеры на
+review_reports, поэтому пакетное изменение тысяч жалоб обновляет очередь
+одним запросом на оператор. Очередь отдается по индексу приоритета
+(число жалоб, затем свежесть). Отзыв с MODERATION_AUTO_HIDE_THRESHOLD и
+более необработанными жалобами скрыт из публичных списков, пока
+модератор не примет решение.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from sqlalchemy import DDL, and_, delete, event, exists, func, insert, or_, select, true, update
+from sqlalchemy.orm import Session, aliased
+
+from . import models
+from .config import settings
+
+PENDING, DISMISSED = "pending", "dismissed"
+
+# ============ ТРИГГЕРЫ ОЧЕРЕДИ (PostgreSQL) ============
+
+_queue_function = DDL("""
+CREATE OR REPLACE FUNCTION review_queue_sync()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO review_moderation_queue AS q (review_id, pending_count, last_reported_at)
+        SELECT review_id, COUNT(*), MAX(created_at) FROM new_reports
+        WHERE status = 'pending' GROUP BY review_id
+        ON CONFLICT (review_id) DO UPDATE SET
+            pending_count = q.pending_count + EXCLUDED.pending_count,
+            last_reported_at = GREATEST(q.last_reported_at, EXCLUDED.last_reported_at);
+        RETURN NULL;
+    END IF;
+
+    -- Строки удаленных (каскадом) отзывов уже удалены или будут удалены, UPDATE их пропустит
+    IF TG_OP = 'UPDATE' THEN
+        UPDATE review_moderation_queue AS q SET pending_count = q.pending_count + d.delta
+        FROM (
+            SELECT review_id, SUM(delta) AS delta FROM (
+                SELECT review_id, -1 AS delta FROM old_reports WHERE status = 'pending'
+                UNION ALL
+                SELECT review_id, 1 FROM new_reports WHERE status = 'pending'
+            ) changes GROUP BY review_id
+        ) d
+        WHERE q.review_id = d.review_id AND d.delta <> 0;
+    ELSE
+        UPDATE review_moderation_queue AS q SET pending_count = q.pending_count - d.removed
+        FROM (
+            SELECT review_id, COUNT(*) AS removed FROM old_reports
+            WHERE status = 'pending' GROUP BY review_id
+        ) d
+        WHERE q.review_id = d.review_id;
+    END IF;
+    DELETE FROM review_moderation_queue
+    WHERE review_id IN (SELECT review_id FROM old_reports) AND pending_count <= 0;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+
+event.listen(
+    models.Base.metadata, "after_create",
+    _queue_function.execute_if(dialect="postgresql")
+)
+
+for _operation, _referencing in (
+    ("insert", "NEW TABLE AS new_reports"),
+    ("update", "OLD TABLE AS old_reports NEW TABLE AS new_reports"),
+    ("delete", "OLD TABLE AS old_reports"),
+):
+    event.listen(models.Base.metadata, "after_create", DDL(f"""
+CREATE OR REPLACE TRIGGER review_queue_{_operation}
+    AFTER {_operation.upper()} ON review_reports
+    REFERENCING {_referencing}
+    FOR EACH STATEMENT EXECUTE FUNCTION review_queue_sync()
+""").execute_if(dialect="postgresql"))
+
+# Начальное заполнение из уже поданных жалоб, повторный запуск его не трогает
+event.listen(models.Base.metadata, "after_create", DDL("""
+INSERT INTO review_moderation_queue (review_id, pending_count, last_reported_at)
+SELECT review_id, COUNT(*), MAX(created_at) FROM review_reports
+WHERE status = 'pending' GROUP BY review_id
+ON CONFLICT (review_id) DO NOTHING
+""").execute_if(dialect="postgresql"))
+
+def rebuild_queue(db: Session) -> int:
+    """
+    Пересобрать очередь по review_reports
+
+    Нужна без триггеров (не PostgreSQL) и после массовой загрузки жалоб.
+    """
+    db.execute(delete(models.ReviewModerationQueue))
+    db.execute(insert(models.ReviewModerationQueue).from_select(
+        ["review_id", "pending_count", "last_reported_at"],
+        select(
+            models.ReviewReport.review_id,
+            func.count(),
+            func.max(models.ReviewReport.created_at)
+        ).where(
+            models.ReviewReport.status == PENDING
+        ).group_by(models.ReviewReport.review_id)
+    ))
+    db.commit()
+    return db.query(func.count(models.ReviewModerationQueue.review_id)).scalar() or 0
+
+# ============ АВТОСКРЫТИЕ ============
+
+def visible_reviews():
+    """Условие для публичных выборок отзывов: без автоматически скрытых"""
+    threshold = settings.MODERATION_AUTO_HIDE_THRESHOLD
+    if threshold <= 0:
+        return true()
+    return ~exists().where(
+        models.ReviewModerationQueue.review_id == models.Review.id,
+        models.ReviewModerationQueue.pending_count >= threshold
+    )
+
+def is_hidden(db: Session, review_id: int) -> bool:
+    """Скрыт ли отзыв из-за числа жалоб"""
+    threshold = settings.MODERATION_AUTO_HIDE_THRESHOLD
+    if threshold <= 0:
+        return False
+    pending = db.query(models.ReviewModerationQueue.pending_count).filter(
+        models.ReviewModerationQueue.review_id == review_id
+    ).scalar()
+    return (pending or 0) >= threshold
+
+# ============ ОЧЕРЕДЬ ============
+
+def get_queue(db: Session, skip: int = 0, limit: int = 50) -> List[dict]:
+    """
+    Отзывы с необработанными жалобами: больше жалоб и свежее — выше
+
+    Страница читается по idx_review_queue_priority, причины жалоб для нее
+    считаются вторым запросом по idx_reports_pending_review.
+    """
+    queue = models.ReviewModerationQueue
+    author = aliased(models.User)
+    rows = db.query(
+        queue.review_id,
+        queue.pending_count,
+        queue.last_reported_at,
+        models.Review.user_id,
+        models.Review.book_id,
+        models.Review.text,
+        models.Review.created_at,
+        author.full_name.label("user_name"),
+        models.Book.title.label("book_title")
+    ).join(
+        models.Review, models.Review.id == queue.review_id
+    ).join(
+        author, author.id == models.Review.user_id
+    ).join(
+        models.Book, models.Book.id == models.Review.book_id
+    ).filter(
+        queue.pending_count > 0
+    ).order_by(
+        queue.pending_count.desc(), queue.last_reported_at.desc(), queue.review_id
+    ).offset(skip).limit(limit).all()
+
+    reasons: Dict[int, Dict[str, int]] = {row.review_id: {} for row in rows}
+    if reasons:
+        for review_id, reason, count in db.query(
+            models.ReviewReport.review_id, models.ReviewReport.reason, func.count()
+        ).filter(
+            models.ReviewReport.status == PENDING,
+            models.ReviewReport.review_id.in_(list(reasons))
+        ).group_by(models.ReviewReport.review_id, models.ReviewReport.reason):
+            reasons[review_id][reason] = count
+
+    threshold = settings.MODERATION_AUTO_HIDE_THRESHOLD
+    return [
+        {
+            "review_id": row.review_id,
+            "pending_count": row.pending_count,
+            "last_reported_at": row.last_reported_at,
+            "hidden": threshold > 0 and row.pending_count >= threshold,
+            "reasons": reasons[row.review_id],
+            "book_title": row.book_title,
+            "review": {
+                "id": row.review_id,
+                "user_id": row.user_id,
+                "book_id": row.book_id,
+                "text": row.text,
+                "created_at": row.created_at,
+                "user_name": row.user_name,
+            },
+        }
+        for row in rows
+    ]
+
+# ============ ОБРАБОТКА ============
+
+def resolve_reports(
+    db: Session,
+    admin_id: int,
+    action: str,  # dismiss, delete_review
+    report_ids: Iterable[int] = (),
+    review_ids: Iterable[int] = ()
+) -> dict:
+    """
+    Обработать жалобы пакетом в одной транзакции
+
+    dismiss — необработанные жалобы (по id или всем жалобам отзывов)
+    отклоняются одним UPDATE; delete_review — отзывы удаляются одним
+    DELETE, их жалобы удаляются каскадом. Возвращает число обработанных
+    жалоб и отзывов и авторов удаленных отзывов.
+    """
+    report = models.ReviewReport
+    report_ids, review_ids = list(report_ids), list(review_ids)
+    target = or_(report.id.in_(report_ids), report.review_id.in_(review_ids))
+
+    if action == "dismiss":
+        reviews = set(db.execute(
+            select(report.review_id).where(report.status == PENDING, target).distinct()
+        ).scalars())
+        reports = db.execute(
+            update(report).where(and_(report.status == PENDING, target)).values(
+                status=DISMISSED, resolved_at=datetime.utcnow(), resolved_by=admin_id
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        authors = []
+    else:
+        reviews = set(review_ids) | set(db.execute(
+            select(report.review_id).where(report.id.in_(report_ids))
+        ).scalars())
+        reports = db.execute(
+            select(func.count()).select_from(report).where(
+                report.status == PENDING, report.review_id.in_(reviews)
+            )
+        ).scalar() or 0
+        deleted = db.execute(
+            delete(models.Review).where(models.Review.id.in_(reviews)).returning(
+                models.Review.id, models.Review.user_id
+            ).execution_options(synchronize_session=False)
+        ).all()
+        reviews = {review_id for review_id, _ in deleted}
+        authors = sorted({user_id for _, user_id in deleted})
+
+    db.commit()
+    return {"reports": reports, "reviews": len(reviews), "authors": authors}
@@ -0,0 +1,296 @@
+"""
+Оптимизация PDF для быстрого просмотра в браузере
+
+Отсканированные книги обычно не линеаризованы: просмотрщику нужен весь
+файл, прежде чем он покажет первую страницу. Для каждой книги
+создается копия в хранилище storage.optimized: при PDF_OPTIMIZE_IMAGES
+изображения сначала пережимаются Ghostscript (с потерями), затем qpdf
+линеаризует файл и пересжимает потоки без потерь. Оригинал не меняется
+и отдается в /download; /view отдает копию, пока оригинал не заменен.
+
+Каждый файл обрабатывается отдельным процессом qpdf/gs, одновременно —
+не больше PDF_OPTIMIZE_WORKERS. Запускается задачей optimize_pdfs
+(python -m app.jobs), при PDF_OPTIMIZE_ON_INGEST — автоматически после
+загрузки, синхронизации и импорта книг.
+"""
+import logging
+import os
+import re
+import shutil
+import subprocess
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from . import models, storage
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+OPTIMIZED, SKIPPED, FAILED = "optimized", "skipped", "failed"
+
+# Словарь линеаризации — первый объект файла, в пределах первых 1024 байт
+_LINEARIZED = re.compile(rb"/Linearized\s")
+_FIRST_PAGE_END = re.compile(rb"/E\s+(\d+)")
+_FILE_LENGTH = re.compile(rb"/L\s+(\d+)")
+
+
+def derivative_key(book_id: int) -> str:
+    return f"{book_id}.pdf"
+
+def first_page_bytes(path: str) -> Optional[int]:
+    """
+    Сколько байт от начала файла достаточно для первой страницы
+
+    None — файл не линеаризован (или линеаризация нарушена дописыванием:
+    /L не совпадает с размером), тогда просмотрщику нужен весь файл.
+    """
+    with open(path, "rb") as file:
+        head = file.read(1024)
+    if not _LINEARIZED.search(head):
+        return None
+    first_page_end, length = _FIRST_PAGE_END.search(head), _FILE_LENGTH.search(head)
+    if not first_page_end or not length or int(length.group(1)) != os.path.getsize(path):
+        return None
+    return int(first_page_end.group(1))
+
+def _run(command: List[str]) -> None:
+    result = subprocess.run(command, capture_output=True, timeout=settings.PDF_OPTIMIZE_TIMEOUT)
+    # qpdf: 3 — предупреждения, файл записан
+    allowed = (0, 3) if command[0] == "qpdf" else (0,)
+    if result.returncode not in allowed:
+        message = result.stderr.decode("utf-8", "replace").strip().splitlines()
+        raise RuntimeError(f"{command[0]}: {message[-1] if message else result.returncode}")
+
+def _convert(source: str, target: str, images_part: str, source_size: int) -> None:
+    linearize_input = source
+    if settings.PDF_OPTIMIZE_IMAGES:
+        _run([
+            "gs", "-q", "-dSAFER", "-dBATCH", "-dNOPAUSE", "-sDEVICE=pdfwrite",
+            f"-dPDFSETTINGS=/{settings.PDF_OPTIMIZE_IMAGES}", f"-sOutputFile={images_part}", source
+        ])
+        if os.path.getsize(images_part) < source_size:
+            linearize_input = images_part
+    _run([
+        "qpdf", "--linearize", "--object-streams=generate",
+        "--recompress-flate", "--compression-level=9", linearize_input, target
+    ])
+
+def optimize_file(info: storage.ObjectInfo, target: str) -> dict:
+    """
+    Создать линеаризованную копию книги info из storage.books в локальном target
+
+    Копия не нужна (skipped, target не создается), если оригинал уже
+    линеаризован и копия не меньше его. Возвращает поля для book_optimizations.
+    """
+    started = time.perf_counter()
+    result = {
+        "source_size": info.size,
+        "source_mtime": info.modified,
+        "source_first_page_bytes": info.size,
+        "optimized_size": None,
+        "optimized_first_page_bytes": None,
+        "error": None,
+    }
+    part, images_part = target + ".part", target + ".gs.part"
+    try:
+        # qpdf и gs работают только с локальными файлами
+        with storage.books.local_file(info) as source:
+            source_first_page = first_page_bytes(source)
+            _convert(source, part, images_part, info.size)
+        if source_first_page is not None:
+            result["source_first_page_bytes"] = source_first_page
+        optimized_first_page = first_page_bytes(part)
+        if optimized_first_page is None:
+            raise RuntimeError("qpdf не линеаризовал файл")
+        optimized_size = os.path.getsize(part)
+        if source_first_page is not None and optimized_size >= info.size:
+            result["status"] = SKIPPED
+        else:
+            os.replace(part, target)
+            result.update(status=OPTIMIZED, optimized_size=optimized_size,
+                          optimized_first_page_bytes=optimized_first_page)
+    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+        result.update(status=FAILED, error=str(e))
+    finally:
+        for path in (part, images_part):
+            if os.path.exists(path):
+                os.remove(path)
+    result["duration_ms"] = int((time.perf_counter() - started) * 1000)
+    return result
+
+def optimize_object(book_id: int, info: storage.ObjectInfo) -> dict:
+    """Оптимизировать книгу и сохранить копию в storage.optimized (или удалить ненужную)"""
+    # Рабочий файл на локальном диске, в хранилище попадает готовая копия
+    work = os.path.join(settings.OPTIMIZED_DIRECTORY, f".{book_id}.{uuid.uuid4().hex}.pdf")
+    result = optimize_file(info, work)
+    try:
+        if result["status"] == OPTIMIZED:
+            storage.optimized.put_file(derivative_key(book_id), work, move=True, overwrite=True)
+        elif result["status"] == SKIPPED:
+            storage.optimized.delete(derivative_key(book_id))
+    except OSError as e:
+        result.update(status=FAILED, optimized_size=None, optimized_first_page_bytes=None, error=str(e))
+    finally:
+        if os.path.exists(work):
+            os.remove(work)
+    return result
+
+def remove_derivative(book_id: int) -> None:
+    """Удалить копию книги (при удалении книги)"""
+    storage.optimized.delete(derivative_key(book_id))
+
+def view_object(
+    db: Session, book_id: int, source: storage.ObjectInfo
+) -> Tuple[storage.Storage, storage.ObjectInfo]:
+    """Что отдавать в /view: копию, если она есть и оригинал не менялся, иначе оригинал"""
+    optimization = db.get(models.BookOptimization, book_id)
+    if optimization is None or optimization.status != OPTIMIZED:
+        return storage.books, source
+    if (source.size, source.modified) != (optimization.source_size, optimization.source_mtime):
+        return storage.books, source
+    derivative = storage.optimized.stat(derivative_key(book_id))
+    if derivative is None:
+        return storage.books, source
+    return storage.optimized, derivative
+
+# ============ ПАКЕТНАЯ ОПТИМИЗАЦИЯ ============
+
+def _save(db: Session, rows: List[dict]) -> None:
+    # Книги могли быть удалены, пока файл обрабатывался
+    existing = {row[0] for row in db.query(models.Book.id).filter(models.Book.id.in_([r["book_id"] for r in rows]))}
+    rows = [row for row in rows if row["book_id"] in existing]
+    if rows:
+        stmt = pg_insert(models.BookOptimization).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["book_id"],
+            set_={column: stmt.excluded[column] for column in rows[0] if column != "book_id"}
+        ))
+    db.commit()
+
+def optimize_books(
+    db: Session,
+    book_ids: Optional[List[int]] = None,
+    force: bool = False,
+    progress: Optional[Callable] = None
+) -> dict:
+    """
+    Оптимизировать книги: перечисленные или все еще не обработанные (force — все)
+
+    Результаты пишутся пачками по JOB_BATCH_SIZE по мере готовности файлов.
+    """
+    tools = ["qpdf"] + (["gs"] if settings.PDF_OPTIMIZE_IMAGES else [])
+    missing = [tool for tool in tools if shutil.which(tool) is None]
+    if missing:
+        raise RuntimeError(f"Не установлены: {', '.join(missing)}")
+
+    query = db.query(models.Book.id, models.Book.filename)
+    if book_ids is not None:
+        query = query.filter(models.Book.id.in_(book_ids))
+    elif not force:
+        query = query.outerjoin(
+            models.BookOptimization, models.BookOptimization.book_id == models.Book.id
+        ).filter(models.BookOptimization.book_id.is_(None))
+    books = query.order_by(models.Book.id).all()
+
+    os.makedirs(settings.OPTIMIZED_DIRECTORY, exist_ok=True)
+    if progress:
+        progress(0, len(books), force=True)
+
+    counts: Dict[str, int] = {OPTIMIZED: 0, SKIPPED: 0, FAILED: 0}
+    bytes_saved = 0
+    rows: List[dict] = []
+    with ThreadPoolExecutor(max_workers=settings.PDF_OPTIMIZE_WORKERS) as pool:
+        futures = {}
+        for book_id, filename in books:
+            info = storage.books.stat(filename)
+            if info is not None:
+                futures[pool.submit(optimize_object, book_id, info)] = book_id
+        for done, future in enumerate(as_completed(futures), start=1):
+            row = dict(future.result(), book_id=futures[future], optimized_at=datetime.utcnow())
+            counts[row["status"]] += 1
+            if row["status"] == OPTIMIZED:
+                bytes_saved += row["source_size"] - row["optimized_size"]
+            elif row["status"] == FAILED:
+                logger.warning("Книга %s не оптимизирована: %s", row["book_id"], row["error"])
+            rows.append(row)
+            if len(rows) >= settings.JOB_BATCH_SIZE:
+                _save(db, rows)
+                rows = []
+            if progress:
+                progress(done)
+    if rows:
+        _save(db, rows)
+
+    return {
+        "message": f"Оптимизировано книг: {counts[OPTIMIZED]}",
+        **counts,
+        "missing_files": len(books) - len(futures),
+        "bytes_saved": bytes_saved,
+    }
+
+# ============ ОТЧЕТ ============
+
+def _seconds(size: Optional[float]) -> Optional[float]:
+    """Время загрузки при PDF_REFERENCE_MBPS"""
+    if size is None:
+        return None
+    return round(size * 8 / (settings.PDF_REFERENCE_MBPS * 1_000_000), 2)
+
+def get_report(db: Session, limit: int = 20) -> dict:
+    """Сводка для админов: экономия байт и объем до первой страницы до/после"""
+    optimization = models.BookOptimization
+    statuses = dict(db.query(optimization.status, func.count()).group_by(optimization.status).all())
+    books_total = db.query(func.count(models.Book.id)).scalar() or 0
+
+    totals = db.query(
+        func.coalesce(func.sum(optimization.source_size), 0),
+        func.coalesce(func.sum(optimization.optimized_size), 0),
+        func.avg(optimization.source_first_page_bytes),
+        func.avg(optimization.optimized_first_page_bytes)
+    ).filter(optimization.status == OPTIMIZED).one()
+    source_bytes, optimized_bytes, first_page_before, first_page_after = totals
+
+    saved = (optimization.source_size - optimization.optimized_size).label("bytes_saved")
+    top = db.query(
+        optimization.book_id, models.Book.title, optimization.source_size, optimization.optimized_size,
+        optimization.source_first_page_bytes, optimization.optimized_first_page_bytes, saved
+    ).join(
+        models.Book, models.Book.id == optimization.book_id
+    ).filter(
+        optimization.status == OPTIMIZED
+    ).order_by(saved.desc()).limit(limit).all()
+
+    return {
+        "books_total": books_total,
+        "optimized": statuses.get(OPTIMIZED, 0),
+        "skipped": statuses.get(SKIPPED, 0),
+        "failed": statuses.get(FAILED, 0),
+        "pending": max(books_total - sum(statuses.values()), 0),
+        "source_bytes": int(source_bytes),
+        "optimized_bytes": int(optimized_bytes),
+        "bytes_saved": int(source_bytes - optimized_bytes),
+        "reference_mbps": settings.PDF_REFERENCE_MBPS,
+        "first_page_bytes_before": int(first_page_before) if first_page_before is not None else None,
+        "first_page_bytes_after": int(first_page_after) if first_page_after is not None else None,
+        "first_page_seconds_before": _seconds(first_page_before),
+        "first_page_seconds_after": _seconds(first_page_after),
+        "top_books": [
+            {
+                "book_id": row.book_id,
+                "title": row.title,
+                "source_size": row.source_size,
+                "optimized_size": row.optimized_size,
+                "bytes_saved": row.bytes_saved,
+                "first_page_bytes_before": row.source_first_page_bytes,
+                "first_page_bytes_after": row.optimized_first_page_bytes,
+            }
+            for row in top
+        ],
+    }
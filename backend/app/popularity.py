@@ -0,0 +1,245 @@
+"""
+Популярность книг для сортировки каталога
+
+Оценки считаются в материализованном представлении book_popularity
+(только PostgreSQL), а не на каждый запрос:
+
+- weighted_rating — байесовское среднее: (C * m + сумма оценок) / (C + число оценок),
+  где m — средняя оценка по библиотеке, C = BAYES_PRIOR_WEIGHT;
+- popularity_score — взвешенная сумма избранного, прочитанного, оценок и отзывов;
+- trending_score — отзывы в день за последние TRENDING_WINDOW_DAYS дней.
+
+Представление обновляется REFRESH MATERIALIZED VIEW CONCURRENTLY раз в
+POPULARITY_REFRESH_INTERVAL секунд (чтение каталога при этом не блокируется).
+Обновляет один воркер: остальные пропускают ход по advisory lock, а время
+последнего обновления хранится в periodic_runs, поэтому за интервал
+представление обновляется один раз, сколько бы воркеров ни было.
+
+Страница сортировки читается из представления по индексу, совпадающему с
+ORDER BY. Книги, добавленные после последнего обновления (их id больше
+последнего id в представлении), подмешиваются к ней с оценками книги без
+оценок и отзывов: нулевой популярностью и средней оценкой библиотеки
+(rating_prior) вместо байесовского среднего.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import DDL, BigInteger, Column, Float, Integer, MetaData, Table, event, func, literal, select, text, union_all
+from sqlalchemy.orm import Session
+
+from . import models, http_cache
+from .config import settings
+from .database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+BAYES_PRIOR_WEIGHT = 10
+TRENDING_WINDOW_DAYS = 7
+FAVORITE_WEIGHT = 3
+READ_WEIGHT = 2
+RATING_WEIGHT = 1
+REVIEW_WEIGHT = 1
+
+# Ключ pg_try_advisory_lock, чтобы представление обновлял только один воркер
+REFRESH_LOCK_KEY = 0x626F6F6B  # "book"
+# Запись в periodic_runs с временем последнего обновления
+REFRESH_RUN_NAME = "book_popularity"
+
+# Отдельные метаданные: create_all не должен создавать представление как таблицу
+view_metadata = MetaData()
+
+book_popularity = Table(
+    "book_popularity", view_metadata,
+    Column("book_id", Integer, primary_key=True),
+    Column("rating_count", BigInteger),
+    Column("weighted_rating", Float),
+    Column("favorites_count", BigInteger),
+    Column("read_count", BigInteger),
+    Column("reviews_count", BigInteger),
+    Column("recent_reviews", BigInteger),
+    Column("popularity_score", Float),
+    Column("trending_score", Float),
+    Column("rating_prior", Float),
+)
+
+# Значение sort в /api/books -> колонки сортировки (каждому набору соответствует индекс)
+SORT_COLUMNS = {
+    "popular": (book_popularity.c.popularity_score,),
+    "top_rated": (book_popularity.c.weighted_rating,),
+    "trending": (book_popularity.c.trending_score, book_popularity.c.popularity_score),
+}
+
+# ============ МАТЕРИАЛИЗОВАННОЕ ПРЕДСТАВЛЕНИЕ (PostgreSQL) ============
+
+# Представление без rating_prior (созданное до появления колонки) пересоздается
+_drop_outdated_view = DDL("""
+DO $$
+BEGIN
+    IF to_regclass('book_popularity') IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM pg_attribute
+        WHERE attrelid = to_regclass('book_popularity') AND attname = 'rating_prior' AND NOT attisdropped
+    ) THEN
+        DROP MATERIALIZED VIEW book_popularity;
+    END IF;
+END $$
+""")
+
+_create_view = DDL(f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS book_popularity AS
+WITH rating_prior AS (
+    SELECT COALESCE(AVG(value), 0)::double precision AS mean FROM ratings
+),
+rating_stats AS (
+    SELECT book_id, COUNT(*) AS rating_count, SUM(value) AS rating_sum
+    FROM ratings GROUP BY book_id
+),
+favorite_stats AS (
+    SELECT book_id, COUNT(*) AS favorites_count FROM favorites GROUP BY book_id
+),
+read_stats AS (
+    SELECT book_id, COUNT(*) AS read_count FROM read_books GROUP BY book_id
+),
+review_stats AS (
+    -- created_at хранится в UTC без часового пояса (datetime.utcnow)
+    SELECT book_id,
+           COUNT(*) AS reviews_count,
+           COUNT(*) FILTER (
+               WHERE created_at >= (now() AT TIME ZONE 'utc') - interval '{TRENDING_WINDOW_DAYS} days'
+           ) AS recent_reviews
+    FROM reviews GROUP BY book_id
+),
+counts AS (
+    SELECT b.id AS book_id,
+           COALESCE(rs.rating_count, 0) AS rating_count,
+           COALESCE(rs.rating_sum, 0) AS rating_sum,
+           COALESCE(fs.favorites_count, 0) AS favorites_count,
+           COALESCE(rd.read_count, 0) AS read_count,
+           COALESCE(rv.reviews_count, 0) AS reviews_count,
+           COALESCE(rv.recent_reviews, 0) AS recent_reviews
+    FROM books b
+    LEFT JOIN rating_stats rs ON rs.book_id = b.id
+    LEFT JOIN favorite_stats fs ON fs.book_id = b.id
+    LEFT JOIN read_stats rd ON rd.book_id = b.id
+    LEFT JOIN review_stats rv ON rv.book_id = b.id
+)
+SELECT c.book_id,
+       c.rating_count,
+       ({BAYES_PRIOR_WEIGHT} * rating_prior.mean + c.rating_sum) / ({BAYES_PRIOR_WEIGHT} + c.rating_count) AS weighted_rating,
+       c.favorites_count,
+       c.read_count,
+       c.reviews_count,
+       c.recent_reviews,
+       ({FAVORITE_WEIGHT} * c.favorites_count + {READ_WEIGHT} * c.read_count
+        + {RATING_WEIGHT} * c.rating_count + {REVIEW_WEIGHT} * c.reviews_count)::double precision AS popularity_score,
+       c.recent_reviews::double precision / {TRENDING_WINDOW_DAYS} AS trending_score,
+       rating_prior.mean AS rating_prior
+FROM counts c CROSS JOIN rating_prior
+""")
+
+# Уникальный индекс обязателен для REFRESH ... CONCURRENTLY; остальные
+# совпадают с ORDER BY в ranked_books, чтобы страница читалась по индексу
+_view_indexes = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_book_popularity_book_id ON book_popularity (book_id)",
+    "CREATE INDEX IF NOT EXISTS idx_book_popularity_popular ON book_popularity (popularity_score DESC, book_id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_book_popularity_top_rated ON book_popularity (weighted_rating DESC, book_id DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_book_popularity_trending "
+    "ON book_popularity (trending_score DESC, popularity_score DESC, book_id DESC)",
+]
+
+event.listen(models.Base.metadata, "after_create", _drop_outdated_view.execute_if(dialect="postgresql"))
+event.listen(models.Base.metadata, "after_create", _create_view.execute_if(dialect="postgresql"))
+for _statement in _view_indexes:
+    event.listen(models.Base.metadata, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+# ============ СОРТИРОВКА КАТАЛОГА ============
+
+def ranked_books(sort: str):
+    """
+    Подзапрос (book_id, колонки сортировки sort) по всем книгам; порядок — order_by
+
+    Книги из представления идут в порядке его индекса; новые книги (id больше
+    последнего в представлении, выборка по первичному ключу books) получают
+    оценки книги без активности, поэтому не уходят в конец top_rated.
+    """
+    view = book_popularity
+    columns = SORT_COLUMNS[sort]
+    newest_ranked = select(func.coalesce(func.max(view.c.book_id), 0)).scalar_subquery()
+    prior = func.coalesce(select(view.c.rating_prior).limit(1).scalar_subquery(), 0.0)
+    new_book_scores = {view.c.weighted_rating.name: prior}
+
+    ranked = select(view.c.book_id, *[column.label(column.name) for column in columns])
+    unranked = select(
+        models.Book.id.label("book_id"),
+        *[new_book_scores.get(column.name, literal(0.0)).label(column.name) for column in columns]
+    ).where(models.Book.id > newest_ranked)
+    return union_all(ranked, unranked).subquery("ranked_books")
+
+def order_by(ranked, sort: str) -> list:
+    """ORDER BY для подзапроса ranked_books: колонки сортировки и book_id по убыванию"""
+    return [ranked.c[column.name].desc() for column in SORT_COLUMNS[sort]] + [ranked.c.book_id.desc()]
+
+# ============ ОБНОВЛЕНИЕ ============
+
+def refresh_popularity(db: Session, min_interval: float = 0) -> bool:
+    """
+    Обновить book_popularity, если его сейчас не обновляет другой воркер
+
+    С min_interval обновление пропускается, если с прошлого (в любом воркере)
+    прошло меньше min_interval секунд. Возвращает True, если обновление выполнено.
+    """
+    locked = db.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": REFRESH_LOCK_KEY}).scalar()
+    if not locked:
+        db.rollback()
+        return False
+    now = datetime.utcnow()
+    last_run = db.get(models.PeriodicRun, REFRESH_RUN_NAME)
+    if last_run is not None and min_interval and last_run.last_run_at > now - timedelta(seconds=min_interval):
+        db.rollback()
+        return False
+    if last_run is None:
+        db.add(models.PeriodicRun(name=REFRESH_RUN_NAME, last_run_at=now))
+    else:
+        last_run.last_run_at = now
+    db.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY book_popularity"))
+    db.commit()
+    http_cache.invalidate(http_cache.CATALOG_TAG)
+    return True
+
+_stop_event = threading.Event()
+_refresher: Optional[threading.Thread] = None
+
+def _refresh_loop(interval: float) -> None:
+    while not _stop_event.wait(interval):
+        db = SessionLocal()
+        try:
+            # Запас 10% на неточность таймеров: иначе воркер мог бы пропустить свой ход
+            refresh_popularity(db, min_interval=interval * 0.9)
+        except Exception:
+            db.rollback()
+            logger.exception("Не удалось обновить book_popularity")
+        finally:
+            db.close()
+
+def start_refresher(interval: Optional[float] = None) -> None:
+    """Запустить фоновое обновление (только PostgreSQL; 0 в настройке — выключено)"""
+    global _refresher
+    interval = interval or settings.POPULARITY_REFRESH_INTERVAL
+    if engine.dialect.name != "postgresql" or interval <= 0:
+        return
+    if _refresher is not None and _refresher.is_alive():
+        return
+    _stop_event.clear()
+    _refresher = threading.Thread(
+        target=_refresh_loop, args=(interval,), name="popularity-refresher", daemon=True
+    )
+    _refresher.start()
+
+def stop_refresher() -> None:
+    """Остановить фоновое обновление"""
+    global _refresher
+    _stop_event.set()
+    if _refresher is not None:
+        _refresher.join(timeout=10)
+        _refresher = None
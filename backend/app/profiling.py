@@ -0,0 +1,104 @@
+"""
+Профилирование SQL по запросам (режим разработки)
+
+Включается настройкой SQL_PROFILING. Для каждого HTTP-запроса считает
+SQL-запросы, их суммарное время и повторы одинаковых по форме запросов,
+отдает итог в заголовке Server-Timing и пишет предупреждение, если одна
+форма повторилась больше SQL_PROFILING_REPEAT_THRESHOLD раз (типичный N+1).
+
+Для тестов есть assert_query_budget (фикстура query_budget в tests/conftest.py).
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+from .database import QueryStats, engine, track_queries
+
+logger = logging.getLogger(__name__)
+
+
+def format_server_timing(stats: QueryStats, total: float) -> str:
+    """Значение заголовка Server-Timing: время БД и всего запроса в миллисекундах"""
+    return (
+        f'db;dur={stats.duration * 1000:.1f};desc="{stats.statements} SQL", '
+        f'app;dur={total * 1000:.1f}'
+    )
+
+
+def repeated_shapes(stats: QueryStats, threshold: int) -> list:
+    """Формы запросов, повторенные больше threshold раз, по убыванию числа повторов"""
+    return [(shape, count) for shape, count in stats.shapes.most_common() if count > threshold]
+
+
+class SQLProfilingMiddleware:
+    """ASGI middleware режима профилирования SQL"""
+
+    def __init__(self, app, repeat_threshold: Optional[int] = None):
+        self.app = app
+        self.repeat_threshold = repeat_threshold or settings.SQL_PROFILING_REPEAT_THRESHOLD
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        with track_queries(record_shapes=True) as stats:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    timing = format_server_timing(stats, time.perf_counter() - start)
+                    headers.append((b"server-timing", timing.encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        for shape, count in repeated_shapes(stats, self.repeat_threshold):
+            route = getattr(scope.get("route"), "path", scope.get("path"))
+            logger.warning(
+                "Возможный N+1 в %s %s: запрос выполнен %d раз: %s",
+                scope["method"], route, count, shape[:300]
+            )
+
+
+# ============ БЮДЖЕТ ЗАПРОСОВ ДЛЯ ТЕСТОВ ============
+
+@contextmanager
+def assert_query_budget(
+    max_statements: int,
+    max_repeats: Optional[int] = None,
+    bind: Engine = engine
+) -> Iterator[QueryStats]:
+    """
+    Проверить, что блок кода выполнил не больше max_statements SQL-запросов
+
+    Считаются все запросы движка, в том числе из потоков TestClient.
+    max_repeats ограничивает число повторов одной формы запроса.
+
+        with assert_query_budget(3):
+            client.get("/api/books")
+    """
+    stats = QueryStats(record_shapes=True)
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        stats.record(statement, 0.0)
+
+    event.listen(bind, "after_cursor_execute", _count)
+    try:
+        yield stats
+    finally:
+        event.remove(bind, "after_cursor_execute", _count)
+
+    assert stats.statements <= max_statements, (
+        f"Выполнено {stats.statements} SQL-запросов при бюджете {max_statements}: "
+        f"{dict(stats.shapes.most_common(5))}"
+    )
+    if max_repeats is not None:
+        repeats = repeated_shapes(stats, max_repeats)
+        assert not repeats, f"Запросы повторяются больше {max_repeats} раз: {repeats}"
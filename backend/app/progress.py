@@ -0,0 +1,178 @@
+"""
+Прогресс чтения с объединением записей
+
+Читалка часто сообщает текущую страницу. Вместо записи в БД на каждый
+запрос последняя страница по паре (user_id, book_id) копится в памяти
+воркера и раз в PROGRESS_FLUSH_INTERVAL секунд сбрасывается одним
+пакетным upsert'ом в reading_progress.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressBuffer:
+    """Буфер последних страниц: (user_id, book_id) -> (page, updated_at)"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[int, int], Tuple[int, datetime]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, user_id: int, book_id: int, page: int) -> datetime:
+        """Запомнить страницу; более ранние значения для той же книги затираются"""
+        now = datetime.utcnow()
+        with self._lock:
+            self._pending[(user_id, book_id)] = (page, now)
+        return now
+
+    def get(self, user_id: int, book_id: int) -> Optional[Tuple[int, datetime]]:
+        """Несброшенное значение для книги пользователя"""
+        with self._lock:
+            return self._pending.get((user_id, book_id))
+
+    def for_user(self, user_id: int) -> Dict[int, Tuple[int, datetime]]:
+        """Несброшенные значения пользователя: book_id -> (page, updated_at)"""
+        with self._lock:
+            return {book_id: value for (uid, book_id), value in self._pending.items() if uid == user_id}
+
+    def _restore(self, items: Dict[Tuple[int, int], Tuple[int, datetime]]) -> None:
+        """Вернуть в буфер неудачно сброшенные значения, не затирая более свежие"""
+        with self._lock:
+            for key, value in items.items():
+                current = self._pending.get(key)
+                if current is None or current[1] < value[1]:
+                    self._pending[key] = value
+
+    def flush(self, db: Session) -> int:
+        """Записать накопленные значения одним upsert'ом. Возвращает число строк"""
+        with self._lock:
+            items, self._pending = self._pending, {}
+        if not items:
+            return 0
+
+        try:
+            # Книги и пользователи могли быть удалены, пока значение ждало в буфере
+            book_ids = {book_id for _, book_id in items}
+            user_ids = {user_id for user_id, _ in items}
+            existing_books = {row[0] for row in db.query(models.Book.id).filter(models.Book.id.in_(book_ids))}
+            existing_users = {row[0] for row in db.query(models.User.id).filter(models.User.id.in_(user_ids))}
+            rows = [
+                {"user_id": user_id, "book_id": book_id, "page": page, "updated_at": updated_at}
+                for (user_id, book_id), (page, updated_at) in items.items()
+                if user_id in existing_users and book_id in existing_books
+            ]
+            if rows:
+                stmt = pg_insert(models.ReadingProgress).values(rows)
+                db.execute(stmt.on_conflict_do_update(
+                    index_elements=["user_id", "book_id"],
+                    set_={"page": stmt.excluded.page, "updated_at": stmt.excluded.updated_at},
+                    where=models.ReadingProgress.updated_at < stmt.excluded.updated_at
+                ))
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            self._restore(items)
+            raise
+
+
+buffer = ProgressBuffer()
+
+# ============ ФОНОВЫЙ СБРОС ============
+
+_stop_event = threading.Event()
+_flusher: Optional[threading.Thread] = None
+
+def flush_now() -> int:
+    """Сбросить буфер в БД в отдельной сессии"""
+    db = SessionLocal()
+    try:
+        return buffer.flush(db)
+    finally:
+        db.close()
+
+def _flush_loop(interval: float) -> None:
+    while not _stop_event.wait(interval):
+        try:
+            flush_now()
+        except Exception:
+            logger.exception("Не удалось сохранить прогресс чтения")
+
+def start_flusher(interval: Optional[float] = None) -> None:
+    """Запустить фоновый поток сброса буфера (один на воркер)"""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    _stop_event.clear()
+    _flusher = threading.Thread(
+        target=_flush_loop,
+        args=(interval or settings.PROGRESS_FLUSH_INTERVAL,),
+        name="progress-flusher",
+        daemon=True,
+    )
+    _flusher.start()
+
+def stop_flusher() -> None:
+    """Остановить фоновый поток и сбросить остаток буфера"""
+    global _flusher
+    _stop_event.set()
+    if _flusher is not None:
+        _flusher.join(timeout=10)
+        _flusher = None
+    try:
+        flush_now()
+    except Exception:
+        logger.exception("Не удалось сохранить прогресс чтения при остановке")
+
+# ============ ЧТЕНИЕ ============
+
+def get_progress(db: Session, user_id: int, book_id: int) -> Optional[Tuple[int, datetime]]:
+    """Последняя страница книги с учетом еще не сброшенных значений"""
+    pending = buffer.get(user_id, book_id)
+    if pending is not None:
+        return pending
+    row = db.query(models.ReadingProgress.page, models.ReadingProgress.updated_at).filter(
+        and_(
+            models.ReadingProgress.user_id == user_id,
+            models.ReadingProgress.book_id == book_id
+        )
+    ).first()
+    return (row.page, row.updated_at) if row else None
+
+def get_continue_reading(db: Session, user_id: int, limit: int = 10) -> List[Tuple[models.Book, int, datetime]]:
+    """
+    Недавно открытые книги пользователя, самые свежие первыми
+
+    Выборка идет по индексу (user_id, updated_at DESC); значения из буфера
+    воркера подмешиваются поверх данных БД.
+    """
+    rows = db.query(models.Book, models.ReadingProgress.page, models.ReadingProgress.updated_at).join(
+        models.ReadingProgress,
+        models.ReadingProgress.book_id == models.Book.id
+    ).filter(
+        models.ReadingProgress.user_id == user_id
+    ).order_by(
+        models.ReadingProgress.updated_at.desc()
+    ).limit(limit).all()
+
+    entries = {book.id: (book, page, updated_at) for book, page, updated_at in rows}
+    pending = buffer.for_user(user_id)
+    missing = [book_id for book_id in pending if book_id not in entries]
+    books = {book.id: book for book in db.query(models.Book).filter(models.Book.id.in_(missing))} if missing else {}
+    for book_id, (page, updated_at) in pending.items():
+        book = entries[book_id][0] if book_id in entries else books.get(book_id)
+        if book is not None:
+            entries[book_id] = (book, page, updated_at)
+
+    return sorted(entries.values(), key=lambda entry: entry[2], reverse=True)[:limit]
@@ -0,0 +1,119 @@
+"""
+Отдача файлов книг с поддержкой HTTP Range
+
+FileResponse в Starlette 0.35 всегда отдает файл целиком. Просмотрщики
+PDF в браузерах запрашивают линеаризованные файлы частями: сначала
+начало файла с первой страницей, остальное — по мере листания. Поэтому
+файлы отдаются с Accept-Ranges, а на одиночный диапазон — 206 с нужным
+куском; несколько диапазонов сразу не поддерживаются (отдается весь файл).
+ranged_response не зависит от источника байт — им пользуется и
+S3-хранилище (см. storage.py).
+"""
+import os
+import re
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Одиночный диапазон из заголовка Range: (start, end) включительно
+
+    None — заголовок не разобран (отдать весь файл); ValueError —
+    диапазон за пределами файла (416).
+    """
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # bytes=-N — последние N байт
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or size == 0:
+        raise ValueError("Диапазон за пределами файла")
+    return start, end
+
+def content_disposition(filename: str) -> str:
+    """Content-Disposition для скачивания, как у FileResponse (с filename* для не-ASCII имен)"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+def ranged_response(
+    request: Request,
+    size: int,
+    media_type: str,
+    headers: Dict[str, str],
+    read: Callable[[int, int], Iterator[bytes]]
+) -> Response:
+    """
+    Содержимое целиком (200) или запрошенный диапазон (206/416)
+
+    read(start, end) отдает байты с start по end включительно; headers —
+    etag, last-modified и content-disposition источника.
+    """
+    headers = {**headers, "accept-ranges": "bytes"}
+    byte_range = None
+    header = request.headers.get("range")
+    # If-Range: диапазон действителен, только если содержимое не изменилось
+    if_range = request.headers.get("if-range")
+    if header and (not if_range or if_range in (headers.get("etag"), headers.get("last-modified"))):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            return Response(status_code=416, headers={"content-range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        status_code = 206
+        start, end = byte_range
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+    headers["content-length"] = str(end - start + 1)
+    body = read(start, end) if end >= start else iter(())
+    return StreamingResponse(body, status_code=status_code, media_type=media_type, headers=headers)
+
+def _read_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    etag: Optional[str] = None
+) -> Response:
+    """Локальный файл целиком (200) или запрошенный диапазон (206/416); etag — вместо вычисленного по файлу"""
+    stat = os.stat(path)
+    response = FileResponse(path, media_type=media_type, filename=filename, stat_result=stat)
+    if etag:
+        response.headers["etag"] = etag
+    if "range" not in request.headers:
+        response.headers["accept-ranges"] = "bytes"
+        return response
+    headers = {
+        name: value for name, value in response.headers.items()
+        if name in ("etag", "last-modified", "content-disposition")
+    }
+    return ranged_response(request, stat.st_size, media_type, headers, lambda start, end: _read_range(path, start, end))
@@ -0,0 +1,82 @@
+"""
+Рекомендации «читатели также выбирали»
+
+Списки похожих книг предрасчитываются офлайн (similarity.py) по матрице
+«пользователь × книга» из избранного и прочитанного и хранятся в
+book_similarities. Здесь только чтение этих списков. Изменения избранного и
+прочитанного в PostgreSQL триггерами отмечаются в similarity_dirty_books —
+по ним работает инкрементальное обновление.
+"""
+from typing import List
+
+from sqlalchemy import DDL, event, func, select, union
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Сколько книг пользователя учитывать при подборе (избранное и прочитанное)
+MAX_USER_SEED_BOOKS = 200
+
+# ============ ТРИГГЕРЫ ИЗМЕНЕНИЙ (PostgreSQL) ============
+
+_mark_dirty_function = DDL("""
+CREATE OR REPLACE FUNCTION similarity_mark_dirty()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO similarity_dirty_books (book_id)
+    VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.book_id ELSE NEW.book_id END)
+    ON CONFLICT (book_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+
+event.listen(
+    models.Base.metadata, "after_create",
+    _mark_dirty_function.execute_if(dialect="postgresql")
+)
+
+for _table in (models.favorites, models.read_books):
+    event.listen(models.Base.metadata, "after_create", DDL(f"""
+CREATE OR REPLACE TRIGGER similarity_dirty_{_table.name}
+    AFTER INSERT OR DELETE ON {_table.name}
+    FOR EACH ROW EXECUTE FUNCTION similarity_mark_dirty()
+""").execute_if(dialect="postgresql"))
+
+# ============ ЧТЕНИЕ ============
+
+def get_similar_books(db: Session, book_id: int, limit: int = 10) -> List[models.Book]:
+    """Похожие книги в порядке убывания сходства"""
+    return db.query(models.Book).join(
+        models.BookSimilarity, models.BookSimilarity.similar_book_id == models.Book.id
+    ).filter(
+        models.BookSimilarity.book_id == book_id
+    ).order_by(
+        models.BookSimilarity.score.desc(), models.Book.id
+    ).limit(limit).all()
+
+def get_user_recommendations(db: Session, user_id: int, limit: int = 20) -> List[models.Book]:
+    """
+    Рекомендации пользователю одним запросом
+
+    Сходства с книгами из избранного и прочитанного суммируются по кандидату;
+    уже отмеченные пользователем книги исключаются.
+    """
+    seen = union(
+        select(models.favorites.c.book_id).where(models.favorites.c.user_id == user_id),
+        select(models.read_books.c.book_id).where(models.read_books.c.user_id == user_id),
+    ).subquery()
+    seed = select(seen.c.book_id).limit(MAX_USER_SEED_BOOKS).scalar_subquery()
+    score = func.sum(models.BookSimilarity.score).label("score")
+    candidates = select(
+        models.BookSimilarity.similar_book_id.label("book_id"), score
+    ).where(
+        models.BookSimilarity.book_id.in_(seed),
+        models.BookSimilarity.similar_book_id.not_in(select(seen.c.book_id))
+    ).group_by(
+        models.BookSimilarity.similar_book_id
+    ).order_by(score.desc()).limit(limit).subquery()
+
+    return db.query(models.Book).join(
+        candidates, candidates.c.book_id == models.Book.id
+    ).order_by(candidates.c.score.desc(), models.Book.id).all()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, validator, Field
-from typing import Optional, List
-from datetime import datetime
+from typing import Any, Dict, Optional, List
+from datetime import date, datetime, timezone
 import re
 
 class UserBase(BaseModel):
@@ -88,6 +88,10 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: int
+
 class BookBase(BaseModel):
     title: str
     author: str
@@ -170,3 +174,195 @@ class ReviewReportResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class ModerationQueueItem(BaseModel):
+    review_id: int
+    pending_count: int
+    last_reported_at: Optional[datetime]
+    hidden: bool
+    reasons: Dict[str, int]
+    book_title: str
+    review: ReviewResponse
+
+class ResolveReportsRequest(BaseModel):
+    action: str = Field(..., pattern="^(dismiss|delete_review)$")
+    report_ids: List[int] = Field(default_factory=list, max_length=10000)
+    review_ids: List[int] = Field(default_factory=list, max_length=10000)
+
+    @validator('review_ids', always=True)
+    def validate_ids(cls, v, values):
+        if not v and not values.get('report_ids'):
+            raise ValueError('Не выбраны жалобы или отзывы')
+        return v
+
+class UserStatistics(BaseModel):
+    favorites_count: int
+    read_count: int
+    reviews_count: int
+    ratings_count: int
+
+class LibraryStatistics(BaseModel):
+    books_count: int
+    users_count: int
+    reviews_count: int
+    ratings_count: int
+
+class BookAnalytics(BaseModel):
+    book_id: int
+    title: str
+    author: str
+    views: int
+    downloads: int
+    pages: int
+
+class DailyAnalytics(BaseModel):
+    day: date
+    views: int
+    downloads: int
+    pages: int
+
+# ============ СИНХРОНИЗАЦИЯ ЗАКЛАДОК И ЗАМЕТОК ============
+
+ANNOTATION_SYNC_MAX_ITEMS = 1000
+
+def _to_naive_utc(v: datetime) -> datetime:
+    """Привести время клиента к наивному UTC, как хранится в БД"""
+    if v.tzinfo is not None:
+        v = v.astimezone(timezone.utc).replace(tzinfo=None)
+    return v
+
+class BookmarkSyncItem(BaseModel):
+    page: int = Field(..., ge=1)
+    deleted: bool = False
+    client_ts: datetime
+    
+    _normalize_ts = validator('client_ts', allow_reuse=True)(_to_naive_utc)
+
+class NoteSyncItem(BaseModel):
+    id: Optional[int] = None           # ID существующей заметки на сервере
+    client_id: Optional[str] = Field(None, max_length=64)  # для заметок, созданных офлайн
+    page: int = Field(..., ge=1)
+    deleted: bool = False
+    text: Optional[str] = None
+    client_ts: datetime
+    
+    _normalize_ts = validator('client_ts', allow_reuse=True)(_to_naive_utc)
+    
+    @validator('text', always=True)
+    def validate_text(cls, v, values):
+        if not values.get('deleted') and not (v and v.strip()):
+            raise ValueError('Текст заметки не может быть пустым')
+        return v
+
+class AnnotationSyncRequest(BaseModel):
+    bookmarks: List[BookmarkSyncItem] = Field(default_factory=list, max_length=ANNOTATION_SYNC_MAX_ITEMS)
+    notes: List[NoteSyncItem] = Field(default_factory=list, max_length=ANNOTATION_SYNC_MAX_ITEMS)
+
+class BookmarkState(BaseModel):
+    page: int
+    created_at: Optional[datetime]
+
+class NoteState(BaseModel):
+    id: int
+    client_id: Optional[str]
+    page: int
+    text: str
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+class AnnotationSyncResponse(BaseModel):
+    bookmarks: List[BookmarkState]
+    notes: List[NoteState]
+    version: str
+
+# ============ ПРОГРЕСС ЧТЕНИЯ ============
+
+class ReadingProgressUpdate(BaseModel):
+    page: int = Field(..., ge=1)
+
+class ReadingProgressResponse(BaseModel):
+    book_id: int
+    page: int
+    updated_at: datetime
+
+class ContinueReadingItem(BaseModel):
+    book: BookResponse
+    page: int
+    updated_at: datetime
+
+# ============ АРХИВЫ КНИГ ============
+
+class BundleRequest(BaseModel):
+    """Книги для архива: список id, избранное или фильтры каталога (можно сочетать)"""
+    book_ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000)
+    favorites: bool = False
+    tag: Optional[str] = None
+    genre: Optional[str] = None
+    author: Optional[str] = None
+    search: Optional[str] = None
+
+    @validator('search', always=True)
+    def source_required(cls, v, values):
+        if v or values.get('book_ids') or values.get('favorites') or any(
+            values.get(field) for field in ('tag', 'genre', 'author')
+        ):
+            return v
+        raise ValueError('Укажите книги, избранное или фильтр')
+
+# ============ ОПТИМИЗАЦИЯ PDF ============
+
+class OptimizeBooksRequest(BaseModel):
+    book_ids: Optional[List[int]] = Field(None, min_length=1, max_length=10000)
+    force: bool = False
+
+class OptimizedBookItem(BaseModel):
+    book_id: int
+    title: str
+    source_size: int
+    optimized_size: int
+    bytes_saved: int
+    first_page_bytes_before: int
+    first_page_bytes_after: int
+
+class OptimizationReport(BaseModel):
+    books_total: int
+    optimized: int
+    skipped: int
+    failed: int
+    pending: int
+    source_bytes: int
+    optimized_bytes: int
+    bytes_saved: int
+    reference_mbps: float
+    first_page_bytes_before: Optional[int]
+    first_page_bytes_after: Optional[int]
+    first_page_seconds_before: Optional[float]
+    first_page_seconds_after: Optional[float]
+    top_books: List[OptimizedBookItem]
+
+# ============ ФОНОВЫЕ ЗАДАЧИ ============
+
+class JobResponse(BaseModel):
+    id: int
+    type: str
+    status: str
+    payload: Dict[str, Any]
+    result: Optional[Dict[str, Any]]
+    error: Optional[str]
+    progress_current: int
+    progress_total: Optional[int]
+    attempts: int
+    max_attempts: int
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+class JobAccepted(BaseModel):
+    job_id: int
+    status: str
+
+class BulkDeleteBooksRequest(BaseModel):
+    book_ids: List[int] = Field(..., min_length=1, max_length=10000)
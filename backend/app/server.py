@@ -0,0 +1,58 @@
+"""
+Подбор числа воркеров и пула потоков для продакшен-сервера
+
+Используется из gunicorn.conf.py (число воркеров) и из lifespan приложения
+(размер пула потоков, в котором выполняются синхронные эндпоинты). Модуль
+не импортирует gunicorn, поэтому безопасен и при запуске через uvicorn.
+"""
+import os
+from typing import Optional
+
+from .config import settings
+
+
+def available_cpus() -> int:
+    """Число CPU с учетом affinity и квоты cgroup v2 (лимит --cpus в Docker)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # нет на macOS
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count(cpus: Optional[int] = None) -> int:
+    """
+    Число воркеров: WEB_CONCURRENCY или CPU * WORKERS_PER_CORE в пределах [1, MAX_WORKERS]
+
+    Каждый воркер держит до DB_POOL_SIZE + DB_MAX_OVERFLOW соединений с БД,
+    поэтому MAX_WORKERS ограничивает и их общее число.
+    """
+    if settings.WEB_CONCURRENCY:
+        return settings.WEB_CONCURRENCY
+    cpus = cpus or available_cpus()
+    return max(1, min(settings.MAX_WORKERS, round(cpus * settings.WORKERS_PER_CORE)))
+
+
+def threadpool_size() -> int:
+    """
+    Размер пула потоков для синхронных эндпоинтов
+
+    По умолчанию — пул соединений БД плюс запас на эндпоинты без БД: больше
+    потоков только ждали бы свободного соединения.
+    """
+    if settings.THREADPOOL_SIZE:
+        return settings.THREADPOOL_SIZE
+    return settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW + 5
+
+
+def configure_threadpool() -> None:
+    """Применить размер пула потоков anyio (вызывать внутри event loop)"""
+    from anyio.to_thread import current_default_thread_limiter
+    current_default_thread_limiter().total_tokens = threadpool_size()
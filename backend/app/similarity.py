@@ -0,0 +1,247 @@
+"""
+Офлайн-расчет похожих книг по избранному и прочитанному
+
+Из пар (пользователь, книга) строится разреженная бинарная матрица X
+«пользователь × книга», совместная встречаемость — X^T X. Для каждой книги
+берутся top-k соседей по косинусу или коэффициенту Жаккара и записываются
+в book_similarities.
+
+    python -m app.similarity                       # полная перестройка
+    python -m app.similarity --incremental         # только книги из similarity_dirty_books
+    python -m app.similarity --metric jaccard --top-k 30
+
+Инкрементальный режим пересчитывает списки только у измененных книг.
+Списки остальных книг, где эти книги встречаются соседями, остаются
+прежними до следующей полной перестройки.
+"""
+import argparse
+import io
+import json
+import logging
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, insert, select, union_all
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("cosine", "jaccard")
+
+# Книг в одном блоке X[:, block]^T X: ограничивает память под совместную встречаемость
+BLOCK_SIZE = 2048
+
+
+class InteractionMatrix(NamedTuple):
+    matrix: sparse.csr_matrix   # пользователи × книги, значения 1.0
+    book_ids: np.ndarray        # столбец -> books.id
+
+
+class Similarities(NamedTuple):
+    book_ids: np.ndarray
+    similar_book_ids: np.ndarray
+    scores: np.ndarray
+
+
+def build_interaction_matrix(
+    user_ids: np.ndarray,
+    book_ids: np.ndarray,
+    max_user_items: Optional[int] = None
+) -> InteractionMatrix:
+    """
+    Бинарная матрица взаимодействий
+
+    Избранное и прочитанное одной книги считаются одним взаимодействием.
+    Пользователи с числом книг больше max_user_items (тестовые и служебные
+    аккаунты) исключаются: каждый из них добавил бы n^2 пар.
+    """
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    books, book_index = np.unique(book_ids, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(user_index), dtype=np.float32), (user_index, book_index)),
+        shape=(len(users), len(books))
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = 1.0
+
+    max_user_items = max_user_items or settings.SIMILARITY_MAX_USER_ITEMS
+    user_items = np.diff(matrix.indptr)
+    if (user_items > max_user_items).any():
+        matrix = matrix[user_items <= max_user_items]
+    return InteractionMatrix(matrix, books)
+
+
+def compute_similarities(
+    interactions: InteractionMatrix,
+    top_k: int,
+    metric: str = "cosine",
+    min_support: int = 1,
+    target_book_ids: Optional[np.ndarray] = None
+) -> Similarities:
+    """
+    Top-k похожих книг для каждой книги (или только для target_book_ids)
+
+    min_support — минимальное число общих читателей, чтобы пара учитывалась.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Неизвестная метрика: {metric}")
+
+    matrix, books = interactions
+    by_book = matrix.T.tocsr()
+    book_counts = np.diff(by_book.indptr).astype(np.float32)
+
+    if target_book_ids is None:
+        targets = np.arange(len(books))
+    else:
+        targets = np.flatnonzero(np.isin(books, target_book_ids))
+
+    parts = []
+    for start in range(0, len(targets), BLOCK_SIZE):
+        block = targets[start:start + BLOCK_SIZE]
+        cooccurrence = (by_book[block] @ matrix).tocsr()
+        rows = np.repeat(np.arange(len(block)), np.diff(cooccurrence.indptr))
+        columns = cooccurrence.indices
+        counts = cooccurrence.data
+
+        keep = (columns != block[rows]) & (counts >= min_support)
+        rows, columns, counts = rows[keep], columns[keep], counts[keep]
+
+        own, other = book_counts[block[rows]], book_counts[columns]
+        if metric == "cosine":
+            scores = counts / np.sqrt(own * other)
+        else:
+            scores = counts / (own + other - counts)
+
+        # Сортировка по (строка, -score, столбец) и первые top_k в каждой строке
+        order = np.lexsort((columns, -scores, rows))
+        rows, columns, scores = rows[order], columns[order], scores[order]
+        row_starts = np.searchsorted(rows, rows, side="left")
+        keep = np.arange(len(rows)) - row_starts < top_k
+
+        parts.append(Similarities(
+            books[block[rows[keep]]], books[columns[keep]], scores[keep].astype(np.float32)
+        ))
+
+    if not parts:
+        empty = np.array([], dtype=np.int64)
+        return Similarities(empty, empty, np.array([], dtype=np.float32))
+    return Similarities(*(np.concatenate(column) for column in zip(*parts)))
+
+# ============ БД ============
+
+def load_interactions(db: Session) -> tuple:
+    """Пары (user_id, book_id) из избранного и прочитанного как массивы NumPy"""
+    rows = db.execute(union_all(
+        select(models.favorites.c.user_id, models.favorites.c.book_id),
+        select(models.read_books.c.user_id, models.read_books.c.book_id),
+    )).all()
+    pairs = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def write_similarities(db: Session, result: Similarities, replace_book_ids: Optional[np.ndarray] = None) -> int:
+    """
+    Заменить списки похожих в одной транзакции
+
+    replace_book_ids=None — заменить все. Читатели видят прежние списки до
+    коммита; TRUNCATE не используется, чтобы не блокировать чтение.
+    """
+    statement = delete(models.BookSimilarity)
+    if replace_book_ids is not None:
+        statement = statement.where(models.BookSimilarity.book_id.in_(replace_book_ids.tolist()))
+    db.execute(statement)
+
+    if len(result.book_ids):
+        if db.bind.dialect.name == "postgresql":
+            buffer = io.StringIO()
+            np.savetxt(buffer, np.column_stack(result), fmt=("%d", "%d", "%.6g"), delimiter=",")
+            buffer.seek(0)
+            cursor = db.connection().connection.cursor()
+            cursor.copy_expert(
+                "COPY book_similarities (book_id, similar_book_id, score) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        else:
+            db.execute(insert(models.BookSimilarity), [
+                {"book_id": int(book_id), "similar_book_id": int(similar_id), "score": float(score)}
+                for book_id, similar_id, score in zip(*result)
+            ])
+    db.commit()
+    return len(result.book_ids)
+
+
+def take_dirty_books(db: Session) -> np.ndarray:
+    """Забрать отмеченные триггерами книги (удаляются в текущей транзакции)"""
+    rows = db.execute(
+        delete(models.SimilarityDirtyBook).returning(models.SimilarityDirtyBook.book_id)
+    ).scalars().all()
+    return np.array(rows, dtype=np.int64)
+
+
+def rebuild(
+    db: Session,
+    incremental: bool = False,
+    top_k: Optional[int] = None,
+    metric: Optional[str] = None,
+    min_support: Optional[int] = None
+) -> dict:
+    """Перестроить book_similarities полностью или только для измененных книг"""
+    timings = {}
+    started = time.perf_counter()
+
+    dirty = take_dirty_books(db)
+    if incremental and not len(dirty):
+        db.commit()
+        return {"mode": "incremental", "books": 0, "rows": 0}
+
+    user_ids, book_ids = load_interactions(db)
+    timings["load_s"] = time.perf_counter() - started
+
+    step = time.perf_counter()
+    interactions = build_interaction_matrix(user_ids, book_ids)
+    result = compute_similarities(
+        interactions,
+        top_k=top_k or settings.SIMILARITY_TOP_K,
+        metric=metric or settings.SIMILARITY_METRIC,
+        min_support=min_support or settings.SIMILARITY_MIN_SUPPORT,
+        target_book_ids=dirty if incremental else None,
+    )
+    timings["compute_s"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    rows = write_similarities(db, result, replace_book_ids=dirty if incremental else None)
+    timings["write_s"] = time.perf_counter() - step
+
+    return {
+        "mode": "incremental" if incremental else "full",
+        "interactions": int(len(user_ids)),
+        "users": int(interactions.matrix.shape[0]),
+        "books": int(len(dirty)) if incremental else int(len(interactions.book_ids)),
+        "rows": rows,
+        **{key: round(value, 2) for key, value in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--metric", choices=METRICS)
+    parser.add_argument("--top-k", type=int)
+    parser.add_argument("--min-support", type=int)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        report = rebuild(db, args.incremental, args.top_k, args.metric, args.min_support)
+    finally:
+        db.close()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Статистика пользователей и библиотеки
+
+Счетчики пользователя считаются одним запросом со скалярными подзапросами,
+глобальные счетчики читаются из таблицы library_counters, которую в PostgreSQL
+поддерживают триггеры на books/users/reviews/ratings. Каждый счетчик разбит на
+COUNTER_SHARDS строк: триггер меняет случайную, поэтому параллельные записи
+не выстраиваются в очередь за блокировкой одной строки. Оба результата кэшируются
+в памяти воркера на STATS_CACHE_TTL секунд.
+"""
+from sqlalchemy import DDL, event, func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .cache import TTLCache
+from .config import settings
+
+COUNTER_SHARDS = 16
+
+# Таблица -> имя счетчика в library_counters
+GLOBAL_COUNTERS = {
+    "books": models.Book.__table__,
+    "users": models.User.__table__,
+    "reviews": models.Review.__table__,
+    "ratings": models.Rating.__table__,
+}
+
+user_stats_cache = TTLCache(ttl=settings.STATS_CACHE_TTL, maxsize=10000)
+global_stats_cache = TTLCache(ttl=settings.STATS_CACHE_TTL, maxsize=1)
+
+# ============ ТРИГГЕРЫ СЧЕТЧИКОВ (PostgreSQL) ============
+
+# Шард выбирается один раз: random() в WHERE вычислялся бы для каждой строки
+_counter_function = DDL(f"""
+CREATE OR REPLACE FUNCTION library_counters_bump()
+RETURNS TRIGGER AS $$
+DECLARE
+    target_shard integer := floor(random() * {COUNTER_SHARDS})::integer;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE library_counters SET value = value + 1 WHERE name = TG_ARGV[0] AND shard = target_shard;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE library_counters SET value = value - 1 WHERE name = TG_ARGV[0] AND shard = target_shard;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+
+event.listen(
+    models.Base.metadata, "after_create",
+    _counter_function.execute_if(dialect="postgresql")
+)
+
+for _name, _table in GLOBAL_COUNTERS.items():
+    event.listen(models.Base.metadata, "after_create", DDL(f"""
+CREATE OR REPLACE TRIGGER library_counters_{_name}
+    AFTER INSERT OR DELETE ON {_table.name}
+    FOR EACH ROW EXECUTE FUNCTION library_counters_bump('{_name}')
+""").execute_if(dialect="postgresql"))
+    # Начальное значение из таблицы — в шард 0, остальные с нуля; повторный запуск их не трогает
+    event.listen(models.Base.metadata, "after_create", DDL(f"""
+INSERT INTO library_counters (name, shard, value)
+SELECT '{_name}', shard, CASE WHEN shard = 0 THEN (SELECT COUNT(*) FROM {_table.name}) ELSE 0 END
+FROM generate_series(0, {COUNTER_SHARDS - 1}) AS shard
+ON CONFLICT (name, shard) DO NOTHING
+""").execute_if(dialect="postgresql"))
+
+def rebuild_global_counters(db: Session) -> None:
+    """
+    Пересчитать library_counters по исходным таблицам
+
+    Нужен после массовой загрузки с отключенными триггерами.
+    """
+    for name, table in GLOBAL_COUNTERS.items():
+        value = db.execute(select(func.count()).select_from(table)).scalar()
+        db.query(models.LibraryCounter).filter(models.LibraryCounter.name == name).delete()
+        db.add_all([
+            models.LibraryCounter(name=name, shard=shard, value=value if shard == 0 else 0)
+            for shard in range(COUNTER_SHARDS)
+        ])
+    db.commit()
+    global_stats_cache.clear()
+
+# ============ ПОЛЬЗОВАТЕЛЬ ============
+
+def compute_user_statistics(db: Session, user_id: int) -> dict:
+    """Посчитать счетчики пользователя одним запросом"""
+    def count_of(column, user_column):
+        return select(func.count(column)).where(user_column == user_id).scalar_subquery()
+
+    row = db.execute(select(
+        count_of(models.favorites.c.book_id, models.favorites.c.user_id).label("favorites_count"),
+        count_of(models.read_books.c.book_id, models.read_books.c.user_id).label("read_count"),
+        count_of(models.Review.id, models.Review.user_id).label("reviews_count"),
+        count_of(models.Rating.id, models.Rating.user_id).label("ratings_count"),
+    )).one()
+    return {key: value or 0 for key, value in row._mapping.items()}
+
+def get_user_statistics(db: Session, user_id: int) -> dict:
+    """Получить статистику пользователя (с кэшированием)"""
+    return user_stats_cache.get_or_set(user_id, lambda: compute_user_statistics(db, user_id))
+
+def invalidate_user_statistics(user_id: int) -> None:
+    """Сбросить кэш статистики пользователя после изменения его полок, отзывов или оценок"""
+    user_stats_cache.invalidate(user_id)
+
+# ============ БИБЛИОТЕКА ============
+
+def compute_global_statistics(db: Session) -> dict:
+    """
+    Прочитать глобальные счетчики из library_counters (сумма шардов)
+
+    Если таблица не заполнена (например, не PostgreSQL и триггеров нет),
+    счетчики считаются одним запросом по исходным таблицам.
+    """
+    counters = dict(db.query(
+        models.LibraryCounter.name, func.sum(models.LibraryCounter.value)
+    ).group_by(models.LibraryCounter.name).all())
+    if not all(name in counters for name in GLOBAL_COUNTERS):
+        row = db.execute(select(*[
+            select(func.count()).select_from(table).scalar_subquery().label(name)
+            for name, table in GLOBAL_COUNTERS.items()
+        ])).one()
+        counters = dict(row._mapping)
+    return {f"{name}_count": int(counters[name] or 0) for name in GLOBAL_COUNTERS}
+
+def get_global_statistics(db: Session) -> dict:
+    """Получить статистику библиотеки (с кэшированием)"""
+    return global_stats_cache.get_or_set("global", lambda: compute_global_statistics(db))
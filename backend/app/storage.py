@@ -0,0 +1,492 @@
+"""
+Хранилище файлов книг и их оптимизированных копий
+
+STORAGE_BACKEND выбирает реализацию:
+
+- local — директории BOOKS_DIRECTORY и OPTIMIZED_DIRECTORY (общий том
+  для всех узлов);
+- s3 — бакет S3-совместимого хранилища (MinIO, Ceph, AWS) с префиксами
+  books/ и optimized/; ключ объекта — имя файла книги.
+
+Обе реализации отдают файлы с поддержкой Range (см. ranges.py). S3 при
+S3_PRESIGNED_REDIRECTS перенаправляет клиента на подписанную ссылку —
+байты идут из хранилища мимо бэкенда. Иначе каждый узел держит горячие
+объекты в ограниченном кэше на локальном диске (LRU по времени
+обращения). Промах кэша отдается из S3 потоком с поддержкой Range, а
+объект загружается в кэш в фоне; объекты крупнее четверти кэша не
+кэшируются.
+"""
+import errno
+import hashlib
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import formatdate
+from functools import lru_cache
+from typing import BinaryIO, Callable, Iterator, List, Optional, Union
+
+from fastapi import Request
+from fastapi.responses import RedirectResponse, Response
+
+from . import ranges
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Пул соединений клиента S3: запросы идут из потоков пула FastAPI
+S3_MAX_CONNECTIONS = 64
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    key: str
+    size: int
+    etag: str
+    modified: float
+
+
+def _media_type(key: str) -> str:
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+class LocalStorage:
+    """Файлы в директории; путь берется из настроек при каждом обращении"""
+
+    def __init__(self, setting: str):
+        self.setting = setting
+
+    @property
+    def root(self) -> str:
+        return getattr(settings, self.setting)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def prepare(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        """Метаданные файла; None — файла нет"""
+        try:
+            stat = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(key, stat.st_size, f"{stat.st_mtime_ns:x}-{stat.st_size:x}", stat.st_mtime)
+
+    def list_keys(self, suffix: str = ".pdf") -> List[str]:
+        root = self.root
+        if not os.path.exists(root):
+            os.makedirs(root)
+            return []
+        # os.listdir дешевле os.scandir, когда нужны только имена
+        return [name for name in os.listdir(root) if name.endswith(suffix)]
+
+    def read(self, info: ObjectInfo, chunk_size: int) -> Iterator[bytes]:
+        """Содержимое порциями; FileNotFoundError — файл удален"""
+        with open(self.path(info.key), "rb") as file:
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def response(self, request: Request, info: ObjectInfo, media_type: str, filename: Optional[str] = None) -> Response:
+        return ranges.file_response(request, self.path(info.key), media_type, filename=filename)
+
+    @contextmanager
+    def local_file(self, info: ObjectInfo) -> Iterator[str]:
+        """Путь к содержимому на локальном диске (для внешних программ)"""
+        yield self.path(info.key)
+
+    def put_file(self, key: str, source: str, move: bool = False, overwrite: bool = False) -> None:
+        """Скопировать или переместить файл; частично записанный файл не остается"""
+        target = self.path(key)
+        if not overwrite and os.path.exists(target):
+            raise FileExistsError("Файл с таким именем уже есть в каталоге")
+        if move:
+            try:
+                os.replace(source, target)
+                return
+            except OSError as exc:
+                if exc.errno != errno.EXDEV:
+                    raise
+        partial = f"{target}.{uuid.uuid4().hex}.part"
+        try:
+            shutil.copyfile(source, partial)
+            os.replace(partial, target)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        if move:
+            os.remove(source)
+
+    def put_stream(self, key: str, fileobj: BinaryIO) -> None:
+        """Записать содержимое потока (загрузка книги)"""
+        target = self.path(key)
+        partial = f"{target}.{uuid.uuid4().hex}.part"
+        try:
+            with open(partial, "wb") as file:
+                shutil.copyfileobj(fileobj, file)
+            os.replace(partial, target)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+# ============ КЭШ НА ДИСКЕ УЗЛА ============
+
+class DiskCache:
+    """
+    Горячие объекты S3 на локальном диске, всего не больше max_bytes
+
+    Файл версии объекта — <sha1 ключа>-<etag>, поэтому замененный объект не
+    отдается из кэша. mtime файла — время изменения объекта (одинаковые
+    Last-Modified и ETag на всех узлах), atime — последнее обращение: при
+    переполнении удаляются давно не читанные файлы до 90% лимита.
+    """
+
+    # Потоков фоновой загрузки в кэш на процесс
+    FILL_WORKERS = 2
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_bytes // 4
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+        self._pending: set = set()
+        self._executor = ThreadPoolExecutor(max_workers=self.FILL_WORKERS, thread_name_prefix="storage-cache")
+
+    @staticmethod
+    def _prefix(key: str) -> str:
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def path(self, info: ObjectInfo) -> str:
+        etag = "".join(char for char in info.etag if char.isalnum())
+        return os.path.join(self.directory, f"{self._prefix(info.key)}-{etag}")
+
+    def get(self, info: ObjectInfo) -> Optional[str]:
+        """Путь к закэшированной версии объекта; None — ее нет"""
+        path = self.path(info)
+        try:
+            os.utime(path, (time.time(), info.modified))
+        except FileNotFoundError:
+            return None
+        return path
+
+    def fetch(self, info: ObjectInfo, download: Callable[[str], None]) -> Optional[str]:
+        """Версия объекта в кэше, при необходимости загруженная; None — объект слишком велик"""
+        if info.size > self.max_object_bytes:
+            return None
+        path = self.get(info)
+        if path:
+            return path
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(info)
+        # Уникальное имя: параллельные запросы одного объекта не мешают друг другу
+        partial = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            download(partial)
+            os.utime(partial, (time.time(), info.modified))
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        self.discard(info.key, keep=path)
+        self._added(info.size)
+        return path
+
+    def fetch_async(self, info: ObjectInfo, download: Callable[[str], None]) -> None:
+        """Загрузить версию объекта в кэш в фоне; пока загрузка идет, повторные вызовы ничего не делают"""
+        if info.size > self.max_object_bytes:
+            return
+        path = self.path(info)
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+        self._executor.submit(self._fetch_pending, info, download, path)
+
+    def _fetch_pending(self, info: ObjectInfo, download: Callable[[str], None], path: str) -> None:
+        try:
+            self.fetch(info, download)
+        except Exception:
+            logger.warning("Не удалось загрузить %s в кэш хранилища", info.key, exc_info=True)
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+    def discard(self, key: str, keep: Optional[str] = None) -> None:
+        """Удалить закэшированные версии объекта (кроме keep)"""
+        prefix = self._prefix(key) + "-"
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name.startswith(prefix) and not entry.name.endswith(".part") and entry.path != keep:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def _added(self, size: int) -> None:
+        with self._lock:
+            self._size = self._evict() if self._size is None else self._size + size
+            if self._size > self.max_bytes:
+                self._size = self._evict()
+
+    def _evict(self) -> int:
+        """Удалить давно не читанные файлы до 90% лимита. Возвращает занятый объем"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".part"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_atime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return total
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        logger.info("Кэш хранилища: вытеснено файлов %d, занято %d байт", removed, total)
+        return total
+
+# ============ S3 ============
+
+@lru_cache(maxsize=None)
+def _s3_clients():
+    """Клиент для запросов бэкенда и клиент для подписи ссылок (адрес, видимый браузеру)"""
+    import boto3
+    from botocore.config import Config
+
+    config = Config(
+        signature_version="s3v4",
+        max_pool_connections=S3_MAX_CONNECTIONS,
+        # MinIO и другие совместимые хранилища адресуют бакет в пути
+        s3={"addressing_style": "path" if settings.S3_ENDPOINT_URL else "auto"},
+    )
+    options = dict(
+        region_name=settings.S3_REGION,
+        aws_access_key_id=settings.S3_ACCESS_KEY,
+        aws_secret_access_key=settings.S3_SECRET_KEY,
+        config=config,
+    )
+    client = boto3.client("s3", endpoint_url=settings.S3_ENDPOINT_URL, **options)
+    public_endpoint = settings.S3_PUBLIC_ENDPOINT_URL or settings.S3_ENDPOINT_URL
+    presign_client = boto3.client("s3", endpoint_url=public_endpoint, **options)
+    return client, presign_client
+
+@lru_cache(maxsize=None)
+def _cache() -> DiskCache:
+    return DiskCache(settings.STORAGE_CACHE_DIRECTORY, settings.STORAGE_CACHE_MAX_BYTES)
+
+def _not_found(exc: Exception) -> bool:
+    code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class S3Storage:
+    """Объекты бакета S3_BUCKET с префиксом"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.bucket = settings.S3_BUCKET
+
+    @property
+    def client(self):
+        return _s3_clients()[0]
+
+    @property
+    def cache(self) -> DiskCache:
+        return _cache()
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def prepare(self) -> None:
+        """Создать бакет, если его нет (для локального MinIO)"""
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+        except ClientError as exc:
+            if not _not_found(exc):
+                raise
+            options = {}
+            if settings.S3_REGION != "us-east-1":
+                options["CreateBucketConfiguration"] = {"LocationConstraint": settings.S3_REGION}
+            try:
+                self.client.create_bucket(Bucket=self.bucket, **options)
+            except self.client.exceptions.BucketAlreadyOwnedByYou:
+                pass  # создал другой воркер
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as exc:
+            if _not_found(exc):
+                return None
+            raise
+        return ObjectInfo(key, head["ContentLength"], head["ETag"].strip('"'), head["LastModified"].timestamp())
+
+    def list_keys(self, suffix: str = ".pdf") -> List[str]:
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                key = item["Key"][len(self.prefix):]
+                if key.endswith(suffix) and "/" not in key:
+                    keys.append(key)
+        return keys
+
+    def _read_range(self, key: str, start: int, end: int, size: int, chunk_size: int = ranges.CHUNK_SIZE) -> Iterator[bytes]:
+        from botocore.exceptions import ClientError
+
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if start or end < size - 1:
+            params["Range"] = f"bytes={start}-{end}"
+        try:
+            body = self.client.get_object(**params)["Body"]
+        except ClientError as exc:
+            if _not_found(exc):
+                raise FileNotFoundError(errno.ENOENT, "Объект удален", key) from exc
+            raise
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def read(self, info: ObjectInfo, chunk_size: int) -> Iterator[bytes]:
+        """Содержимое порциями (из кэша, если объект там); FileNotFoundError — объект удален"""
+        path = self.cache.get(info)
+        if path:
+            try:
+                file = open(path, "rb")
+            except FileNotFoundError:
+                pass  # вытеснен из кэша
+            else:
+                with file:
+                    while True:
+                        chunk = file.read(chunk_size)
+                        if not chunk:
+                            return
+                        yield chunk
+        yield from self._read_range(info.key, 0, info.size - 1, info.size, chunk_size)
+
+    def _download(self, key: str, path: str) -> None:
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            self.client.download_file(self.bucket, self._key(key), path)
+        except (BotoCoreError, ClientError) as exc:
+            if _not_found(exc):
+                raise FileNotFoundError(errno.ENOENT, "Объект удален", key) from exc
+            raise OSError(errno.EIO, f"Не удалось загрузить из хранилища: {exc}") from exc
+
+    def presigned_url(self, info: ObjectInfo, media_type: str, filename: Optional[str] = None) -> str:
+        params = {"Bucket": self.bucket, "Key": self._key(info.key), "ResponseContentType": media_type}
+        if filename:
+            params["ResponseContentDisposition"] = ranges.content_disposition(filename)
+        return _s3_clients()[1].generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=settings.S3_PRESIGNED_EXPIRES
+        )
+
+    def response(self, request: Request, info: ObjectInfo, media_type: str, filename: Optional[str] = None) -> Response:
+        """
+        Ссылка на хранилище, файл из кэша узла или поток из S3
+
+        При промахе кэша клиент не ждет загрузки объекта целиком: запрошенный
+        диапазон идет из S3 потоком, а объект загружается в кэш в фоне.
+        """
+        if settings.S3_PRESIGNED_REDIRECTS:
+            return RedirectResponse(self.presigned_url(info, media_type, filename), status_code=307)
+        # ETag объекта S3 и для файла из кэша: If-Range с ответа, отданного потоком, должен совпасть
+        etag = f'"{info.etag}"'
+        path = self.cache.get(info)
+        if path:
+            try:
+                return ranges.file_response(request, path, media_type, filename=filename, etag=etag)
+            except FileNotFoundError:
+                pass  # вытеснен между проверкой и ответом
+        self.cache.fetch_async(info, lambda target: self._download(info.key, target))
+        headers = {"etag": etag, "last-modified": formatdate(info.modified, usegmt=True)}
+        if filename:
+            headers["content-disposition"] = ranges.content_disposition(filename)
+        return ranges.ranged_response(
+            request, info.size, media_type, headers,
+            lambda start, end: self._read_range(info.key, start, end, info.size)
+        )
+
+    @contextmanager
+    def local_file(self, info: ObjectInfo) -> Iterator[str]:
+        """Временная локальная копия объекта (для внешних программ), мимо кэша"""
+        os.makedirs(settings.STORAGE_CACHE_DIRECTORY, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=".part", dir=settings.STORAGE_CACHE_DIRECTORY)
+        os.close(fd)
+        try:
+            self._download(info.key, path)
+            yield path
+        finally:
+            os.remove(path)
+
+    def _upload(self, upload: Callable, source: Union[str, BinaryIO], key: str) -> None:
+        from boto3.exceptions import S3UploadFailedError
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            upload(source, self.bucket, self._key(key), ExtraArgs={"ContentType": _media_type(key)})
+        except (S3UploadFailedError, BotoCoreError, ClientError) as exc:
+            raise OSError(errno.EIO, f"Не удалось загрузить в хранилище: {exc}") from exc
+
+    def put_file(self, key: str, source: str, move: bool = False, overwrite: bool = False) -> None:
+        if not overwrite and self.stat(key) is not None:
+            raise FileExistsError("Файл с таким именем уже есть в каталоге")
+        self._upload(self.client.upload_file, source, key)
+        if move:
+            os.remove(source)
+
+    def put_stream(self, key: str, fileobj: BinaryIO) -> None:
+        self._upload(self.client.upload_fileobj, fileobj, key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        self.cache.discard(key)
+
+
+Storage = Union[LocalStorage, S3Storage]
+
+def _create(setting: str, prefix: str) -> Storage:
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(prefix)
+    return LocalStorage(setting)
+
+books = _create("BOOKS_DIRECTORY", "books/")
+optimized = _create("OPTIMIZED_DIRECTORY", "optimized/")
@@ -0,0 +1,266 @@
+"""
+Подсказки для строки поиска (названия, авторы, жанры)
+
+Индекс хранится в памяти воркера: отсортированный список ключей —
+нормализованная строка целиком и каждый ее суффикс с начала слова
+(«лев толстой», «толстой»), — по которому префикс ищется бинарным поиском.
+Нормализация: casefold, ё -> е, схлопывание пробелов.
+
+Индекс строится из таблицы books при старте воркера, обновляется на месте
+при записи книг в этом воркере и полностью перестраивается раз в
+SUGGEST_REBUILD_INTERVAL секунд — это верхняя граница отставания остальных
+воркеров. Массовые изменения в фоновых задачах (синхронизация, импорт,
+удаление) рассылают через NOTIFY просьбу перестроить индекс сразу.
+"""
+import heapq
+import logging
+import re
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import events, models
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+SUGGEST_FIELDS = ("title", "author", "genre")
+
+# Тип уведомления events.notify: перестроить индекс во всех воркерах API
+REBUILD_NOTIFY = "suggest"
+
+# Префиксы, под которые попадает больше ключей (обычно 1–2 буквы), ранжируются
+# целиком один раз, а результат кэшируется до следующего изменения индекса
+SCAN_LIMIT = 500
+WIDE_CACHE_SIZE = 10000
+
+# Больше любого символа: prefix + _MAX_CHAR ограничивает диапазон ключей с префиксом
+_MAX_CHAR = "\U0010ffff"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize(value: str) -> str:
+    """Привести строку к виду для сравнения: регистр, ё/е, пробелы и подчеркивания"""
+    value = value.casefold().replace("ё", "е").replace("_", " ")
+    return _WHITESPACE_RE.sub(" ", value).strip()
+
+
+def _word_keys(normalized: str) -> List[str]:
+    """Строка целиком и ее окончания, начинающиеся с каждого следующего слова"""
+    keys = [normalized]
+    for position, char in enumerate(normalized):
+        if char == " ":
+            keys.append(normalized[position + 1:])
+    return keys
+
+
+class SuggestIndex:
+    """Префиксный индекс значений полей книг с числом книг на значение"""
+
+    def __init__(self):
+        # (поле, нормализованное значение) -> [отображаемое значение, число книг]
+        self._entries: Dict[Tuple[str, str], list] = {}
+        # Параллельные отсортированные списки: ключ и запись, к которой он ведет
+        self._keys: List[str] = []
+        self._refs: List[Tuple[str, str]] = []
+        self._wide_cache: Dict[tuple, List[dict]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_books(cls, rows: Iterable[tuple]) -> "SuggestIndex":
+        """Построить индекс по строкам (title, author, genre) сразу, без вставок по одной"""
+        index = cls()
+        for row in rows:
+            for field, value in zip(SUGGEST_FIELDS, row):
+                if not value:
+                    continue
+                ref = (field, normalize(value))
+                if not ref[1]:
+                    continue
+                entry = index._entries.get(ref)
+                if entry is None:
+                    index._entries[ref] = [value, 1]
+                else:
+                    entry[1] += 1
+        pairs = sorted(
+            (key, ref) for ref in index._entries for key in _word_keys(ref[1])
+        )
+        index._keys = [key for key, _ in pairs]
+        index._refs = [ref for _, ref in pairs]
+        # Самые широкие диапазоны — однобуквенные: ранжируем заранее, а не на первом нажатии
+        for first_char in sorted({key[0] for key in index._keys}):
+            index.suggest(first_char)
+        return index
+
+    def _invalidate_wide(self, normalized: str) -> None:
+        """Сбросить кэш широких префиксов, под которые попадают ключи значения"""
+        keys = _word_keys(normalized)
+        for cache_key in [k for k in self._wide_cache if any(key.startswith(k[0]) for key in keys)]:
+            del self._wide_cache[cache_key]
+
+    def add_book(self, title: Optional[str], author: Optional[str], genre: Optional[str]) -> None:
+        """Учесть новую книгу"""
+        with self._lock:
+            for field, value in zip(SUGGEST_FIELDS, (title, author, genre)):
+                if not value or not normalize(value):
+                    continue
+                ref = (field, normalize(value))
+                self._invalidate_wide(ref[1])
+                entry = self._entries.get(ref)
+                if entry is not None:
+                    entry[1] += 1
+                    continue
+                self._entries[ref] = [value, 1]
+                for key in _word_keys(ref[1]):
+                    position = bisect_left(self._keys, key)
+                    self._keys.insert(position, key)
+                    self._refs.insert(position, ref)
+
+    def remove_book(self, title: Optional[str], author: Optional[str], genre: Optional[str]) -> None:
+        """Убрать удаленную книгу (или старые значения измененной)"""
+        with self._lock:
+            for field, value in zip(SUGGEST_FIELDS, (title, author, genre)):
+                if not value:
+                    continue
+                ref = (field, normalize(value))
+                self._invalidate_wide(ref[1])
+                entry = self._entries.get(ref)
+                if entry is None:
+                    continue
+                entry[1] -= 1
+                if entry[1] > 0:
+                    continue
+                del self._entries[ref]
+                for key in _word_keys(ref[1]):
+                    position = bisect_left(self._keys, key)
+                    while position < len(self._keys) and self._keys[position] == key:
+                        if self._refs[position] == ref:
+                            del self._keys[position]
+                            del self._refs[position]
+                            break
+                        position += 1
+
+    def suggest(self, query: str, limit: int = 10, field: Optional[str] = None) -> List[dict]:
+        """
+        Подсказки по префиксу
+
+        Сначала значения, которые начинаются с запроса (а не одно из слов
+        внутри), затем по числу книг и длине.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            start = bisect_left(self._keys, prefix)
+            end = bisect_left(self._keys, prefix + _MAX_CHAR, start)
+            wide = end - start > SCAN_LIMIT
+            if wide:
+                cached = self._wide_cache.get((prefix, field, limit))
+                if cached is not None:
+                    return cached
+
+            refs = set(self._refs[start:end])
+            if field is not None:
+                refs = {ref for ref in refs if ref[0] == field}
+            entries = self._entries
+            ranked = heapq.nsmallest(
+                limit, refs,
+                key=lambda ref: (not ref[1].startswith(prefix), -entries[ref][1], len(ref[1]), ref)
+            )
+            result = [
+                {"type": ref[0], "value": entries[ref][0], "count": entries[ref][1]}
+                for ref in ranked
+            ]
+            if wide:
+                if len(self._wide_cache) >= WIDE_CACHE_SIZE:
+                    self._wide_cache.clear()
+                self._wide_cache[(prefix, field, limit)] = result
+            return result
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+index = SuggestIndex()
+
+# ============ ПОСТРОЕНИЕ И ОБНОВЛЕНИЕ ============
+
+def load_index(db: Session) -> SuggestIndex:
+    """Построить индекс по таблице books"""
+    rows = db.query(models.Book.title, models.Book.author, models.Book.genre).yield_per(10000)
+    return SuggestIndex.from_books(rows)
+
+def rebuild_now() -> None:
+    """Перестроить индекс в отдельной сессии и атомарно подменить"""
+    global index
+    db = SessionLocal()
+    try:
+        index = load_index(db)
+    finally:
+        db.close()
+
+def book_added(book: models.Book) -> None:
+    index.add_book(book.title, book.author, book.genre)
+
+def book_removed(title: Optional[str], author: Optional[str], genre: Optional[str]) -> None:
+    index.remove_book(title, author, genre)
+
+def suggest(query: str, limit: int = 10, field: Optional[str] = None) -> List[dict]:
+    return index.suggest(query, limit=limit, field=field)
+
+def request_rebuild() -> None:
+    """Попросить все воркеры API перестроить индекс (после массовых изменений книг)"""
+    try:
+        events.notify(REBUILD_NOTIFY)
+    except Exception:
+        # Книги уже записаны; воркеры догонят по SUGGEST_REBUILD_INTERVAL
+        logger.warning("Не удалось разослать перестройку индекса подсказок", exc_info=True)
+
+_stop_event = threading.Event()
+_rebuild_requested = threading.Event()
+_rebuilder: Optional[threading.Thread] = None
+
+@events.notify_handler(REBUILD_NOTIFY)
+def _on_notify(message: dict) -> None:
+    # Будим поток перестройки, чтобы не задерживать слушателя уведомлений
+    if _rebuilder is not None and _rebuilder.is_alive():
+        _rebuild_requested.set()
+    else:
+        rebuild_now()
+
+def _rebuild_loop(interval: float) -> None:
+    while True:
+        _rebuild_requested.wait(interval)
+        if _stop_event.is_set():
+            return
+        _rebuild_requested.clear()
+        try:
+            rebuild_now()
+        except Exception:
+            logger.exception("Не удалось перестроить индекс подсказок")
+
+def start_rebuilder(interval: Optional[float] = None) -> None:
+    """Запустить периодическую перестройку (0 в настройке — выключено)"""
+    global _rebuilder
+    interval = interval or settings.SUGGEST_REBUILD_INTERVAL
+    if interval <= 0 or (_rebuilder is not None and _rebuilder.is_alive()):
+        return
+    _stop_event.clear()
+    _rebuild_requested.clear()
+    _rebuilder = threading.Thread(
+        target=_rebuild_loop, args=(interval,), name="suggest-rebuilder", daemon=True
+    )
+    _rebuilder.start()
+
+def stop_rebuilder() -> None:
+    """Остановить периодическую перестройку"""
+    global _rebuilder
+    _stop_event.set()
+    _rebuild_requested.set()
+    if _rebuilder is not None:
+        _rebuilder.join(timeout=10)
+        _rebuilder = None
@@ -1,7 +1,7 @@
 import os
 import re
-from typing import Tuple, List
-from .config import settings
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+from . import storage
 
 def parse_book_filename(filename: str) -> Tuple[str, str, str, str]:
     """
@@ -44,26 +44,94 @@ def parse_book_filename(filename: str) -> Tuple[str, str, str, str]:
     return (tag, genre, title, author)
 
 
-def get_books_from_directory() -> List[dict]:
+def _parse_book_filename_fast(filename: str) -> Tuple[str, str, str, str]:
     """
-    Сканирует директорию books и возвращает список книг с их метаданными
+    То же, что parse_book_filename, но на partition вместо полного split/join
+
+    Результат совпадает с parse_book_filename символ в символ
+    (проверяется в benchmarks.parser).
     """
-    books = []
-    books_dir = settings.BOOKS_DIRECTORY
+    name = filename.rsplit('.', 1)[0]
+    
+    # Все, что после третьего #, эталонный разбор игнорирует
+    parts = name.split('#', 3)
+    if len(parts) < 3:
+        return ("Unknown", "Unknown", filename, "Unknown")
+    
+    tag = parts[1].rstrip('_').strip()
+    remaining = parts[2]
     
-    if not os.path.exists(books_dir):
-        os.makedirs(books_dir)
-        return books
+    before_comma, comma, after_comma = remaining.partition(',')
+    if comma:
+        genre, underscore, title = before_comma.partition('_')
+        return (
+            tag,
+            genre.strip(),
+            title.replace('_', ' ').strip() if underscore else "Unknown",
+            after_comma.lstrip('_').replace('_', ' ').strip()
+        )
     
-    for filename in os.listdir(books_dir):
-        if filename.endswith('.pdf'):
-            tag, genre, title, author = parse_book_filename(filename)
-            books.append({
-                'filename': filename,
-                'tag': tag,
-                'genre': genre,
-                'title': title,
-                'author': author
-            })
+    # Старый формат без запятой
+    genre, underscore, rest = remaining.partition('_')
+    if not underscore:
+        return (tag, genre.strip(), "Unknown", "Unknown")
+    title, underscore, author = rest.rpartition('_')
+    if not underscore:
+        return (tag, genre.strip(), "Unknown", rest.strip())
+    return (tag, genre.strip(), title.replace('_', ' ').strip(), author.strip())
+
+
+def build_book_filename(tag: str, genre: str, title: str, author: str) -> str:
+    """Имя файла книги по метаданным (как при загрузке через админку)"""
+    return f"#{tag}_#{genre}_{title.replace(' ', '_')}_{author.replace(' ', '_')}.pdf"
+
+
+class ParsedBookColumns(NamedTuple):
+    """Результат пакетного разбора: по списку на каждое поле, в порядке входных имен"""
+    filenames: List[str]
+    tags: List[str]
+    genres: List[str]
+    titles: List[str]
+    authors: List[str]
+
+
+def parse_book_filenames(filenames: Iterable[str]) -> ParsedBookColumns:
+    """Разобрать набор имен файлов и вернуть значения по колонкам"""
+    filenames = list(filenames)
+    if not filenames:
+        return ParsedBookColumns([], [], [], [], [])
+    
+    tags, genres, titles, authors = zip(*map(_parse_book_filename_fast, filenames))
+    return ParsedBookColumns(filenames, list(tags), list(genres), list(titles), list(authors))
+
+
+def scan_book_files(books_dir: str) -> Iterator[str]:
+    """
+    Потоково перечислить имена PDF-файлов директории через os.scandir
+    
+    Не держит весь список имен в памяти — для обработки больших архивов порциями.
+    """
+    with os.scandir(books_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith('.pdf'):
+                yield entry.name
+
+
+def get_books_from_directory() -> List[dict]:
+    """
+    Сканирует хранилище книг и возвращает список книг с их метаданными
+    """
+    # Список все равно собирается целиком (для локального хранилища —
+    # os.listdir); scan_book_files — для потоковой обработки директории
+    books = []
+    for filename in storage.books.list_keys():
+        tag, genre, title, author = _parse_book_filename_fast(filename)
+        books.append({
+            'filename': filename,
+            'tag': tag,
+            'genre': genre,
+            'title': title,
+            'author': author
+        })
     
     return books
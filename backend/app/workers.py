@@ -0,0 +1,18 @@
+"""
+Воркер gunicorn на базе uvicorn с настраиваемыми event loop и HTTP-парсером
+
+UVICORN_LOOP: auto | uvloop | asyncio; UVICORN_HTTP: auto | httptools | h11.
+В режиме auto uvicorn берет uvloop и httptools, если они установлены.
+"""
+from uvicorn.workers import UvicornWorker as BaseUvicornWorker
+
+from .config import settings
+
+
+class UvicornWorker(BaseUvicornWorker):
+    CONFIG_KWARGS = {
+        "loop": settings.UVICORN_LOOP,
+        "http": settings.UVICORN_HTTP,
+        # Успеть дождаться lifespan shutdown (сброс буфера прогресса) до SIGKILL от gunicorn
+        "timeout_graceful_shutdown": max(1, settings.GRACEFUL_TIMEOUT - 5),
+    }
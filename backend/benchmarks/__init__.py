@@ -0,0 +1,6 @@
+"""
+Нагрузочные тесты и бенчмарки API
+
+    python -m benchmarks.seed --reset           # наполнить локальную БД
+    python -m benchmarks.loadtest --base-url http://localhost:8000
+"""
@@ -0,0 +1,70 @@
+"""
+Массовый импорт по манифесту: время загрузки, слияния и переноса файлов
+
+Создает во временной директории N небольших PDF и CSV-манифест к ним и
+импортирует их в БД из DATABASE_URL (книги добавляются в каталог —
+запускать против тестовой базы). Цель — 100k книг за минуты.
+
+    python -m benchmarks.bulk_import --books 100000 --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+import tempfile
+import time
+
+from app import importer, models
+from app.config import settings
+from app.database import SessionLocal, engine
+
+
+def write_fixture(directory: str, books: int, prefix: str) -> str:
+    source_dir = os.path.join(directory, "source")
+    os.makedirs(source_dir)
+    manifest_path = os.path.join(directory, "manifest.csv")
+    with open(manifest_path, "w", newline="", encoding="utf-8") as manifest:
+        writer = csv.writer(manifest)
+        writer.writerow(["file", "title", "author", "tag", "genre", "description"])
+        for i in range(books):
+            name = f"{i:07d}.pdf"
+            with open(os.path.join(source_dir, name), "wb") as pdf:
+                pdf.write(b"%PDF-1.4\n%%EOF\n")
+            writer.writerow([name, f"{prefix} книга {i}", f"Автор {i % 5000}", "импорт", f"жанр {i % 40}", "описание"])
+    return manifest_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=settings.IMPORT_FILE_WORKERS)
+    parser.add_argument("--move", action="store_true")
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    os.makedirs(settings.BOOKS_DIRECTORY, exist_ok=True)
+    with tempfile.TemporaryDirectory() as directory:
+        manifest_path = write_fixture(directory, args.books, f"bench-{int(time.time())}")
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            report = importer.import_manifest(
+                db, manifest_path, os.path.join(directory, "source"), move=args.move, workers=args.workers
+            )
+            total_s = time.perf_counter() - started
+        finally:
+            db.close()
+
+    print(json.dumps({
+        "books": args.books,
+        "imported": report["imported"],
+        "errors_total": report["errors_total"],
+        "conflicts_total": report["conflicts_total"],
+        "timings": report["timings"],
+        "total_s": round(total_s, 2),
+        "books_per_s": round(args.books / total_s),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
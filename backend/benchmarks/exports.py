@@ -0,0 +1,55 @@
+"""
+Потоковая выгрузка: скорость и пиковая память Python
+
+Прогоняет stream_export по данным из DATABASE_URL (например, после
+benchmarks.seed) без HTTP и замеряет строки/с и пик tracemalloc. Пик
+не должен расти вместе с размером таблицы — он определяется
+EXPORT_BATCH_SIZE.
+
+    python -m benchmarks.exports --resource ratings --format csv [--gzip]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from app.exports import EXPORTS, stream_export
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--resource", choices=sorted(EXPORTS), default="ratings")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_chunk_s = None
+    size = lines = 0
+    for chunk in stream_export(args.resource, args.format, gzip=args.gzip):
+        if first_chunk_s is None:
+            first_chunk_s = time.perf_counter() - started
+        size += len(chunk)
+        if not args.gzip:
+            lines += chunk.count(b"\n")
+    total_s = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows = lines - (1 if args.format == "csv" else 0)
+    print(json.dumps({
+        "resource": args.resource,
+        "format": args.format,
+        "gzip": args.gzip,
+        "rows": rows if not args.gzip else None,
+        "bytes": size,
+        "first_chunk_s": round(first_chunk_s or 0, 3),
+        "total_s": round(total_s, 2),
+        "rows_per_s": round(rows / total_s) if not args.gzip and total_s else None,
+        "peak_python_mb": round(peak / 2 ** 20, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Время импорта приложения (python -X importtime) с проверкой бюджета
+
+Запускает импорт модуля в отдельном интерпретаторе несколько раз, берет
+медиану суммарного времени и печатает самые дорогие модули. С --budget-ms
+завершается с кодом 1, если медиана превышает бюджет, — это можно
+использовать как проверку в CI.
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --module app.main --budget-ms 1500 --top 15
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+DEFAULT_BUDGET_MS = 1500
+
+
+def measure(module: str) -> Tuple[float, Dict[str, Tuple[float, float]]]:
+    """Одна попытка: (суммарное время в мс, модуль -> (self, cumulative) в мс)"""
+    # Импорт не должен обращаться к БД, поэтому адрес БД подставлять не нужно
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Импорт {module} завершился ошибкой:\n{result.stderr[-2000:]}")
+
+    modules = {}
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+        # Импорты верхнего уровня (без отступа) в сумме дают полное время
+        if not name[1:].startswith(" "):
+            total += int(cumulative_us) / 1000
+    return total, modules
+
+
+def top_modules(modules: Dict[str, Tuple[float, float]], prefix: str, limit: int) -> List[dict]:
+    """Самые дорогие модули по собственному времени; prefix — только свой пакет"""
+    items = [
+        {"module": name, "self_ms": round(self_ms, 1), "cumulative_ms": round(cumulative_ms, 1)}
+        for name, (self_ms, cumulative_ms) in modules.items()
+        if name.startswith(prefix)
+    ]
+    return sorted(items, key=lambda item: item["self_ms"], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    # Первый прогон прогревает кэш файловой системы и не учитывается
+    measure(args.module)
+    runs = [measure(args.module) for _ in range(args.runs)]
+    totals = [total for total, _ in runs]
+    median = statistics.median(totals)
+    _, modules = runs[totals.index(sorted(totals)[len(totals) // 2])]
+
+    report = {
+        "module": args.module,
+        "runs_ms": [round(total, 1) for total in totals],
+        "median_ms": round(median, 1),
+        "budget_ms": args.budget_ms,
+        "app_modules": top_modules(modules, args.module.split(".")[0] + ".", args.top),
+        "all_modules": top_modules(modules, "", args.top),
+        "passlib_loaded": any(name.startswith("passlib") for name in modules),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if median > args.budget_ms:
+        print(f"Бюджет превышен: {median:.0f} мс > {args.budget_ms:.0f} мс", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
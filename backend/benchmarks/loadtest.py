@@ -0,0 +1,188 @@
+"""
+Нагрузочный прогон реальных эндпоинтов API
+
+Каждый сценарий гоняется --concurrency потоками (у каждого свое keep-alive
+соединение) в течение --duration секунд. Итог — JSON с req/s, p50/p95/p99,
+распределением кодов ответа и числом SQL-запросов на запрос. Последнее
+берется из заголовка Server-Timing, поэтому сервер нужно запускать с
+SQL_PROFILING=1; иначе поле будет null.
+
+    python -m benchmarks.loadtest --base-url http://localhost:8000 --concurrency 16 --duration 20
+
+Токены для авторизованных сценариев выпускаются локально тем же SECRET_KEY,
+что у сервера, для пользователей benchN@example.com из benchmarks.seed.
+"""
+import argparse
+import http.client
+import json
+import random
+import re
+import statistics as stats
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+from app.auth import create_access_token
+
+from .seed import BENCH_PASSWORD, GENRES, TAGS, WORDS
+
+_SERVER_TIMING_SQL_RE = re.compile(r'desc="(\d+) SQL"')
+
+
+class Scenario:
+    """Сценарий нагрузки: функция строит (method, path, headers, body) для очередного запроса"""
+
+    def __init__(self, name: str, build: Callable[[random.Random], tuple]):
+        self.name = name
+        self.build = build
+
+
+def _token_headers(user_id: int) -> dict:
+    token = create_access_token({"sub": f"bench{user_id}@example.com"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def build_scenarios(args) -> List[Scenario]:
+    token_cache: Dict[int, dict] = {}
+
+    def auth_headers(rng):
+        user_id = rng.randint(1, args.users)
+        if user_id not in token_cache:
+            token_cache[user_id] = _token_headers(user_id)
+        return token_cache[user_id]
+
+    def books_query(rng):
+        params = {"limit": 24}
+        choice = rng.random()
+        if choice < 0.3:
+            params["tag"] = rng.choice(TAGS)
+        elif choice < 0.6:
+            params["genre"] = rng.choice(GENRES)
+        elif choice < 0.9:
+            params["search"] = rng.choice(WORDS)
+        return ("GET", "/api/books?" + urlencode(params), {}, None)
+
+    def view_range(rng):
+        start = rng.randrange(0, 1024 * 1024, 65536)
+        return ("GET", f"/api/books/{rng.randint(1, args.files)}/view",
+                {"Range": f"bytes={start}-{start + 65535}"}, None)
+
+    def login(rng):
+        body = json.dumps({"email": f"bench{rng.randint(1, args.users)}@example.com", "password": BENCH_PASSWORD})
+        return ("POST", "/api/auth/login", {"Content-Type": "application/json"}, body)
+
+    def rate(rng):
+        body = json.dumps({"book_id": rng.randint(1, args.books), "value": rng.randint(1, 5)})
+        return ("POST", "/api/ratings", {**auth_headers(rng), "Content-Type": "application/json"}, body)
+
+    return [
+        Scenario("books_list", books_query),
+        Scenario("books_list_auth", lambda rng: (*books_query(rng)[:2], auth_headers(rng), None)),
+        Scenario("book_detail", lambda rng: ("GET", f"/api/books/{rng.randint(1, args.books)}", {}, None)),
+        Scenario("book_view_range", view_range),
+        Scenario("login", login),
+        Scenario("ratings", rate),
+    ]
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return round(sorted_values[index] * 1000, 2)
+
+
+def run_scenario(base_url: str, scenario: Scenario, concurrency: int, duration: float, seed: int) -> dict:
+    """Прогнать сценарий и вернуть сводку"""
+    parts = urlsplit(base_url)
+    connection_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    deadline = time.perf_counter() + duration
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    sql_counts: List[int] = []
+    lock = threading.Lock()
+
+    def worker(worker_id: int):
+        rng = random.Random(seed * 1000 + worker_id)
+        conn = connection_cls(parts.hostname, parts.port)
+        local_latencies, local_statuses, local_sql = [], Counter(), []
+        while time.perf_counter() < deadline:
+            method, path, headers, body = scenario.build(rng)
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                match = _SERVER_TIMING_SQL_RE.search(response.getheader("Server-Timing") or "")
+                if match:
+                    local_sql.append(int(match.group(1)))
+            except (OSError, http.client.HTTPException):
+                status = "error"
+                conn.close()
+                conn = connection_cls(parts.hostname, parts.port)
+            local_latencies.append(time.perf_counter() - start)
+            local_statuses[status] += 1
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+            sql_counts.extend(local_sql)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": _percentile(latencies, 0.50),
+        "p95_ms": _percentile(latencies, 0.95),
+        "p99_ms": _percentile(latencies, 0.99),
+        "statuses": {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+        "sql_per_request": round(stats.mean(sql_counts), 2) if sql_counts else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="секунд на сценарий")
+    parser.add_argument("--scenario", action="append", help="запустить только указанные сценарии")
+    parser.add_argument("--books", type=int, default=100_000, help="как в benchmarks.seed")
+    parser.add_argument("--users", type=int, default=50_000, help="как в benchmarks.seed")
+    parser.add_argument("--files", type=int, default=100, help="как в benchmarks.seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="записать JSON в файл")
+    args = parser.parse_args()
+
+    results = {
+        "base_url": args.base_url,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "scenarios": {},
+    }
+    for scenario in build_scenarios(args):
+        if args.scenario and scenario.name not in args.scenario:
+            continue
+        results["scenarios"][scenario.name] = run_scenario(
+            args.base_url, scenario, args.concurrency, args.duration, args.seed
+        )
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Микробенчмарк разбора имен файлов книг и сканирования директории
+
+Перед замерами проверяет, что быстрый разборщик (utils.parse_book_filenames)
+совпадает с эталонным utils.parse_book_filename на случайном корпусе имен
+и на наборе граничных случаев.
+
+    python -m benchmarks.parser --names 100000
+    python -m benchmarks.parser --verify-only --corpus 200000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from app.config import settings
+from app.utils import (
+    _parse_book_filename_fast,
+    get_books_from_directory,
+    parse_book_filename,
+    parse_book_filenames,
+)
+
+# Символы подобраны так, чтобы чаще попадать в ветки разборщика
+ALPHABET = "#_,. -абвгдеёжАБВЁabcXYZ019\t"
+
+EDGE_CASES = [
+    "", ".", ".pdf", "#", "##", "###.pdf", "#_#.pdf", "#a#b.pdf", "#a_#b_c.pdf",
+    "#ТЭГ_#ЖАНР_Название_книги,_Имя_Автора.pdf", "#ТЭГ_#ЖАНР_Название_книги_Автор.pdf",
+    "#ТЭГ_#ЖАНР_Название,_Автор,_Второй.pdf", "#ТЭГ_#ЖАНР,_Автор.pdf", "#ТЭГ_#ЖАНР.pdf",
+    "#ТЭГ_#ЖАНР__Автор.pdf", "#ТЭГ_#ЖАНР_a#b_c.pdf", "без_тэгов.pdf", "#только_тэг.pdf",
+    "# _ # _ , _ .pdf", "#T#G_a.b.c_d.pdf", "no-extension#a#b_c_d", "#a#b_c_d.",
+    "# тэг _#жанр _x_y.pdf",
+]
+
+
+def random_name(rng: random.Random) -> str:
+    length = rng.randint(0, 40)
+    name = "".join(rng.choice(ALPHABET) for _ in range(length))
+    return name + rng.choice([".pdf", ".PDF", "", ".txt.pdf"])
+
+
+def verify(corpus_size: int, seed: int) -> int:
+    """Сравнить быстрый и эталонный разбор; при расхождении — AssertionError"""
+    rng = random.Random(seed)
+    names = EDGE_CASES + [random_name(rng) for _ in range(corpus_size)]
+    columns = parse_book_filenames(names)
+    for i, name in enumerate(names):
+        expected = parse_book_filename(name)
+        actual = (columns.tags[i], columns.genres[i], columns.titles[i], columns.authors[i])
+        assert actual == expected, f"Расхождение для {name!r}: {actual!r} != {expected!r}"
+    return len(names)
+
+
+def realistic_names(rng: random.Random, count: int) -> list:
+    words = ["Пионерская", "зорька", "Сказки", "Костер", "дружбы", "лагерь", "песни", "Урал"]
+    authors = ["Иван_Иванов", "Анна_Петрова", "Салават_Юлаев", "Мустай_Карим"]
+    names = []
+    for i in range(count):
+        title = "_".join(rng.choice(words) for _ in range(rng.randint(1, 6)))
+        sep = ",_" if rng.random() < 0.7 else "_"
+        names.append(f"#{rng.choice(['5-9_класс', 'Педагогам'])}_#{rng.choice(['Повесть', 'Стихи'])}_{title}{sep}{rng.choice(authors)}_{i}.pdf")
+    return names
+
+
+def _best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return round(min(times), 4)
+
+
+def bench_parse(names: list, repeat: int) -> dict:
+    """Разбор в памяти: эталон по строкам, быстрый разбор по строкам и по колонкам"""
+    reference = _best(lambda: [parse_book_filename(n) for n in names], repeat)
+    fast = _best(lambda: list(map(_parse_book_filename_fast, names)), repeat)
+    return {
+        "names": len(names),
+        "reference_rows_s": reference,
+        "fast_rows_s": fast,
+        "batch_columns_s": _best(lambda: parse_book_filenames(names), repeat),
+        "rows_speedup": round(reference / fast, 2) if fast else None,
+    }
+
+
+def bench_scan(names: list, repeat: int) -> dict:
+    """Полный путь sync: обход директории и построение словарей книг"""
+    with tempfile.TemporaryDirectory() as directory:
+        for name in names:
+            open(os.path.join(directory, name), "wb").close()
+
+        def listdir_reference():
+            books = []
+            for filename in os.listdir(directory):
+                if filename.endswith('.pdf'):
+                    tag, genre, title, author = parse_book_filename(filename)
+                    books.append({'filename': filename, 'tag': tag, 'genre': genre,
+                                  'title': title, 'author': author})
+            return books
+
+        original_directory = settings.BOOKS_DIRECTORY
+        settings.BOOKS_DIRECTORY = directory
+        try:
+            assert listdir_reference() == get_books_from_directory()
+            reference = _best(listdir_reference, repeat)
+            current = _best(get_books_from_directory, repeat)
+        finally:
+            settings.BOOKS_DIRECTORY = original_directory
+
+        return {
+            "files": len(names),
+            "listdir_reference_s": reference,
+            "get_books_from_directory_s": current,
+            "speedup": round(reference / current, 2) if current else None,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора имен файлов книг")
+    parser.add_argument("--names", type=int, default=100_000)
+    parser.add_argument("--scan-files", type=int, default=20_000)
+    parser.add_argument("--corpus", type=int, default=50_000, help="размер случайного корпуса для проверки")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verify-only", action="store_true")
+    args = parser.parse_args()
+
+    results = {"verified_names": verify(args.corpus, args.seed)}
+    if not args.verify_only:
+        rng = random.Random(args.seed)
+        results["parse"] = bench_parse(realistic_names(rng, args.names), args.repeat)
+        results["scan"] = bench_scan(realistic_names(rng, args.scan_files), args.repeat)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Микробенчмарк сериализации списка книг: json против orjson, размеры ответа
+без сжатия, с gzip/brotli и с проекцией ?fields=
+
+    python -m benchmarks.responses --books 100 --repeat 200
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+from datetime import datetime
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from app import schemas
+from app.compression import brotli
+from app.config import settings
+from benchmarks.seed import GENRES, TAGS, WORDS
+
+PROJECTION = ("id", "title", "author")
+
+
+def make_books(count: int, rng: random.Random) -> list:
+    return [
+        schemas.BookResponse(
+            id=i,
+            filename=f"book_{i}.pdf",
+            title=" ".join(rng.choices(WORDS, k=4)),
+            author=" ".join(rng.choices(WORDS, k=2)),
+            tag=rng.choice(TAGS),
+            genre=rng.choice(GENRES),
+            description=" ".join(rng.choices(WORDS, k=300)),
+            created_at=datetime(2024, 1, 1),
+            average_rating=round(rng.uniform(1, 5), 2),
+            is_favorite=rng.random() < 0.1,
+            is_read=rng.random() < 0.2,
+            user_rating=None,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def timed(fn, repeat: int) -> float:
+    """Среднее время вызова в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    books = make_books(args.books, random.Random(args.seed))
+
+    # Так сериализует JSONResponse (jsonable_encoder + json.dumps) и ORJSONResponse
+    def render_json():
+        return json.dumps(jsonable_encoder(books), ensure_ascii=False, separators=(",", ":")).encode()
+
+    def render_orjson():
+        return orjson.dumps(jsonable_encoder(books))
+
+    raw = render_orjson()
+    projected = orjson.dumps([{field: getattr(book, field) for field in PROJECTION} for book in books])
+
+    report = {
+        "books": args.books,
+        "render_ms": {"json": round(timed(render_json, args.repeat), 3),
+                      "orjson": round(timed(render_orjson, args.repeat), 3)},
+        "bytes": {
+            "raw": len(raw),
+            "gzip": len(gzip.compress(raw, settings.GZIP_LEVEL)),
+            "projected": len(projected),
+            "projected_gzip": len(gzip.compress(projected, settings.GZIP_LEVEL)),
+        },
+    }
+    if brotli is not None:
+        report["bytes"]["br"] = len(brotli.compress(raw, quality=settings.BROTLI_QUALITY))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Наполнение локальной PostgreSQL тестовыми данными через COPY
+
+Объемы задаются аргументами (по умолчанию 100k книг, 50k пользователей,
+1M оценок). Все пользователи получают пароль BENCH_PASSWORD, для первых
+--files книг в BOOKS_DIRECTORY создаются PDF-заглушки для /view и /download.
+
+    python -m benchmarks.seed --reset --books 100000 --users 50000 --ratings 1000000
+"""
+import argparse
+import io
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from app import models, statistics
+from app.auth import get_password_hash
+from app.config import settings
+from app.database import SessionLocal, engine
+
+BENCH_PASSWORD = "Bench_pass1!"
+CHUNK_ROWS = 100_000
+
+TAGS = ["1-4 класс", "5-9 класс", "10-11 класс", "Педагогам", "Вожатым"]
+GENRES = ["Сказки", "Повесть", "Роман", "Методичка", "Сценарий", "Стихи", "Энциклопедия"]
+WORDS = ["пионер", "лагерь", "дружба", "костер", "поход", "песня", "звезда", "башкортостан",
+         "река", "лес", "отряд", "вожатый", "сбор", "знамя", "горн", "урок", "книга", "школа"]
+AUTHORS = [f"{first} {last}" for first in ["Иван", "Анна", "Петр", "Мария", "Олег", "Елена"]
+           for last in ["Иванов", "Петрова", "Сидоров", "Ахметова", "Галиев", "Смирнова", "Юсупов"]]
+
+# Таблицы с триггерами library_counters: на время COPY триггеры отключаются
+COUNTED_TABLES = [table.name for table in statistics.GLOBAL_COUNTERS.values()]
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    text = str(value)
+    if any(ch in text for ch in ',"\n'):
+        text = '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def copy_rows(cursor, table: str, columns: list, rows) -> int:
+    """Загрузить строки через COPY порциями по CHUNK_ROWS, не держа все в памяти"""
+    total = 0
+    buffer = io.StringIO()
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+    def flush():
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+        buffer.seek(0)
+        buffer.truncate()
+
+    pending = 0
+    for row in rows:
+        buffer.write(",".join(_csv_value(v) for v in row))
+        buffer.write("\n")
+        pending += 1
+        if pending >= CHUNK_ROWS:
+            flush()
+            total += pending
+            pending = 0
+    if pending:
+        flush()
+        total += pending
+    return total
+
+
+def _distinct_pairs(rng: random.Random, users: int, books: int, total: int):
+    """Уникальные пары (user_id, book_id), примерно total штук"""
+    per_user = max(1, total // users)
+    for user_id in range(1, users + 1):
+        for book_id in rng.sample(range(1, books + 1), min(per_user, books)):
+            yield user_id, book_id
+
+
+def seed(args) -> dict:
+    rng = random.Random(args.seed)
+    models.Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    password_hash = get_password_hash(BENCH_PASSWORD)
+    timings = {}
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if args.reset:
+            cursor.execute(
+                "TRUNCATE users, books, ratings, reviews, favorites, read_books, "
+                "bookmarks, notes, review_reports, reading_progress RESTART IDENTITY CASCADE"
+            )
+        else:
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM users) OR EXISTS (SELECT 1 FROM books)")
+            if cursor.fetchone()[0]:
+                raise SystemExit("Таблицы не пусты: запустите с --reset")
+        for table in COUNTED_TABLES:
+            cursor.execute(f"ALTER TABLE {table} DISABLE TRIGGER USER")
+
+        def timed(name, table, columns, rows):
+            start = time.perf_counter()
+            count = copy_rows(cursor, table, columns, rows)
+            timings[name] = {"rows": count, "seconds": round(time.perf_counter() - start, 2)}
+
+        timed("users", "users", ["id", "email", "full_name", "hashed_password", "is_admin", "created_at"], (
+            (i, f"bench{i}@example.com", rng.choice(AUTHORS), password_hash, i == 1, now - timedelta(minutes=i))
+            for i in range(1, args.users + 1)
+        ))
+        timed("books", "books", ["id", "filename", "title", "author", "tag", "genre", "description", "created_at"], (
+            (
+                i,
+                f"bench_{i}.pdf",
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).capitalize(),
+                rng.choice(AUTHORS),
+                rng.choice(TAGS),
+                rng.choice(GENRES),
+                " ".join(rng.choice(WORDS) for _ in range(args.description_words)),
+                now - timedelta(minutes=i),
+            )
+            for i in range(1, args.books + 1)
+        ))
+        timed("ratings", "ratings", ["user_id", "book_id", "value", "created_at"], (
+            (user_id, book_id, rng.randint(1, 5), now)
+            for user_id, book_id in _distinct_pairs(rng, args.users, args.books, args.ratings)
+        ))
+        timed("favorites", "favorites", ["user_id", "book_id"],
+              _distinct_pairs(rng, args.users, args.books, args.favorites))
+        timed("read_books", "read_books", ["user_id", "book_id"],
+              _distinct_pairs(rng, args.users, args.books, args.reads))
+        timed("reviews", "reviews", ["user_id", "book_id", "text", "created_at"], (
+            (rng.randint(1, args.users), rng.randint(1, args.books),
+             " ".join(rng.choice(WORDS) for _ in range(20)), now - timedelta(seconds=i))
+            for i in range(args.reviews)
+        ))
+
+        for table in COUNTED_TABLES:
+            cursor.execute(f"ALTER TABLE {table} ENABLE TRIGGER USER")
+        for table in ["users", "books", "ratings", "reviews"]:
+            cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}")
+        raw.commit()
+
+        raw.set_isolation_level(0)  # ANALYZE вне транзакции
+        start = time.perf_counter()
+        cursor.execute("ANALYZE")
+        timings["analyze"] = {"seconds": round(time.perf_counter() - start, 2)}
+    finally:
+        raw.close()
+
+    db = SessionLocal()
+    try:
+        statistics.rebuild_global_counters(db)
+    finally:
+        db.close()
+
+    os.makedirs(settings.BOOKS_DIRECTORY, exist_ok=True)
+    stub = b"%PDF-1.4\n" + b"0" * args.file_size
+    for i in range(1, min(args.files, args.books) + 1):
+        with open(os.path.join(settings.BOOKS_DIRECTORY, f"bench_{i}.pdf"), "wb") as f:
+            f.write(stub)
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Наполнение БД для бенчмарков")
+    parser.add_argument("--reset", action="store_true", help="очистить таблицы перед загрузкой")
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--ratings", type=int, default=1_000_000)
+    parser.add_argument("--favorites", type=int, default=500_000)
+    parser.add_argument("--reads", type=int, default=500_000)
+    parser.add_argument("--reviews", type=int, default=200_000)
+    parser.add_argument("--description-words", type=int, default=60)
+    parser.add_argument("--files", type=int, default=100, help="сколько PDF-заглушек создать")
+    parser.add_argument("--file-size", type=int, default=2 * 1024 * 1024)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(json.dumps(seed(args), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Сравнение конфигураций сервера на одном железе
+
+Для каждой конфигурации поднимает сервер на свободном порту, ждет
+/api/health, прогоняет сценарии benchmarks.loadtest и останавливает сервер
+SIGTERM, замеряя время плавной остановки. БД берется из DATABASE_URL
+(ее нужно заранее заполнить через benchmarks.seed).
+
+    python -m benchmarks.servers --duration 15 --scenario books_list --scenario book_detail
+    python -m benchmarks.servers --config gunicorn-auto --config uvicorn-single
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from .loadtest import Scenario, build_scenarios, run_scenario
+
+CONFIGS = {
+    # Прежний вариант из Dockerfile
+    "uvicorn-2-workers": {
+        "command": ["uvicorn", "app.main:app", "--workers", "2"],
+        "env": {},
+    },
+    "uvicorn-single": {
+        "command": ["uvicorn", "app.main:app", "--loop", "asyncio", "--http", "h11"],
+        "env": {},
+    },
+    "gunicorn-auto": {
+        "command": ["gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        "env": {},
+    },
+    "gunicorn-asyncio-h11": {
+        "command": ["gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        "env": {"UVICORN_LOOP": "asyncio", "UVICORN_HTTP": "h11"},
+    },
+    "gunicorn-2-per-core": {
+        "command": ["gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+        "env": {"WORKERS_PER_CORE": "2"},
+    },
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(port: int, timeout: float = 60.0) -> float:
+    """Дождаться ответа /api/health; вернуть время старта в секундах"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                return time.perf_counter() - started
+        except OSError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"Сервер на порту {port} не ответил за {timeout:.0f} с")
+
+
+def run_config(name: str, args, scenarios) -> dict:
+    config = CONFIGS[name]
+    port = free_port()
+    command = list(config["command"])
+    env = {**os.environ, **config["env"]}
+    if command[0] == "gunicorn":
+        env["BIND"] = f"127.0.0.1:{port}"
+        command = [sys.executable, "-m", *command]
+    else:
+        command = [sys.executable, "-m", *command, "--host", "127.0.0.1", "--port", str(port), "--no-access-log"]
+
+    # gunicorn очищает директорию метрик сам (on_starting), uvicorn — нет
+    multiproc_dir = env.get("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        result = {"startup_s": round(wait_ready(port), 2), "scenarios": {}}
+        for scenario in scenarios:
+            result["scenarios"][scenario.name] = run_scenario(
+                f"http://127.0.0.1:{port}", scenario, args.concurrency, args.duration, args.seed
+            )
+    finally:
+        stop_started = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    result["shutdown_s"] = round(time.perf_counter() - stop_started, 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", action="append", choices=sorted(CONFIGS), help="по умолчанию все")
+    parser.add_argument("--scenario", action="append", help="сценарии benchmarks.loadtest или health")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="секунд на сценарий")
+    parser.add_argument("--books", type=int, default=100_000, help="как в benchmarks.seed")
+    parser.add_argument("--users", type=int, default=50_000, help="как в benchmarks.seed")
+    parser.add_argument("--files", type=int, default=100, help="как в benchmarks.seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="записать JSON в файл")
+    args = parser.parse_args()
+
+    # health — нижняя граница: накладные расходы сервера без обращения к БД
+    available = [Scenario("health", lambda rng: ("GET", "/api/health", {}, None)), *build_scenarios(args)]
+    selected = args.scenario or ["health", "books_list", "book_detail"]
+    scenarios = [scenario for scenario in available if scenario.name in selected]
+
+    results = {
+        "cpus": os.cpu_count(),
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "configs": {},
+    }
+    for name in args.config or CONFIGS:
+        results["configs"][name] = run_config(name, args, scenarios)
+        print(f"{name}: готово", file=sys.stderr)
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Скорость индекса подсказок без БД
+
+Строит индекс по синтетическому каталогу и замеряет время ответа на
+префиксы длиной 1–8 символов (как при наборе по буквам).
+
+    python -m benchmarks.suggest --books 100000 --queries 20000
+"""
+import argparse
+import json
+import random
+import time
+
+from app.suggest import SuggestIndex
+
+from .seed import AUTHORS, GENRES, WORDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = [
+        (" ".join(rng.choices(WORDS, k=rng.randint(2, 5))).capitalize() + f" {i}",
+         rng.choice(AUTHORS), rng.choice(GENRES))
+        for i in range(args.books)
+    ]
+
+    started = time.perf_counter()
+    index = SuggestIndex.from_books(rows)
+    build_s = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(args.queries):
+        source = rng.choice(rng.choice(rows))
+        query = source[:rng.randint(1, 8)]
+        started = time.perf_counter()
+        index.suggest(query)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+
+    started = time.perf_counter()
+    for title, author, genre in rows[:1000]:
+        index.remove_book(title, author, genre)
+        index.add_book(title + " новое издание", author, genre)
+    update_ms = (time.perf_counter() - started) * 1000 / 1000
+
+    print(json.dumps({
+        "books": args.books,
+        "entries": len(index),
+        "build_s": round(build_s, 2),
+        "query_p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "query_p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+        "query_max_ms": round(latencies[-1] * 1000, 3),
+        "update_ms": round(update_ms, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
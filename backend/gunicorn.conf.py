@@ -0,0 +1,58 @@
+"""
+Продакшен-профиль сервера: gunicorn + uvicorn-воркеры
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Все параметры задаются переменными окружения (см. app/config.py):
+WEB_CONCURRENCY, WORKERS_PER_CORE, MAX_WORKERS, THREADPOOL_SIZE,
+GRACEFUL_TIMEOUT, MAX_REQUESTS, PRELOAD_APP, UVICORN_LOOP, UVICORN_HTTP.
+
+SIGTERM — плавная остановка: воркеры перестают принимать соединения,
+дожидаются текущих запросов и выполняют lifespan shutdown. SIGHUP —
+плавный перезапуск воркеров (с PRELOAD_APP код не перечитывается).
+"""
+import os
+import shutil
+
+# Метрики всех воркеров — в общей директории (multiprocess-режим prometheus_client).
+# Задается здесь, а не в образе: воркер задач (python -m app.jobs) — отдельный
+# процесс без /metrics и без очистки директории. Очищается до загрузки
+# приложения: при PRELOAD_APP метрики создаются в мастере уже при импорте, а
+# данные прошлого запуска не должны попасть в агрегат.
+multiproc_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus")
+shutil.rmtree(multiproc_dir, ignore_errors=True)
+os.makedirs(multiproc_dir, exist_ok=True)
+
+from app.config import settings
+from app.server import worker_count
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = worker_count()
+worker_class = "app.workers.UvicornWorker"
+
+graceful_timeout = settings.GRACEFUL_TIMEOUT
+timeout = settings.WORKER_TIMEOUT
+keepalive = 5
+
+# Перезапуск воркера после N запросов ограничивает рост памяти; jitter
+# не дает всем воркерам перезапуститься одновременно
+max_requests = settings.MAX_REQUESTS
+max_requests_jitter = settings.MAX_REQUESTS_JITTER
+
+# Импорт приложения не открывает соединений с БД и не запускает потоков
+# (все это в lifespan), поэтому его можно загрузить в мастере до fork
+preload_app = settings.PRELOAD_APP
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # На случай, если при preload что-то успело открыть соединение в мастере
+    from app.database import engine
+    engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,107 @@
+"""
+Общие фикстуры тестов
+
+Тесты работают с SQLite во временной директории: переменные окружения
+выставляются до импорта app, потому что настройки и движок создаются при
+импорте. Части, завязанные на PostgreSQL (триггеры, материализованные
+представления, LISTEN/NOTIFY), в SQLite не создаются.
+"""
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="library-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_TMP}/test.db")
+os.environ.setdefault("BOOKS_DIRECTORY", os.path.join(_TMP, "books"))
+os.environ.setdefault("OPTIMIZED_DIRECTORY", os.path.join(_TMP, "books_optimized"))
+os.environ.setdefault("IMPORT_DIRECTORY", os.path.join(_TMP, "import"))
+os.environ.setdefault("STORAGE_CACHE_DIRECTORY", os.path.join(_TMP, "cache"))
+
+import pytest
+
+from app import models
+from app.database import SessionLocal, engine
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    models.Base.metadata.create_all(bind=engine)
+    yield
+    models.Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def db():
+    """Сессия на чистой БД: после теста все таблицы очищаются"""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        with engine.begin() as conn:
+            for table in reversed(models.Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+
+@pytest.fixture
+def make_user(db):
+    """Фабрика пользователей (без хеширования пароля — оно медленное)"""
+    def make(email: str = None, is_admin: bool = False) -> models.User:
+        count = db.query(models.User).count()
+        user = models.User(
+            email=email or f"user{count}@example.com",
+            full_name=f"Читатель {count}",
+            hashed_password="-",
+            is_admin=is_admin,
+        )
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def make_books(db):
+    """Фабрика книг: make_books(n) -> список книг"""
+    def make(count: int, **fields) -> list:
+        start = db.query(models.Book).count()
+        books = [
+            models.Book(
+                filename=f"#T_#G_Книга {start + i}_Автор.pdf",
+                title=f"Книга {start + i}",
+                author=fields.get("author", "Автор"),
+                tag=fields.get("tag", "T"),
+                genre=fields.get("genre", "G"),
+                description="Описание",
+            )
+            for i in range(count)
+        ]
+        db.add_all(books)
+        db.commit()
+        return books
+    return make
+
+
+@pytest.fixture
+def query_budget():
+    """Бюджет SQL-запросов: with query_budget(3): client.get(...)"""
+    from app.profiling import assert_query_budget
+    return assert_query_budget
+
+
+@pytest.fixture
+def client(db):
+    """TestClient без lifespan: схема уже создана, фоновые потоки не нужны"""
+    from fastapi.testclient import TestClient
+    from app import main
+    yield TestClient(main.app)
+    for attempts in (main.login_attempts, main.download_attempts, main.view_attempts):
+        attempts.clear()
+
+
+@pytest.fixture
+def auth_headers():
+    """Заголовки с токеном пользователя"""
+    from app import auth
+    def make(user: models.User) -> dict:
+        return {"Authorization": f"Bearer {auth.create_access_token({'sub': user.email})}"}
+    return make
@@ -0,0 +1,47 @@
+"""Аналитика: кольцевой буфер событий и учет просмотров при Range-запросах"""
+from app.analytics import EventBuffer
+
+
+def fill(buffer: EventBuffer, book_ids) -> None:
+    for book_id in book_ids:
+        buffer.record(book_id, "view")
+
+
+def test_restore_keeps_order_when_space_left():
+    buffer = EventBuffer(10)
+    fill(buffer, [1, 2, 3])
+    items = buffer.take()
+    fill(buffer, [4, 5])
+
+    buffer.restore(items)
+    assert [book_id for book_id, _, _ in buffer.take()] == [1, 2, 3, 4, 5]
+    assert buffer.dropped == 0
+
+
+def test_restore_overflow_drops_oldest_restored_events():
+    buffer = EventBuffer(4)
+    fill(buffer, [1, 2, 3])
+    items = buffer.take()
+    fill(buffer, [4, 5, 6])
+
+    buffer.restore(items)
+    assert [book_id for book_id, _, _ in buffer.take()] == [3, 4, 5, 6]
+    assert buffer.dropped == 2
+
+
+def test_ranged_requests_count_one_view(client, make_books, monkeypatch):
+    from app import analytics, storage
+
+    book = make_books(1)[0]
+    storage.books.prepare()
+    with open(storage.books.path(book.filename), "wb") as f:
+        f.write(b"%PDF-1.4" + b"0" * 1024)
+    recorded = []
+    monkeypatch.setattr(analytics, "record", lambda book_id, event_type: recorded.append(event_type))
+    try:
+        url = f"/api/books/{book.id}/view"
+        for headers in ({}, {"Range": "bytes=0-511"}, {"Range": "bytes=512-"}, {"Range": "bytes=-100"}):
+            assert client.get(url, headers=headers).status_code in (200, 206)
+    finally:
+        storage.books.delete(book.filename)
+    assert recorded == [analytics.VIEW, analytics.VIEW]
@@ -0,0 +1,33 @@
+"""Подписка на события модерации по одноразовому билету вместо JWT в строке запроса"""
+from datetime import datetime, timedelta
+
+from app import auth, models
+
+
+def test_ticket_requires_admin(client, make_user, auth_headers):
+    reader = make_user()
+    assert client.post("/api/admin/events/ticket").status_code == 401
+    assert client.post("/api/admin/events/ticket", headers=auth_headers(reader)).status_code == 403
+
+
+def test_ticket_is_single_use(db, client, make_user, auth_headers):
+    admin = make_user(is_admin=True)
+    response = client.post("/api/admin/events/ticket", headers=auth_headers(admin))
+    assert response.status_code == 200
+    ticket = response.json()["ticket"]
+
+    assert auth.redeem_stream_ticket(db, ticket).id == admin.id
+    assert auth.redeem_stream_ticket(db, ticket) is None
+    assert client.get("/api/admin/events", params={"ticket": ticket}).status_code == 403
+
+
+def test_expired_ticket_and_jwt_rejected(db, client, make_user, auth_headers):
+    admin = make_user(is_admin=True)
+    ticket = auth.create_stream_ticket(db, admin)
+    db.query(models.StreamTicket).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+    assert auth.redeem_stream_ticket(db, ticket) is None
+
+    token = auth_headers(admin)["Authorization"].split()[1]
+    assert client.get("/api/admin/events", params={"ticket": token}).status_code == 403
+    assert client.get("/api/admin/events", params={"token": token}).status_code == 422
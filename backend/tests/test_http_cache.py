@@ -0,0 +1,79 @@
+"""ResponseCache: TTL и вытеснение из TTLCache, инвалидация по тегам"""
+from app.http_cache import ResponseCache, book_tag, CATALOG_TAG
+
+RESPONSE = (200, [], b"{}", 'W/"x"')
+
+
+def test_invalidate_by_tag():
+    cache = ResponseCache(ttl=60)
+    cache.set("/api/books/1", RESPONSE, {CATALOG_TAG, book_tag(1)})
+    cache.set("/api/books/2", RESPONSE, {CATALOG_TAG, book_tag(2)})
+
+    cache.invalidate_tags(book_tag(1))
+    assert cache.get("/api/books/1") is None
+    assert cache.get("/api/books/2") == RESPONSE
+
+    cache.invalidate_tags(CATALOG_TAG)
+    assert cache.get("/api/books/2") is None
+    assert not cache._tags
+
+
+def test_evicted_and_expired_entries_leave_tag_index():
+    cache = ResponseCache(ttl=60, maxsize=2)
+    for book_id in range(1, 4):
+        cache.set(f"/api/books/{book_id}", RESPONSE, {book_tag(book_id)})
+    assert cache.get("/api/books/1") is None
+    assert book_tag(1) not in cache._tags
+
+    cache.ttl = -1
+    cache.set("/api/books/4", RESPONSE, {book_tag(4)})
+    assert cache.get("/api/books/4") is None
+    assert book_tag(4) not in cache._tags
+
+
+def test_replacing_entry_drops_old_tags():
+    cache = ResponseCache(ttl=60)
+    cache.set("/api/books", RESPONSE, {"a"})
+    cache.set("/api/books", RESPONSE, {"b"})
+    cache.invalidate_tags("a")
+    assert cache.get("/api/books") == RESPONSE
+
+
+def _client(cache):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.http_cache import HTTPCacheMiddleware
+
+    app = FastAPI()
+
+    @app.get("/api/books")
+    def books():
+        return []
+
+    app.add_middleware(HTTPCacheMiddleware, cache=cache)
+    return TestClient(app)
+
+
+def test_catalog_responses_vary_on_authorization():
+    client = _client(ResponseCache(ttl=60))
+    miss, hit = client.get("/api/books"), client.get("/api/books")
+    assert (miss.headers["x-cache"], hit.headers["x-cache"]) == ("MISS", "HIT")
+    for response in (miss, hit, client.get("/api/books", headers={"Authorization": "Bearer x"})):
+        assert "authorization" in response.headers["vary"].lower()
+
+    not_modified = client.get("/api/books", headers={"If-None-Match": hit.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["vary"] == "Authorization"
+
+
+def test_notification_invalidates_other_processes():
+    from app import events, http_cache
+
+    http_cache.response_cache.set("/api/books/1", RESPONSE, {book_tag(1)})
+    http_cache.response_cache.set("/api/books/2", RESPONSE, {book_tag(2)})
+    events.dispatch('{"table": "http_cache", "tags": ["book:1"]}')
+    assert http_cache.response_cache.get("/api/books/1") is None
+    assert http_cache.response_cache.get("/api/books/2") == RESPONSE
+
+    events.NOTIFY_HANDLERS[http_cache.INVALIDATE_NOTIFY]({"op": events.RESYNC})
+    assert http_cache.response_cache.get("/api/books/2") is None
@@ -0,0 +1,46 @@
+"""Импорт с --move: исходные файлы удаляются только после коммита"""
+import json
+
+import pytest
+
+from app import importer, models, storage
+
+
+@pytest.fixture
+def partner_dir(tmp_path):
+    """Исходная директория с двумя PDF и манифест JSONL к ним"""
+    source_dir = tmp_path / "partner"
+    source_dir.mkdir()
+    records = []
+    for number in range(2):
+        (source_dir / f"{number}.pdf").write_bytes(b"%PDF-1.4 test")
+        records.append({"file": f"{number}.pdf", "title": f"Книга {number}", "author": "Автор", "tag": "T", "genre": "G"})
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text("\n".join(json.dumps(record, ensure_ascii=False) for record in records), encoding="utf-8")
+    storage.books.prepare()
+    return source_dir, str(manifest)
+
+
+def test_move_removes_sources_after_commit(db, partner_dir):
+    source_dir, manifest = partner_dir
+    report = importer.import_manifest(db, manifest, str(source_dir), move=True)
+
+    assert report["imported"] == 2
+    assert not list(source_dir.iterdir())
+    for book in db.query(models.Book):
+        assert storage.books.stat(book.filename) is not None
+        storage.books.delete(book.filename)
+
+
+def test_failed_commit_keeps_sources(db, partner_dir, monkeypatch):
+    source_dir, manifest = partner_dir
+
+    def fail():
+        raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(db, "commit", fail)
+    with pytest.raises(RuntimeError):
+        importer.import_manifest(db, manifest, str(source_dir), move=True)
+
+    assert sorted(path.name for path in source_dir.iterdir()) == ["0.pdf", "1.pdf"]
+    assert not storage.books.list_keys()
@@ -0,0 +1,34 @@
+"""Импорт app.main не тянет тяжелые и служебные модули (см. benchmarks/importtime.py)"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.importtime import measure
+
+# Нужны только на отдельных ручках и в воркере, импортируются при первом вызове
+DEFERRED = (
+    "passlib", "jose", "cryptography", "numpy", "scipy", "boto3", "botocore",
+    "app.jobs", "app.importer", "app.exports", "app.bundles", "app.similarity",
+)
+
+
+def test_app_import_defers_heavy_modules():
+    result = subprocess.run(
+        [sys.executable, "-c", "import json, sys, app.main; print(json.dumps(sorted(sys.modules)))"],
+        capture_output=True, text=True, check=True,
+    )
+    loaded = json.loads(result.stdout)
+    eager = [name for name in loaded if name.split(".")[0] in DEFERRED or name in DEFERRED]
+    assert not eager, f"Импортируются при старте: {eager}"
+
+
+@pytest.mark.skipif("IMPORT_BUDGET_MS" not in os.environ, reason="замер времени: задайте IMPORT_BUDGET_MS")
+def test_app_import_within_budget():
+    budget = float(os.environ["IMPORT_BUDGET_MS"])
+    measure("app.main")  # прогрев кэша файловой системы
+    median = statistics.median(measure("app.main")[0] for _ in range(5))
+    assert median <= budget, f"Импорт app.main: {median:.0f} мс > {budget:.0f} мс"
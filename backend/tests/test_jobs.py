@@ -0,0 +1,104 @@
+"""Очередь задач: heartbeat, запись итога только своим воркером, порядок удаления книг"""
+import time
+
+import pytest
+
+from app import jobs, models
+from app.config import settings
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    """Зарегистрировать временный обработчик задач типа test"""
+    def register(func):
+        monkeypatch.setitem(jobs.HANDLERS, "test", func)
+    return register
+
+
+def claim(db, handler_func, register, worker_id="worker-1", **fields):
+    register(handler_func)
+    job = jobs.enqueue(db, "test", **fields)
+    claimed = jobs.claim_next(db, worker_id)
+    assert claimed.id == job.id
+    return claimed
+
+
+def test_heartbeat_during_long_step(db, handler, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_HEARTBEAT_TIMEOUT", 0.3)
+    seen = {}
+
+    def slow(session, context, payload):
+        started = session.get(models.Job, context.job_id).heartbeat_at
+        time.sleep(0.5)
+        session.expire_all()
+        seen["advanced"] = session.get(models.Job, context.job_id).heartbeat_at > started
+        return {}
+
+    job = claim(db, slow, handler)
+    jobs.run_job(db, job, "worker-1")
+
+    assert seen["advanced"]
+    db.expire_all()
+    assert db.get(models.Job, job.id).status == jobs.SUCCEEDED
+
+
+@pytest.mark.parametrize("fails", [False, True])
+def test_result_ignored_after_lock_lost(db, handler, fails):
+    def requeued_meanwhile(session, context, payload):
+        # requeue_stale вернул задачу в очередь, ее взял другой воркер
+        session.query(models.Job).filter(models.Job.id == context.job_id).update(
+            {"locked_by": "worker-2", "progress_current": 7}
+        )
+        session.commit()
+        if fails:
+            raise RuntimeError("boom")
+        return {"done": True}
+
+    job = claim(db, requeued_meanwhile, handler, max_attempts=1)
+    jobs.run_job(db, job, "worker-1")
+
+    db.expire_all()
+    job = db.get(models.Job, job.id)
+    assert (job.status, job.locked_by, job.result, job.error) == (jobs.RUNNING, "worker-2", None, None)
+
+
+def test_failure_requeues_with_backoff(db, handler):
+    def failing(session, context, payload):
+        raise RuntimeError("boom")
+
+    job = claim(db, failing, handler, max_attempts=2)
+    jobs.run_job(db, job, "worker-1")
+
+    db.expire_all()
+    job = db.get(models.Job, job.id)
+    assert (job.status, job.locked_by) == (jobs.QUEUED, None)
+    assert "boom" in job.error
+
+
+def test_delete_books_commits_before_removing_files(db, make_books, monkeypatch):
+    from app import http_cache, storage, suggest
+    from app.database import SessionLocal
+
+    books = make_books(2)
+    book_ids = [book.id for book in books]
+    removed, changed = [], []
+
+    def delete_file(filename):
+        # Файл удаляется только после того, как удаление книги видно другим сессиям
+        with SessionLocal() as other:
+            assert other.query(models.Book).filter(models.Book.filename == filename).count() == 0
+        removed.append(filename)
+
+    monkeypatch.setattr(storage.books, "delete", delete_file)
+    monkeypatch.setattr(http_cache, "invalidate", lambda *tags: changed.append(set(tags)))
+    monkeypatch.setattr(suggest, "request_rebuild", lambda: changed.append("suggest"))
+
+    context = jobs.JobContext(0, "worker-1")
+    result = jobs.delete_books(db, context, {"book_ids": book_ids})
+
+    assert result["deleted"] == 2
+    assert sorted(removed) == sorted(book.filename for book in books)
+    assert changed == [
+        {http_cache.CATALOG_TAG, *(http_cache.book_tag(book_id) for book_id in book_ids)},
+        "suggest",
+    ]
@@ -0,0 +1,62 @@
+"""
+Быстрый разбор имен файлов совпадает с эталонным utils.parse_book_filename
+
+Корпус — граничные случаи и случайные имена из алфавита, который чаще
+попадает в ветки разборщика (те же, что проверяет benchmarks/parser.py).
+"""
+import os
+import random
+
+import pytest
+
+from app import utils
+from benchmarks.parser import EDGE_CASES, random_name
+
+SEEDS = range(20)
+CORPUS_SIZE = 500
+
+
+def corpus(seed: int) -> list:
+    rng = random.Random(seed)
+    return [random_name(rng) for _ in range(CORPUS_SIZE)]
+
+
+@pytest.mark.parametrize("name", EDGE_CASES)
+def test_edge_cases(name):
+    assert utils._parse_book_filename_fast(name) == utils.parse_book_filename(name)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_random_corpus_rows(seed):
+    for name in corpus(seed):
+        assert utils._parse_book_filename_fast(name) == utils.parse_book_filename(name), name
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_random_corpus_columns(seed):
+    names = corpus(seed)
+    columns = utils.parse_book_filenames(names)
+    assert columns.filenames == names
+    assert list(zip(columns.tags, columns.genres, columns.titles, columns.authors)) == [
+        utils.parse_book_filename(name) for name in names
+    ]
+
+
+def test_empty_batch():
+    assert utils.parse_book_filenames([]) == utils.ParsedBookColumns([], [], [], [], [])
+
+
+def test_directory_scan_matches_reference(tmp_path, monkeypatch):
+    rng = random.Random(0)
+    names = {random_name(rng).replace("/", "_") for _ in range(CORPUS_SIZE)} - {"", ".", ".."}
+    for name in names:
+        (tmp_path / name).touch()
+    monkeypatch.setattr(utils.storage.settings, "BOOKS_DIRECTORY", str(tmp_path))
+
+    pdfs = sorted(name for name in os.listdir(tmp_path) if name.endswith(".pdf"))
+    assert sorted(utils.scan_book_files(str(tmp_path))) == pdfs
+    expected = [
+        dict(zip(("filename", "tag", "genre", "title", "author"), (name, *utils.parse_book_filename(name))))
+        for name in pdfs
+    ]
+    assert sorted(utils.get_books_from_directory(), key=lambda book: book["filename"]) == expected
@@ -0,0 +1,44 @@
+"""Сортировки каталога по book_popularity (в SQLite представление заменено таблицей)"""
+import pytest
+
+from app import crud, popularity
+from app.database import engine
+
+PRIOR = 3.5
+
+
+@pytest.fixture
+def popularity_table():
+    popularity.view_metadata.create_all(bind=engine)
+    yield popularity.book_popularity
+    popularity.view_metadata.drop_all(bind=engine)
+
+
+def rank(conn, table, rows):
+    conn.execute(table.insert(), [
+        {"book_id": book.id, "weighted_rating": rating, "popularity_score": score,
+         "trending_score": trending, "rating_prior": PRIOR}
+        for book, rating, score, trending in rows
+    ])
+
+
+@pytest.mark.parametrize("sort, expected", [
+    ("popular", ["top", "low", "new"]),
+    ("trending", ["top", "low", "new"]),
+    # Новая книга — со средней оценкой библиотеки, выше книги с плохими оценками
+    ("top_rated", ["top", "new", "low"]),
+])
+def test_books_added_after_refresh_are_ranked(db, make_books, popularity_table, sort, expected):
+    top, low, new = make_books(3)
+    with engine.begin() as conn:
+        rank(conn, popularity_table, [(top, 4.5, 10.0, 1.0), (low, 2.0, 2.0, 0.5)])
+
+    names = {top.id: "top", low.id: "low", new.id: "new"}
+    books = crud.get_books(db, sort=sort)
+    assert [names[book.id] for book in books] == expected
+    assert [names[book.id] for book in crud.get_books(db, sort=sort, skip=1, limit=1)] == expected[1:2]
+
+
+def test_empty_view_lists_all_books(db, make_books, popularity_table):
+    books = make_books(3)
+    assert [book.id for book in crud.get_books(db, sort="top_rated")] == [book.id for book in reversed(books)]
@@ -0,0 +1,48 @@
+"""
+Бюджеты SQL-запросов горячих эндпоинтов
+
+Бюджет не зависит от числа строк в ответе: каждый эндпоинт вызывается на
+странице из N книг (отзывов, жалоб), и одна форма запроса не должна
+повторяться (max_repeats=1), иначе это N+1.
+"""
+import pytest
+
+from app import models
+
+N = 20
+
+
+@pytest.fixture
+def library(db, make_user, make_books):
+    admin = make_user(is_admin=True)
+    books = make_books(N)
+    db.execute(models.favorites.insert(), [{"user_id": admin.id, "book_id": book.id} for book in books])
+    db.execute(models.read_books.insert(), [{"user_id": admin.id, "book_id": book.id} for book in books])
+    db.add_all([models.Rating(user_id=admin.id, book_id=book.id, value=5) for book in books])
+    reviews = [models.Review(user_id=make_user().id, book_id=books[0].id, text="Отзыв") for _ in range(N)]
+    db.add_all(reviews)
+    db.commit()
+    db.add_all([models.ReviewReport(review_id=review.id, reporter_id=admin.id, reason="spam") for review in reviews])
+    db.commit()
+    return admin, books
+
+
+# (путь, бюджет запросов); первый запрос каждого — пользователь по токену
+BUDGETS = [
+    ("/api/books?limit=20", 3),
+    ("/api/books/{book_id}", 4),
+    ("/api/favorites?limit=20", 3),
+    ("/api/read?limit=20", 3),
+    ("/api/reviews/{book_id}?limit=20", 3),
+    ("/api/admin/reports?limit=20", 2),
+]
+
+
+@pytest.mark.parametrize("path, budget", BUDGETS, ids=[path.split("?")[0] for path, _ in BUDGETS])
+def test_endpoint_query_budget(client, auth_headers, query_budget, library, path, budget):
+    admin, books = library
+    headers = auth_headers(admin)
+    path = path.format(book_id=books[0].id)
+    with query_budget(budget, max_repeats=1):
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
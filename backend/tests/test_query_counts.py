@@ -0,0 +1,60 @@
+"""
+Число SQL-запросов списков не зависит от числа строк
+
+Каждый список строится для одной строки и для N строк внутри track_queries;
+ленивая загрузка по строкам (N+1) дала бы разное число запросов.
+"""
+import pytest
+
+from app import crud, main, models
+from app.database import track_queries
+
+N = 20
+
+
+@pytest.fixture
+def library(db, make_user, make_books):
+    """Читатель с N книгами на полках и оценками, N отзывов к первой книге и жалобы на них"""
+    reader = make_user()
+    books = make_books(N)
+    db.execute(models.favorites.insert(), [{"user_id": reader.id, "book_id": book.id} for book in books])
+    db.execute(models.read_books.insert(), [{"user_id": reader.id, "book_id": book.id} for book in books])
+    db.add_all([models.Rating(user_id=reader.id, book_id=book.id, value=4) for book in books])
+    reviews = [models.Review(user_id=make_user().id, book_id=books[0].id, text="Отзыв") for _ in range(N)]
+    db.add_all(reviews)
+    db.commit()
+    db.add_all([models.ReviewReport(review_id=review.id, reporter_id=reader.id, reason="spam") for review in reviews])
+    db.commit()
+    return reader, books
+
+
+def catalog(db, reader, book_ids, limit):
+    return main.build_book_responses(db, crud.get_books(db, limit=limit), reader)
+
+def shelf(db, reader, book_ids, limit):
+    return main.build_book_responses(db, crud._get_user_shelf(db, models.favorites, reader.id, limit=limit), reader)
+
+def enrichment(db, reader, book_ids, limit):
+    return crud.get_books_enrichment(db, book_ids[:limit], reader.id)
+
+def reviews(db, reader, book_ids, limit):
+    return [(row.id, row.user_name, row.text) for row in crud.get_book_reviews(db, book_ids[0], limit=limit)]
+
+def reports(db, reader, book_ids, limit):
+    return [(row.id, row.review_user_name, row.reporter_name) for row in crud.get_pending_reports(db, limit=limit)]
+
+
+@pytest.mark.parametrize("listing", [catalog, shelf, enrichment, reviews, reports], ids=lambda f: f.__name__)
+def test_statement_count_does_not_grow_with_rows(db, library, listing):
+    reader, books = library
+    reader_id, book_ids = reader.id, [book.id for book in books]
+    counts = {}
+    for limit in (1, N):
+        # Без объектов, уже загруженных в сессию предыдущим прогоном
+        db.expire_all()
+        reader = db.get(models.User, reader_id)
+        with track_queries() as stats:
+            rows = listing(db, reader, book_ids, limit)
+        assert len(rows) == limit
+        counts[limit] = stats.statements
+    assert counts[1] == counts[N], counts
@@ -0,0 +1,43 @@
+"""Кэш объектов S3 на диске узла: фоновая загрузка при промахе"""
+import threading
+
+from app.storage import DiskCache, ObjectInfo
+
+
+def test_fetch_async_downloads_once(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1024)
+    info = ObjectInfo("book.pdf", 5, "etag1", 1700000000.0)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def download(target):
+        calls.append(target)
+        started.set()
+        release.wait(5)
+        with open(target, "wb") as file:
+            file.write(b"%PDF-")
+
+    cache.fetch_async(info, download)
+    assert started.wait(5)
+    cache.fetch_async(info, download)  # загрузка уже идет
+    assert cache.get(info) is None
+    release.set()
+    cache._executor.shutdown(wait=True)
+
+    assert len(calls) == 1
+    with open(cache.get(info), "rb") as file:
+        assert file.read() == b"%PDF-"
+
+
+def test_fetch_async_skips_large_objects_and_survives_errors(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1024)
+
+    def failing(target):
+        raise OSError("S3 недоступно")
+
+    cache.fetch_async(ObjectInfo("big.pdf", 1024, "etag", 0.0), failing)
+    cache.fetch_async(ObjectInfo("book.pdf", 5, "etag", 0.0), failing)
+    cache._executor.shutdown(wait=True)
+
+    assert not cache._pending
+    assert not list(tmp_path.iterdir())
@@ -65,6 +65,7 @@ CREATE TABLE IF NOT EXISTS notes (
     book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
     page INTEGER NOT NULL,
     text TEXT NOT NULL,
+    client_id VARCHAR(64),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -72,12 +73,24 @@ CREATE TABLE IF NOT EXISTS notes (
 CREATE INDEX IF NOT EXISTS idx_notes_user ON notes(user_id);
 CREATE INDEX IF NOT EXISTS idx_notes_book ON notes(book_id);
 CREATE INDEX IF NOT EXISTS idx_notes_user_book ON notes(user_id, book_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_notes_user_client_id ON notes(user_id, client_id);
+
+-- Триггер для автоматического обновления updated_at; явно заданное значение
+-- (время правки на клиенте при синхронизации) сохраняется
+CREATE OR REPLACE FUNCTION notes_touch_updated_at()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+        NEW.updated_at = NOW();
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
 
--- Триггер для автоматического обновления updated_at
 CREATE TRIGGER update_notes_updated_at
     BEFORE UPDATE ON notes
     FOR EACH ROW
-    EXECUTE FUNCTION update_updated_at_column();
+    EXECUTE FUNCTION notes_touch_updated_at();
 
 COMMENT ON TABLE notes IS 'Заметки пользователей к книгам';
 
@@ -99,6 +112,7 @@ CREATE INDEX IF NOT EXISTS idx_reports_status ON review_reports(status);
 CREATE INDEX IF NOT EXISTS idx_reports_review ON review_reports(review_id);
 CREATE INDEX IF NOT EXISTS idx_reports_reporter ON review_reports(reporter_id);
 CREATE INDEX IF NOT EXISTS idx_reports_created_at ON review_reports(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_reports_pending_review ON review_reports(review_id, reason) WHERE status = 'pending';
 
 COMMENT ON TABLE review_reports IS 'Жалобы на отзывы пользователей';
 
@@ -117,6 +131,7 @@ CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_books_created_at ON books(created_at
 
 -- Индексы для отзывов и рейтингов
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_book_id ON reviews(book_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_book_id_id ON reviews(book_id, id DESC);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_user_id ON reviews(user_id);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reviews_created_at ON reviews(created_at DESC);
 
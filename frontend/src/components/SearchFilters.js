@@ -1,6 +1,6 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { createPortal } from 'react-dom';
-import { filtersAPI } from '../services/api';
+import { filtersAPI, suggestAPI } from '../services/api';
 import '../styles/SearchFilters.css';
 
 const CustomSelect = ({ value, onChange, options, placeholder }) => {
@@ -141,11 +141,30 @@ const SearchFilters = ({ onFilterChange }) => {
     const [tags, setTags] = useState([]);
     const [genres, setGenres] = useState([]);
     const [authors, setAuthors] = useState([]);
+    const [suggestions, setSuggestions] = useState([]);
 
     useEffect(() => {
         loadFilters();
     }, []);
 
+    // Подсказки с небольшой задержкой, чтобы не слать запрос на каждую букву
+    useEffect(() => {
+        const query = search.trim();
+        if (!query) {
+            setSuggestions([]);
+            return;
+        }
+        const timer = setTimeout(async () => {
+            try {
+                const response = await suggestAPI.get(query);
+                setSuggestions(response.data.suggestions);
+            } catch (error) {
+                setSuggestions([]);
+            }
+        }, 150);
+        return () => clearTimeout(timer);
+    }, [search]);
+
     useEffect(() => {
         const filters = {
             search: search || undefined,
@@ -202,7 +221,14 @@ const SearchFilters = ({ onFilterChange }) => {
                     placeholder="Поиск книг по названию, автору, описанию..."
                     value={search}
                     onChange={(e) => setSearch(e.target.value)}
+                    list="search-suggestions"
+                    autoComplete="off"
                 />
+                <datalist id="search-suggestions">
+                    {suggestions.map((item) => (
+                        <option key={`${item.type}:${item.value}`} value={item.value} />
+                    ))}
+                </datalist>
             </div>
 
             <div className="filters-row">
@@ -2,7 +2,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import Iridescence from '../components/Iridescence';
-import { booksAPI } from '../services/api';
+import { booksAPI, jobsAPI } from '../services/api';
 import { FaShieldAlt } from 'react-icons/fa';
 import { FiAlertTriangle, FiUpload, FiRefreshCw } from 'react-icons/fi'; // ✅ НОВОЕ
 import '../styles/AdminPage.css';
@@ -154,11 +154,27 @@ const AdminPage = () => {
         }
     };
 
+    // Синхронизация выполняется в фоне: ждем завершения задачи, опрашивая ее статус
+    const waitForJob = async (jobId) => {
+        for (;;) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const { data: job } = await jobsAPI.get(jobId);
+            if (job.status === 'succeeded' || job.status === 'failed') {
+                return job;
+            }
+        }
+    };
+
     const handleSync = async () => {
         setLoading(true);
         try {
             const response = await booksAPI.sync();
-            showMessage(response.data.message || 'Синхронизация завершена', 'success');
+            const job = await waitForJob(response.data.job_id);
+            if (job.status === 'succeeded') {
+                showMessage(job.result?.message || 'Синхронизация завершена', 'success');
+            } else {
+                showMessage(job.error || 'Ошибка при синхронизации', 'error');
+            }
         } catch (error) {
             const errorMsg = error.response?.data?.detail || 'Ошибка при синхронизации';
             showMessage(errorMsg, 'error');
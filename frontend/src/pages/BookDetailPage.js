@@ -4,7 +4,7 @@ import { FiBook, FiDownload, FiHeart, FiCheckCircle, FiAlertTriangle } from 'rea
 import { useAuth } from '../contexts/AuthContext';
 import { useToast } from '../components/ToastContainer'; // ✅ НОВОЕ
 import ReportModal from '../components/ReportModal'; // ✅ НОВОЕ
-import { booksAPI, reviewsAPI, ratingsAPI, favoritesAPI, readStatusAPI } from '../services/api';
+import { booksAPI, reviewsAPI, ratingsAPI, favoritesAPI, readStatusAPI, eventsAPI } from '../services/api';
 import '../styles/BookDetailPage.css';
 
 const BookDetailPage = () => {
@@ -24,6 +24,21 @@ const BookDetailPage = () => {
         loadBookData();
     }, [id]);
 
+    // Новые отзывы и оценки других читателей приходят без перезагрузки страницы
+    useEffect(() => {
+        const source = eventsAPI.book(id);
+        let timer = null;
+        const refresh = () => {
+            clearTimeout(timer);
+            timer = setTimeout(loadBookData, 500);
+        };
+        ['review', 'rating', 'resync'].forEach(name => source.addEventListener(name, refresh));
+        return () => {
+            clearTimeout(timer);
+            source.close();
+        };
+    }, [id]);
+
     const loadBookData = async () => {
         try {
             const [bookRes, reviewsRes] = await Promise.all([
@@ -3,8 +3,8 @@ import { useNavigate, Link } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import Iridescence from '../components/Iridescence';
 import BookCard from '../components/BookCard';
-import { favoritesAPI } from '../services/api';
-import { FaHeart, FaHeartBroken } from 'react-icons/fa';
+import { favoritesAPI, bundlesAPI } from '../services/api';
+import { FaHeart, FaHeartBroken, FaDownload } from 'react-icons/fa';
 import '../styles/FavoritesPage.css';
 
 const FavoritesPage = () => {
@@ -12,6 +12,7 @@ const FavoritesPage = () => {
     const navigate = useNavigate();
     const [books, setBooks] = useState([]);
     const [loading, setLoading] = useState(true);
+    const [bundling, setBundling] = useState(false);
 
     useEffect(() => {
         if (!isAuthenticated) {
@@ -33,6 +34,31 @@ const FavoritesPage = () => {
         }
     };
 
+    // Все избранное одним архивом — одно скачивание вместо скачивания по книге
+    const handleDownloadAll = async () => {
+        setBundling(true);
+        try {
+            const response = await bundlesAPI.download({ favorites: true });
+            const disposition = response.headers['content-disposition'] || '';
+            const match = disposition.match(/filename="([^"]+)"/);
+            const url = window.URL.createObjectURL(new Blob([response.data]));
+            const link = document.createElement('a');
+            link.href = url;
+            link.setAttribute('download', match ? match[1] : 'books.zip');
+            document.body.appendChild(link);
+            link.click();
+            link.remove();
+            window.URL.revokeObjectURL(url);
+        } catch (error) {
+            console.error('Error downloading bundle:', error);
+            alert(error.response?.status === 429
+                ? 'Скачивать можно не чаще 1 раза в 30 секунд. Подождите.'
+                : 'Не удалось скачать архив');
+        } finally {
+            setBundling(false);
+        }
+    };
+
     if (!isAuthenticated) return null;
 
     return (
@@ -70,11 +96,23 @@ const FavoritesPage = () => {
                         <p className="loading-text">Загружаем избранные книги...</p>
                     </div>
                 ) : books.length > 0 ? (
+                    <>
+                    <div className="favorites-actions">
+                        <button
+                            className="favorites-empty-button"
+                            onClick={handleDownloadAll}
+                            disabled={bundling}
+                        >
+                            <FaDownload />
+                            <span>{bundling ? 'Собираем архив...' : 'Скачать все архивом'}</span>
+                        </button>
+                    </div>
                     <div className="favorites-grid">
                         {books.map(book => (
                             <BookCard key={book.id} book={book} />
                         ))}
                     </div>
+                    </>
                 ) : (
                     <div className="favorites-empty">
                         <FaHeartBroken className="favorites-empty-icon" />
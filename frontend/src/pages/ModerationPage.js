@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
-import { booksAPI } from '../services/api';
+import { booksAPI, eventsAPI } from '../services/api';
 import Iridescence from '../components/Iridescence';
 import { FiAlertTriangle, FiCheck, FiX, FiTrash2 } from 'react-icons/fi';
 import '../styles/ModerationPage.css';
@@ -11,6 +11,7 @@ const ModerationPage = () => {
     const navigate = useNavigate();
 
     const [reports, setReports] = useState([]);
+    const [queue, setQueue] = useState([]);
     const [loading, setLoading] = useState(true);
     const [processing, setProcessing] = useState(null);
     const [filter, setFilter] = useState('pending');
@@ -26,6 +27,50 @@ const ModerationPage = () => {
         loadReports();
     }, [isAdmin, navigate]);
 
+    // Новые жалобы появляются в очереди сразу
+    useEffect(() => {
+        if (!isAdmin) return;
+        let source = null;
+        let closed = false;
+        let timer = null;
+        let reconnectTimer = null;
+        const refresh = () => {
+            clearTimeout(timer);
+            timer = setTimeout(loadReports, 500);
+        };
+        // Билет одноразовый: после обрыва EventSource не переподключится с ним,
+        // поэтому закрываем источник и подписываемся заново с новым билетом
+        const reconnect = () => {
+            clearTimeout(reconnectTimer);
+            reconnectTimer = setTimeout(subscribe, 3000);
+        };
+        const subscribe = async () => {
+            try {
+                const next = await eventsAPI.admin();
+                if (closed) {
+                    next.close();
+                    return;
+                }
+                source = next;
+                ['report', 'resync'].forEach(name => source.addEventListener(name, refresh));
+                source.onerror = () => {
+                    source.close();
+                    refresh();
+                    reconnect();
+                };
+            } catch (error) {
+                if (!closed) reconnect();
+            }
+        };
+        subscribe();
+        return () => {
+            closed = true;
+            clearTimeout(timer);
+            clearTimeout(reconnectTimer);
+            if (source) source.close();
+        };
+    }, [isAdmin]);
+
     useEffect(() => {
         const observerOptions = {
             threshold: 0.1,
@@ -52,20 +97,26 @@ const ModerationPage = () => {
     const loadReports = async () => {
         setLoading(true);
         try {
-            const data = await booksAPI.getReports();
-            setReports(Array.isArray(data) ? data : []);
+            const [queueRes, reportsRes] = await Promise.all([
+                booksAPI.getReportsQueue(),
+                booksAPI.getReports(),
+            ]);
+            setQueue(Array.isArray(queueRes.data) ? queueRes.data : []);
+            setReports(Array.isArray(reportsRes.data) ? reportsRes.data : []);
         } catch (error) {
             console.error('Failed to load reports:', error);
+            setQueue([]);
             setReports([]);
         } finally {
             setLoading(false);
         }
     };
 
-    const handleResolve = async (reportId, action) => {
-        setProcessing(reportId);
+    // Решение принимается сразу по всем жалобам на отзыв
+    const handleResolve = async (reviewId, action) => {
+        setProcessing(reviewId);
         try {
-            await booksAPI.resolveReport(reportId, action);
+            await booksAPI.resolveReports(action, { reviewIds: [reviewId] });
             await loadReports();
         } catch (error) {
             console.error('Failed to resolve report:', error);
@@ -75,7 +126,6 @@ const ModerationPage = () => {
         }
     };
 
-    const pendingReports = reports.filter(r => r.status === 'pending');
     const resolvedReports = reports.filter(r => r.status !== 'pending');
 
     const getReasonText = (reason) => {
@@ -122,7 +172,7 @@ const ModerationPage = () => {
                         <div className="card-header">
                             <h2 className="card-title">Ожидают обработки</h2>
                             <p className="card-description">
-                                Жалобы на отзывы, требующие вашего решения ({pendingReports.length})
+                                Отзывы с жалобами, требующие вашего решения ({queue.length})
                             </p>
                         </div>
 
@@ -131,51 +181,48 @@ const ModerationPage = () => {
                                 <div className="loading-spinner"></div>
                                 <span>Загрузка...</span>
                             </div>
-                        ) : pendingReports.length === 0 ? (
+                        ) : queue.length === 0 ? (
                             <div className="card-empty">
                                 <span className="empty-icon">✓</span>
                                 <p className="empty-text">Нет ожидающих жалоб</p>
                             </div>
                         ) : (
                             <div className="reports-list">
-                                {pendingReports.map(report => (
-                                    <div key={report.id} className="report-item">
+                                {queue.map(item => (
+                                    <div key={item.review_id} className="report-item">
                                         <div className="report-info">
                                             <div className="report-meta">
-                                                <span className="report-reason">
-                                                    {getReasonText(report.reason)}
-                                                </span>
+                                                {Object.entries(item.reasons).map(([reason, count]) => (
+                                                    <span key={reason} className="report-reason">
+                                                        {getReasonText(reason)}{count > 1 ? ` × ${count}` : ''}
+                                                    </span>
+                                                ))}
+                                                {item.hidden && (
+                                                    <span className="report-reason">Скрыт автоматически</span>
+                                                )}
                                                 <span className="report-date">
-                                                    {new Date(report.created_at).toLocaleDateString('ru-RU')}
+                                                    {new Date(item.last_reported_at).toLocaleDateString('ru-RU')}
                                                 </span>
                                             </div>
 
                                             <div className="report-content">
-                                                <div className="content-label">Отзыв:</div>
-                                                <p className="content-text">{report.review?.text}</p>
+                                                <div className="content-label">
+                                                    Отзыв к книге «{item.book_title}» — жалоб: {item.pending_count}
+                                                </div>
+                                                <p className="content-text">{item.review.text}</p>
                                                 <div className="content-author">
-                                                    — {report.review?.user_name}
+                                                    — {item.review.user_name}
                                                 </div>
                                             </div>
-
-                                            {report.comment && (
-                                                <div className="report-comment">
-                                                    <div className="content-label">Причина жалобы:</div>
-                                                    <p className="content-text">{report.comment}</p>
-                                                    <div className="content-author">
-                                                        — {report.reporter_name}
-                                                    </div>
-                                                </div>
-                                            )}
                                         </div>
 
                                         <div className="report-actions">
                                             <button
                                                 className="btn-primary btn-delete"
-                                                onClick={() => handleResolve(report.id, 'delete_review')}
-                                                disabled={processing === report.id}
+                                                onClick={() => handleResolve(item.review_id, 'delete_review')}
+                                                disabled={processing === item.review_id}
                                             >
-                                                {processing === report.id ? (
+                                                {processing === item.review_id ? (
                                                     <>
                                                         <span className="btn-spinner"></span>
                                                         <span>Обработка...</span>
@@ -189,10 +236,10 @@ const ModerationPage = () => {
                                             </button>
                                             <button
                                                 className="btn-secondary"
-                                                onClick={() => handleResolve(report.id, 'dismiss')}
-                                                disabled={processing === report.id}
+                                                onClick={() => handleResolve(item.review_id, 'dismiss')}
+                                                disabled={processing === item.review_id}
                                             >
-                                                {processing === report.id ? (
+                                                {processing === item.review_id ? (
                                                     <>
                                                         <span className="btn-spinner"></span>
                                                         <span>Обработка...</span>
@@ -200,7 +247,7 @@ const ModerationPage = () => {
                                                 ) : (
                                                     <>
                                                         <FiCheck />
-                                                        <span>Отклонить жалобу</span>
+                                                        <span>Отклонить жалобы</span>
                                                     </>
                                                 )}
                                             </button>
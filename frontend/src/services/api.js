@@ -60,6 +60,10 @@ export const booksAPI = {
     updateNote: (noteId, text) => api.put(`/notes/${noteId}`, { text }),
     deleteNote: (noteId) => api.delete(`/notes/${noteId}`),
 
+    // ✅ Пакетная синхронизация закладок и заметок
+    getAnnotations: (bookId) => api.get(`/books/${bookId}/annotations`),
+    syncAnnotations: (bookId, changes) => api.post(`/books/${bookId}/annotations/sync`, changes),
+
     // ✅ Модерация
     reportReview: (reviewId, reason, comment) => api.post(`/reports`, {
         review_id: reviewId,
@@ -71,14 +75,26 @@ export const booksAPI = {
     resolveReport: (reportId, action) => api.post(`/admin/reports/${reportId}/resolve`, null, {
         params: { action }
     }),
+    // Очередь модерации по отзывам и пакетная обработка жалоб
+    getReportsQueue: () => api.get(`/admin/reports/queue`),
+    resolveReports: (action, { reportIds = [], reviewIds = [] } = {}) => api.post(`/admin/reports/resolve`, {
+        action,
+        report_ids: reportIds,
+        review_ids: reviewIds
+    }),
 };
 
 // ============================================
 // FAVORITES API
 // ============================================
 
+// Несколько книг одним ZIP-архивом: { book_ids } | { favorites: true } | фильтры каталога
+export const bundlesAPI = {
+    download: (selection) => api.post('/bundles', selection, { responseType: 'blob' }),
+};
+
 export const favoritesAPI = {
-    getAll: () => api.get('/favorites'),
+    getAll: (params) => api.get('/favorites', { params }),
     add: (bookId) => api.post(`/favorites/${bookId}`),
     remove: (bookId) => api.delete(`/favorites/${bookId}`),
 };
@@ -88,6 +104,10 @@ export const favoritesAPI = {
 // ============================================
 
 export const readStatusAPI = {
+    getAll: (params) => api.get('/read', { params }),
+    getProgress: (bookId) => api.get(`/progress/${bookId}`),
+    saveProgress: (bookId, page) => api.put(`/progress/${bookId}`, { page }),
+    getContinueReading: (limit) => api.get('/progress', { params: { limit } }),
     markAsRead: (bookId) => api.post(`/read/${bookId}`),
     markAsUnread: (bookId) => api.delete(`/read/${bookId}`),
 };
@@ -119,4 +139,22 @@ export const filtersAPI = {
     getAuthors: () => api.get('/filters/authors'),
 };
 
+export const jobsAPI = {
+    get: (jobId) => api.get(`/admin/jobs/${jobId}`),
+};
+
+export const suggestAPI = {
+    get: (q, params = {}) => api.get('/suggest', { params: { q, ...params } }),
+};
+
+// Server-Sent Events: EventSource не передает заголовки, поэтому админ получает
+// одноразовый билет (POST с токеном) и передает его в параметре
+export const eventsAPI = {
+    book: (bookId) => new EventSource(`/api/events/books/${bookId}`),
+    admin: async () => {
+        const { data } = await api.post('/admin/events/ticket');
+        return new EventSource(`/api/admin/events?ticket=${encodeURIComponent(data.ticket)}`);
+    },
+};
+
 export default api;